@@ -0,0 +1,124 @@
+"""Measures login throughput for several password hashing pool sizes
+
+Concurrent clients log in as one benchmark user for a fixed duration per
+pool size. A pool size of 0 hashes inside the request, the way every login
+was handled before hashing moved to a pool. Pass --gevent to monkey patch
+the process first, so the clients are greenlets sharing one hub like
+requests in a gunicorn gevent worker.
+
+Run from the backend directory against a PostgreSQL database:
+
+    python -m benchmarks.login_throughput --config development --gevent
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+BENCHMARK_EMAIL = "login@login-benchmark.wallet.co"
+BENCHMARK_PASSWORD = "benchmark-password"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default="development")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--rounds", type=int, default=None)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[0, 2, 4, 8])
+    parser.add_argument("--gevent", action="store_true")
+    return parser.parse_args()
+
+
+def run_clients(app, clients, duration):
+    """Logs in from concurrent clients for duration seconds
+
+    Returns:
+        tuple: Latencies of successful logins and the number of failures
+    """
+    from threading import Thread
+
+    latencies = []
+    failures = []
+    deadline = time.monotonic() + duration
+    body = json.dumps({"email": BENCHMARK_EMAIL, "password": BENCHMARK_PASSWORD})
+
+    def client():
+        test_client = app.test_client()
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            response = test_client.post(
+                "api/v1/auth/login",
+                data=body,
+                headers={"Content-Type": "application/json"},
+            )
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                failures.append(response.status_code)
+
+    workers = [Thread(target=client) for _ in range(clients)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return latencies, len(failures)
+
+
+def main():
+    args = parse_args()
+
+    if args.gevent:
+        from gevent import monkey
+
+        monkey.patch_all()
+
+    from src.main import create_app
+    from src.extensions import db
+    from src.app.db.model import RolesModel, UserModel
+    from src.helpers.password_hasher import password_hasher
+
+    app = create_app(config_name=args.config)
+
+    if args.rounds:
+        UserModel.set_hash_rounds(args.rounds)
+
+    with app.app_context():
+        role = RolesModel.query.first()
+
+        if not role:
+            raise SystemExit("Seed the roles table before benchmarking")
+
+        UserModel.query.filter_by(email=BENCHMARK_EMAIL).delete()
+        UserModel(
+            name="login benchmark",
+            email=BENCHMARK_EMAIL,
+            password=UserModel.generate_hash(BENCHMARK_PASSWORD),
+            role_id=role.id,
+        ).save_to_db()
+        db.session.remove()
+
+    print(
+        f"{'pool size':>10} {'logins/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}"
+    )
+    try:
+        for pool_size in args.pool_sizes:
+            password_hasher.configure(pool_size=pool_size)
+            latencies, failures = run_clients(app, args.clients, args.duration)
+            latencies.sort()
+            p50 = statistics.median(latencies) * 1000 if latencies else 0
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+            print(
+                f"{pool_size:>10} {len(latencies) / args.duration:>10.1f}"
+                f" {p50:>8.2f} {p99:>8.2f} {failures:>7}"
+            )
+    finally:
+        with app.app_context():
+            UserModel.query.filter_by(email=BENCHMARK_EMAIL).delete()
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
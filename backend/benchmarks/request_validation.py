@@ -0,0 +1,111 @@
+"""Measures the cost of validating the query args and body of one request
+
+Compares, per request shape, the way handlers validated before the request
+parser was added, building new schemas and validating args and body in
+separate passes, with one load per part through the module level schemas
+that parse_request uses. No database or application is needed.
+
+Run from the backend directory:
+
+    python -m benchmarks.request_validation --iterations 20000
+"""
+
+import argparse
+import timeit
+
+from werkzeug.datastructures import ImmutableMultiDict
+
+from src.app.schema import validation_schema as schemas
+
+REQUESTS = {
+    "wallet_credit": (
+        schemas.UserRequestSchema,
+        schemas.WalletPutRequestSchema,
+        ImmutableMultiDict({"user_id": "42"}),
+        {"amount": 25.5, "currency_id": 150},
+    ),
+    "user_update": (
+        schemas.UserRequestSchema,
+        schemas.UserPutRequestSchema,
+        ImmutableMultiDict({"user_id": "42"}),
+        {
+            "email": "user@example.com",
+            "name": "Benchmark User",
+            "profile_photo": "https://example.com/photo.png",
+            "password": "benchmark-password",
+            "telephone": "0700000000",
+            "role_id": 2,
+            "is_disabled": False,
+        },
+    ),
+    "transfer_batch": (
+        None,
+        schemas.TransferBatchRequestSchema,
+        None,
+        {
+            "transfers": [
+                {"source_user_id": 1, "target_user_id": 2, "amount": 10.25}
+                for _ in range(100)
+            ]
+        },
+    ),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+def per_request_schemas(args_class, body_class, args, body):
+    """Validates the way the handlers did before parse_request"""
+
+    def run():
+        if args_class is not None:
+            args_class().validate(args)
+        body_class().validate(body)
+
+    return run
+
+
+def shared_schemas(args_class, body_class, args, body):
+    """Loads once per part through schemas built at import time"""
+    args_schema = args_class() if args_class is not None else None
+    body_schema = body_class()
+
+    def run():
+        if args_schema is not None:
+            args_schema.load(args)
+        body_schema.load(body)
+
+    return run
+
+
+def main():
+    options = parse_args()
+    iterations = options.iterations
+
+    print(f"{'request':<16}{'per-request':>14}{'shared':>14}{'speedup':>10}")
+    for name, (args_class, body_class, args, body) in REQUESTS.items():
+        if name == "transfer_batch":
+            # a batch validates a hundred items, fewer runs are enough
+            runs = max(iterations // 100, 1)
+        else:
+            runs = iterations
+
+        timings = []
+        for build in (per_request_schemas, shared_schemas):
+            run = build(args_class, body_class, args, body)
+            best = min(timeit.repeat(run, number=runs, repeat=options.repeat))
+            timings.append(best / runs * 1e6)
+
+        print(
+            f"{name:<16}{timings[0]:>12.1f}us{timings[1]:>12.1f}us"
+            f"{timings[0] / timings[1]:>9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
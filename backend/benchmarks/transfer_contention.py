@@ -0,0 +1,167 @@
+"""Measures transfer throughput as contention on hot wallets increases
+
+Every worker thread repeatedly transfers a small amount between two wallets
+picked at random from a pool of hot wallets. Shrinking the pool raises the
+chance that two transfers lock the same rows, which shows how throughput
+degrades under contention.
+
+Run from the backend directory against a PostgreSQL database:
+
+    python -m benchmarks.transfer_contention --config development
+"""
+
+import argparse
+import random
+import statistics
+import threading
+import time
+from decimal import Decimal
+
+from sqlalchemy import or_
+
+from src.main import create_app
+from src.extensions import db
+from src.app.db.model import (
+    CurrencyModel,
+    RolesModel,
+    UserModel,
+    WalletModel,
+    WalletDeltaModel,
+    TransactionsModel,
+    IdempotencyKeyModel,
+    InsufficientFundsError,
+)
+
+BENCHMARK_EMAIL_DOMAIN = "transfer-benchmark.wallet.co"
+
+
+def seed_wallets(count):
+    """Creates benchmark users with funded wallets and returns their ids"""
+    currency = CurrencyModel.query.first()
+    role = RolesModel.query.first()
+
+    if not currency or not role:
+        raise SystemExit("Seed the currency and roles tables before benchmarking")
+
+    user_ids = []
+    for index in range(count):
+        user = UserModel(
+            name=f"benchmark {index}",
+            email=f"{index}@{BENCHMARK_EMAIL_DOMAIN}",
+            password="",
+            role_id=role.id,
+        )
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(
+            WalletModel(
+                amount=Decimal("1000000.00"), currency_id=currency.id, user_id=user.id
+            )
+        )
+        user_ids.append(user.id)
+
+    db.session.commit()
+    return user_ids
+
+
+def remove_wallets():
+    """Deletes the benchmark users, their wallets and the rows referencing them
+
+    Ledger entries and deltas reference the wallets and users, so they are
+    deleted first.
+    """
+    users = UserModel.query.filter(
+        UserModel.email.like(f"%@{BENCHMARK_EMAIL_DOMAIN}")
+    ).all()
+    user_ids = [user.id for user in users]
+    wallet_ids = [
+        wallet_id
+        for (wallet_id,) in db.session.query(WalletModel.id).filter(
+            WalletModel.user_id.in_(user_ids)
+        )
+    ]
+    WalletDeltaModel.query.filter(WalletDeltaModel.wallet_id.in_(wallet_ids)).delete(
+        synchronize_session=False
+    )
+    TransactionsModel.query.filter(
+        or_(
+            TransactionsModel.user_id.in_(user_ids),
+            TransactionsModel.counterparty_user_id.in_(user_ids),
+        )
+    ).delete(synchronize_session=False)
+    # keys are scoped by the JWT identity, the email of the user
+    IdempotencyKeyModel.query.filter(
+        IdempotencyKeyModel.scope.like(f"%@{BENCHMARK_EMAIL_DOMAIN}:%")
+    ).delete(synchronize_session=False)
+    WalletModel.query.filter(WalletModel.id.in_(wallet_ids)).delete(
+        synchronize_session=False
+    )
+    UserModel.query.filter(UserModel.id.in_(user_ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def run_workers(app, user_ids, threads, duration):
+    """Runs transfer workers for duration seconds and returns their latencies"""
+    latencies = []
+    failures = []
+    deadline = time.monotonic() + duration
+
+    def worker():
+        with app.app_context():
+            while time.monotonic() < deadline:
+                source, target = random.sample(user_ids, 2)
+                started = time.perf_counter()
+                try:
+                    WalletModel.transfer(source, target, Decimal("0.01"))
+                except InsufficientFundsError:
+                    pass
+                except Exception as e:
+                    db.session.rollback()
+                    failures.append(e)
+                    continue
+                latencies.append(time.perf_counter() - started)
+            db.session.remove()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    return latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default="development")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument(
+        "--hot-wallets", type=int, nargs="+", default=[2, 4, 16, 64, 256]
+    )
+    args = parser.parse_args()
+
+    app = create_app(config_name=args.config)
+
+    with app.app_context():
+        print(
+            f"{'hot wallets':>12} {'transfers/s':>12} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for hot_wallets in args.hot_wallets:
+            remove_wallets()
+            user_ids = seed_wallets(hot_wallets)
+            latencies, failures = run_workers(
+                app, user_ids, args.threads, args.duration
+            )
+            latencies.sort()
+            p50 = statistics.median(latencies) * 1000 if latencies else 0
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+            print(
+                f"{hot_wallets:>12} {len(latencies) / args.duration:>12.1f}"
+                f" {p50:>8.2f} {p99:>8.2f} {len(failures):>7}"
+            )
+        remove_wallets()
+
+
+if __name__ == "__main__":
+    main()
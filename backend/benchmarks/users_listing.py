@@ -0,0 +1,150 @@
+"""Measures GET /users/all for a page of 1000 users before and after fast serialization
+
+The same page is requested with FAST_SERIALIZATION disabled, which marshals
+with flask-restx and encodes with the json module as before, and enabled,
+which uses the compiled models and orjson. The serialization step alone is
+timed as well, on the rows the handler returns.
+
+Run from the backend directory, against PostgreSQL or the SQLite test
+database:
+
+    python -m benchmarks.users_listing --config testing --rows 1000
+"""
+
+import argparse
+import statistics
+import time
+import timeit
+
+BENCHMARK_EMAIL_DOMAIN = "users-benchmark.wallet.co"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default="development")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=50)
+    return parser.parse_args()
+
+
+def seed_users(rows):
+    """Adds users until the users table holds at least rows users"""
+    from src.extensions import db
+    from src.app.db.model import RolesModel, UserModel
+
+    role = RolesModel.query.first()
+    if not role:
+        role = RolesModel(name="General")
+        role.save_to_db()
+
+    missing = rows - UserModel.count_users()
+    db.session.bulk_save_objects(
+        [
+            UserModel(
+                name=f"benchmark user {index}",
+                email=f"user{index}@{BENCHMARK_EMAIL_DOMAIN}",
+                password="not-a-hash",
+                telephone="0700000000",
+                profile_photo="https://example.com/photo.png",
+                role_id=role.id,
+            )
+            for index in range(max(missing, 0))
+        ]
+    )
+    db.session.commit()
+
+
+def time_requests(app, headers, rows, requests):
+    """Returns the latencies of requests to the first page of rows users"""
+    client = app.test_client()
+    url = f"api/v1/users/all?page=1&limit={rows}"
+    client.get(url, headers=headers)
+
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise SystemExit(f"Listing failed with {response.status_code}")
+
+    return latencies
+
+
+def time_serialization(items, repeat=20):
+    """Returns the seconds to serialize items with flask-restx and compiled"""
+    import json
+
+    from flask_restx import marshal
+
+    from src.helpers import serialization
+    from src.app.schema.serializer import user
+
+    compiled = serialization.compile_model(user)
+
+    def restx():
+        json.dumps(marshal(items, user))
+
+    def fast():
+        serialization.dumps(compiled.serialize_list(items))
+
+    return (
+        min(timeit.repeat(restx, number=1, repeat=repeat)),
+        min(timeit.repeat(fast, number=1, repeat=repeat)),
+    )
+
+
+def main():
+    args = parse_args()
+
+    from flask_jwt_extended import create_access_token
+
+    from src.main import create_app
+    from src.extensions import db
+    from src.app.db.model import UserModel
+
+    app = create_app(config_name=args.config)
+
+    with app.app_context():
+        if args.config == "testing":
+            db.create_all()
+
+        seed_users(args.rows)
+        headers = {"Authorization": f"Bearer {create_access_token(identity='bench')}"}
+        items = [
+            {
+                "user_id": user.id,
+                "name": user.name,
+                "email": user.email,
+                "telephone": user.telephone,
+                "profile_photo": user.profile_photo,
+                "role": user.roles.name,
+                "is_disabled": user.is_disabled,
+            }
+            for user in UserModel.get_all_paginated_users(1, args.rows).items
+        ]
+        db.session.remove()
+
+    print(f"{'serialization':<15}{'p50 ms':>10}{'mean ms':>10}{'only ms':>10}")
+    restx_seconds, fast_seconds = time_serialization(items)
+
+    try:
+        for fast, only_seconds in ((False, restx_seconds), (True, fast_seconds)):
+            app.config["FAST_SERIALIZATION"] = fast
+            latencies = time_requests(app, headers, args.rows, args.requests)
+            print(
+                f"{'compiled' if fast else 'flask-restx':<15}"
+                f"{statistics.median(latencies) * 1000:>10.2f}"
+                f"{statistics.mean(latencies) * 1000:>10.2f}"
+                f"{only_seconds * 1000:>10.2f}"
+            )
+    finally:
+        with app.app_context():
+            UserModel.query.filter(
+                UserModel.email.like(f"%@{BENCHMARK_EMAIL_DOMAIN}")
+            ).delete(synchronize_session=False)
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
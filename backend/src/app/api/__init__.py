@@ -1,6 +1,8 @@
 """ API Base"""
 from flask_restx import Api
 
+from src.helpers.serialization import output_json
+
 authorizations = {
     "apikey": {"type": "apiKey", "in": "header", "name": "Authorization Bearer"}
 }
@@ -12,6 +14,7 @@ api = Api(
     doc="/docs",
     authorizations=authorizations,
 )
+api.representations["application/json"] = output_json
 
 
 @api.errorhandler
@@ -1,3 +1,6 @@
+import math
+from datetime import datetime
+
 from flask import abort, request
 from flask_restx import Namespace, Resource
 from flask_jwt_extended import (
@@ -10,44 +13,61 @@ from flask_jwt_extended import (
 
 from src.app.schema.serializer import user_login_request, user_registration_request
 from src.app.schema.validation_schema import (
-    UserRegistrationRequestSchema,
-    UserLoginRequestSchema,
+    user_registration_request_schema,
+    user_login_request_schema,
 )
-from src.app.db.model import UserModel, RevokedTokenModel, RolesModel
+from src.extensions import db
+from src.app.db.model import UserModel, RevokedTokenModel
+from src.helpers.token_blocklist import token_blocklist
+from src.helpers.reference_cache import reference_cache
+from src.helpers.password_hasher import password_hasher
+from src.helpers.rate_limiter import login_rate_limiter
+from src.helpers.request_parser import parse_request
+from src.utils import logger
 
 ns_auth = Namespace("auth", description="Authentication resource")
 
 
+def revoke_token(jti, exp=None):
+    """Revokes a token in the database and in the blocklist of this worker"""
+    expires_at = datetime.utcfromtimestamp(exp) if exp else None
+    RevokedTokenModel.revoke(jti, expires_at=expires_at)
+    token_blocklist.add(jti, expires_at=expires_at)
+
+
+def upgrade_password_hash(user, password):
+    """Rehashes the password of a user with the current hash parameters
+
+    A failed upgrade does not fail the login, the hash is upgraded on a
+    later login instead.
+    """
+    try:
+        user.password = password_hasher.hash(password)
+        user.save_to_db()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Failure in upgrading password hash of %s: %s", user.email, e)
+
+
 @ns_auth.route("/register-user")
 class UserRegistration(Resource):
     """user registration"""
 
+    @parse_request(body_schema=user_registration_request_schema)
     @ns_auth.expect(user_registration_request)
     @ns_auth.response(200, "User registered successfully")
     @ns_auth.response(400, "Bad request")
     @ns_auth.response(403, "User already exists")
-    def post(self):
-        request_body = request.json
-        schema = UserRegistrationRequestSchema()
-        validation_errors = schema.validate(request_body)
-
-        if validation_errors:
-            abort(400, str(validation_errors))
-
-        email = request_body.get("email")
-        password = request_body.get("password")
-        name = request_body.get("name")
-        telephone = request_body.get("telephone")
-        role_id = request_body.get("role_id")
-        profile_photo = request_body.get("profile_photo")
-
+    def post(
+        self, email, name, password, telephone, profile_photo, role_id, is_disabled
+    ):
         if UserModel.find_by_username(email):
             return {"message": f"User {email} already exists"}, 409
 
         # create new user
         new_user = UserModel(
             email=email,
-            password=UserModel.generate_hash(password),
+            password=password_hasher.hash(password),
             name=name,
             telephone=telephone,
             profile_photo=profile_photo,
@@ -73,32 +93,39 @@ class UserRegistration(Resource):
 class UserLogin(Resource):
     """Login resource for user"""
 
+    @parse_request(body_schema=user_login_request_schema)
     @ns_auth.expect(user_login_request)
     @ns_auth.response(200, "User logged in successfully")
     @ns_auth.response(400, "Bad request")
     @ns_auth.response(404, "User does not exist")
     @ns_auth.response(401, "Wrong credentials")
-    def post(self):
-        request_body = request.json
-        schema = UserLoginRequestSchema()
-        validation_errors = schema.validate(request_body)
-
-        if validation_errors:
-            abort(400, str(validation_errors))
-
-        email = request_body["email"]
-        password = request_body["password"]
+    @ns_auth.response(429, "Too many failed logins")
+    def post(self, email, password):
+        # refuse before any query or hashing once the attempts are exhausted
+        retry_after = login_rate_limiter.retry_after(email, request.remote_addr)
+        if retry_after:
+            return (
+                {"message": "Too many failed logins, try again later"},
+                429,
+                {"Retry-After": str(math.ceil(retry_after))},
+            )
 
         # search by user by username
         current_user = UserModel.find_by_username(email)
 
         if not current_user:
+            login_rate_limiter.record_failure(email, request.remote_addr)
             return {"message": f"User {email} does not exist!"}, 404
 
         # compare request password and hash
-        if UserModel.verify_hash(password, current_user.password):
+        if password_hasher.verify(password, current_user.password):
+            login_rate_limiter.record_success(email, request.remote_addr)
+
+            if UserModel.needs_rehash(current_user.password):
+                upgrade_password_hash(current_user, password)
+
             # get role object
-            role_object = RolesModel().find_by_role_id(current_user.role_id)
+            role_object = reference_cache.role(current_user.role_id)
             access_token = create_access_token(identity=email, expires_delta=False)
             refresh_token = create_refresh_token(identity=email)
             return {
@@ -111,6 +138,7 @@ class UserLogin(Resource):
                 "role_name": role_object.name,
             }, 200
         else:
+            login_rate_limiter.record_failure(email, request.remote_addr)
             return {"message": "Wrong credentials"}, 401
 
 
@@ -127,8 +155,7 @@ class UserLogoutAccess(Resource):
         if not jti:
             abort(400, "No JWT provided")
         try:
-            revoked_token = RevokedTokenModel(revoked_token=jti)
-            revoked_token.save_to_db()
+            revoke_token(jti, get_jwt().get("exp"))
             return {"message": "Access token has been revoked"}, 200
         except Exception as e:
             return {"message": f"something went wrong: {str(e)}"}, 500
@@ -150,8 +177,7 @@ class UserLogoutRefresh(Resource):
             abort(400, "No JWT provided")
 
         try:
-            revoked_token = RevokedTokenModel(revoked_token=jti)
-            revoked_token.save_to_db()
+            revoke_token(jti, get_jwt().get("exp"))
             return {"message": "Refresh token has been revoked"}, 200
         except Exception as e:
             return {"message": f"something went wrong: {str(e)}"}, 500
@@ -1,5 +1,11 @@
+from flask import current_app
 from flask_restx import Namespace, Resource
 
+from src.extensions import db
+from src.helpers.db_pool import pool_stats
+from src.helpers.health import readiness_check
+from src.helpers.reference_cache import reference_cache
+
 ns_healthz = Namespace("healthz", description="Tests health of the RESTful API service")
 
 
@@ -11,3 +17,48 @@ class Healthz(Resource):
     @ns_healthz.response(500, "API service is not running")
     def get(self):
         return {"message": "API service is up and running"}, 200
+
+
+@ns_healthz.route("/live")
+class Liveness(Resource):
+    """Liveness probe, answered by LivenessMiddleware before reaching Flask"""
+
+    @ns_healthz.response(200, "Worker is alive")
+    def get(self):
+        # only reached when the app runs without the middleware
+        return {"status": "ok"}, 200
+
+
+@ns_healthz.route("/ready")
+class Readiness(Resource):
+    """Readiness probe of the database, the connection pool and FX rates"""
+
+    @ns_healthz.response(200, "Worker is ready to serve requests")
+    @ns_healthz.response(503, "Database is unreachable or the pool is saturated")
+    def get(self):
+        config = current_app.config
+        pool_capacity = (
+            0
+            if config["DB_PGBOUNCER"]
+            else config["DB_POOL_SIZE"] + config["DB_MAX_OVERFLOW"]
+        )
+        ready, checks = readiness_check.check(pool_capacity)
+        return {"ready": ready, "checks": checks}, 200 if ready else 503
+
+
+@ns_healthz.route("/reference-data")
+class ReferenceDataCacheStats(Resource):
+    """Hit and miss statistics of the roles and currency cache of this worker"""
+
+    @ns_healthz.response(200, "Reference data cache statistics")
+    def get(self):
+        return reference_cache.stats(), 200
+
+
+@ns_healthz.route("/db-pool")
+class DatabasePoolStats(Resource):
+    """Connection usage and checkout wait times of the pool of this worker"""
+
+    @ns_healthz.response(200, "Database pool statistics")
+    def get(self):
+        return pool_stats.snapshot(db.engine.pool), 200
@@ -0,0 +1,16 @@
+from flask import Response
+from flask_restx import Namespace, Resource
+
+from src.helpers import metrics
+
+ns_metrics = Namespace("metrics", description="Prometheus metrics of the API service")
+
+
+@ns_metrics.route("")
+class Metrics(Resource):
+    """Request, database, token, exchange rate and wallet metrics of all workers"""
+
+    @ns_metrics.response(200, "Metrics in the Prometheus text format")
+    def get(self):
+        body, content_type = metrics.latest()
+        return Response(body, mimetype=content_type)
@@ -1,16 +1,20 @@
 from datetime import datetime
 
-from flask import abort, request
+from flask import abort
 from flask_restx import Namespace, Resource
 from flask_jwt_extended import jwt_required
 
 from src.utils import pagination
 from src.app.db.model import RolesModel
+from src.helpers import serialization
+from src.helpers.reference_cache import reference_cache
+from src.helpers.request_parser import parse_request
 from src.app.schema.serializer import role_post_request, role
 from src.app.schema.validation_schema import (
-    RoleParamRequestSchema,
-    RolePostRequestSchema,
-    RolePutRequestSchema,
+    role_param_request_schema,
+    role_post_request_schema,
+    role_put_request_schema,
+    pagination_request_schema,
 )
 
 ns_role = Namespace("role", description="Role resource")
@@ -20,110 +24,78 @@ ns_role = Namespace("role", description="Role resource")
 class Role(Resource):
     """The role resource"""
 
-    @jwt_required
-    @ns_role.marshal_with(role)
+    @jwt_required()
+    @parse_request(args_schema=role_param_request_schema)
+    @serialization.marshal_with(ns_role, role)
     @ns_role.response(200, "Role details returned successfully")
     @ns_role.response(400, "Bad request")
     @ns_role.response(404, "Role not found")
     @ns_role.param("role_id", "ID of the role")
-    def get(self):
+    def get(self, role_id):
         """Get role"""
-        schema = RoleParamRequestSchema()
-        validation_errors = schema.validate(request.args)
-
-        if validation_errors:
-            abort(400, str(validation_errors))
-
-        role_id = request.args.get("role_id")
-        role = RolesModel.find_by_role_id(role_id)
+        role = reference_cache.role(role_id)
 
         if role:
-            return {"role_id": role.entity_id, "role_name": role.name}, 200
+            return {"role_id": role.id, "role_name": role.name}, 200
         else:
             abort(404, "Role does not exist")
 
-    @jwt_required
+    @jwt_required()
+    @parse_request(body_schema=role_post_request_schema)
     @ns_role.expect(role_post_request)
     @ns_role.response(200, "Role was added successfully")
     @ns_role.response(400, "Bad request")
     @ns_role.response(409, "Role already exists")
-    def post(self):
+    def post(self, role_name):
         """Create new role"""
-        request_body = request.json
-        schema = RolePostRequestSchema()
-        validation_errors = schema.validate(request_body)
-
-        if validation_errors:
-            abort(400, str(validation_errors))
-
-        role_name = request_body.get("role_name")
-
-        if RolesModel.find_by_name(role_name):
+        if reference_cache.role_by_name(role_name):
             return {"message": f"{role_name} role already exists"}, 409
 
         new_role = RolesModel(name=role_name)
 
         try:
             new_role.save_to_db()
+            reference_cache.bump_version()
             return {
                 "message": f"{role_name} role was created successfully",
             }, 200
         except Exception as e:
             return {"message": f"something went wrong: {str(e)}"}, 500
 
-    @jwt_required
+    @jwt_required()
+    @parse_request(
+        args_schema=role_param_request_schema, body_schema=role_put_request_schema
+    )
     @ns_role.expect(role_post_request)
     @ns_role.param("role_id", "ID of the role")
     @ns_role.response(200, "Role updated successfully")
     @ns_role.response(400, "Bad request")
     @ns_role.response(404, "Role does not exist")
-    def put(self):
+    def put(self, role_id, role_name):
         """Update role"""
-        request_body = request.json
-        request_body_schema = RolePutRequestSchema()
-        request_param_schema = RoleParamRequestSchema()
-        body_validation_errors = request_body_schema.validate(request_body)
-        args_validation_error = request_param_schema.validate(request.args)
-
-        if body_validation_errors:
-            abort(400, str(body_validation_errors))
-
-        if args_validation_error:
-            abort(400, str(args_validation_error))
-
-        # request body
-        role_name = request_body.get("role_name")
-
-        # query param
-        role_id = request.args.get("role_id")
-
         role = RolesModel.find_by_role_id(role_id)
 
         if role:
             role.name = role_name
             role.save_to_db()
+            reference_cache.bump_version()
             return {"message": f"{role_name} role has been updated successfully"}, 200
         else:
             abort(404, "Role not found")
 
-    @jwt_required
+    @jwt_required()
+    @parse_request(args_schema=role_param_request_schema)
     @ns_role.response(200, "Role deleted successfully")
     @ns_role.response(400, "Bad request")
     @ns_role.response(404, "Role not found")
     @ns_role.param("role_id", "ID of the role")
-    def delete(self):
+    def delete(self, role_id):
         """Delete role"""
-        schema = RoleParamRequestSchema()
-        validation_errors = schema.validate(request.args)
-
-        if validation_errors:
-            abort(400, str(validation_errors))
-
-        role_id = request.args.get("role_id")
         role = RolesModel.find_by_role_id(role_id)
 
         if role:
             role.delete_from_db()
+            reference_cache.bump_version()
             return {"message": f"Role {role.name} has been deleted successfully"}, 200
         else:
             abort(404, "Role not found")
@@ -133,24 +105,39 @@ class Role(Resource):
 class Users(Resource):
     """Roles resource"""
 
-    @jwt_required
-    @ns_role.marshal_with(role, as_list=True)
+    @jwt_required()
+    @parse_request(args_schema=pagination_request_schema)
+    @serialization.marshal_with(ns_role, role, as_list=True)
     @ns_role.response(200, "Roles returned successfully")
     @ns_role.response(400, "Bad request")
     @ns_role.response(404, "Roles not found")
-    @ns_role.param("page", "Page number")
+    @ns_role.param("page", "Page number, switches to offset pagination")
     @ns_role.param("limit", "Number of roles per page")
-    def get(self):
+    @ns_role.param("cursor", "X-Next-Cursor header value of the previous page")
+    @ns_role.param("include_total", "Return the total count in X-Total-Count")
+    def get(self, page=None, limit=None, cursor=None, include_total=False):
         """Gets all roles"""
-        page = request.args.get("page")
-        limit = request.args.get("limit")
-
-        role = RolesModel.get_all_paginated_roles(
-            page=pagination.default_page_value(page),
-            per_page=pagination.default_limit_value(limit),
-        )
-
-        role_items = role.items
+        headers = dict()
+
+        if page:
+            role = RolesModel.get_all_paginated_roles(
+                page=pagination.default_page_value(page),
+                per_page=pagination.default_limit_value(limit),
+            )
+            role_items = role.items
+        else:
+            try:
+                before = pagination.decode_cursor(cursor)
+            except ValueError as e:
+                abort(400, str(e))
+
+            role_items, has_more = RolesModel.get_roles_page(
+                limit=pagination.bounded_limit_value(limit), before=before
+            )
+            total = None
+            if include_total:
+                total = RolesModel.count_roles()
+            headers = pagination.page_headers(role_items, has_more, total)
 
         if role_items:
             new_role = []
@@ -159,6 +146,6 @@ class Users(Resource):
                 new_role_object["role_id"] = role_object.id
                 new_role_object["role_name"] = role_object.name
                 new_role.append(new_role_object)
-            return new_role, 200
+            return new_role, 200, headers
         else:
             abort(404, "No roles found")
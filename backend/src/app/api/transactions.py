@@ -1,21 +1,36 @@
-from decimal import Decimal
-
-from flask import abort, request
+from flask import Response, abort, current_app, stream_with_context
 from flask_restx import Namespace, Resource
 from flask_jwt_extended import jwt_required
-from src.app.api import user
 
-from src.app.schema.serializer import wallet, wallet_update
+from src.utils import pagination
+from src.helpers import export, metrics, serialization
+from src.helpers.conditional_get import conditional_get, etag_headers
+from src.helpers.idempotency import idempotent, IDEMPOTENCY_KEY_HEADER
+from src.helpers.rate_table import rate_table
+from src.helpers.request_parser import parse_request
+from src.extensions import db
+from src.app.schema.serializer import (
+    wallet,
+    wallet_update,
+    transaction,
+    transfer_batch_request,
+)
 from src.app.schema.validation_schema import (
-    UserRequestSchema,
-    WalletPutRequestSchema,
-    TransferRequestSchema,
+    user_request_schema,
+    wallet_put_request_schema,
+    transfer_request_schema,
+    transaction_list_request_schema,
+    transfer_batch_request_schema,
+    export_request_schema,
 )
 from src.app.db.model import (
     UserModel,
     WalletModel,
     TransactionsModel,
     CurrencyModel,
+    WalletNotFoundError,
+    InsufficientFundsError,
+    ExchangeRateError,
 )
 
 ns_transaction = Namespace("transaction", description="Financial transaction resource")
@@ -27,124 +42,173 @@ class Wallet(Resource):
     """Wallet resource"""
 
     @jwt_required()
-    @ns_transaction.marshal_with(wallet)
+    @parse_request(args_schema=user_request_schema)
+    @conditional_get(WalletModel.get_version)
+    @serialization.marshal_with(ns_transaction, wallet)
     @ns_transaction.response(200, "Wallet details retrieved successfully")
+    @ns_transaction.response(304, "Wallet has not changed since the given ETag")
     @ns_transaction.response(400, "Bad request")
     @ns_transaction.response(404, "Wallet does not exist")
     @ns_transaction.param("user_id", "ID of the user that the wallet belongs to")
-    def get(self):
+    @ns_transaction.param(
+        "If-None-Match", "ETag of a previous response of the wallet", _in="header"
+    )
+    def get(self, user_id):
         """Get wallet"""
-        schema = UserRequestSchema()
-        validation_errors = schema.validate(request.args)
+        result = WalletModel.find_by_user_id(user_id=user_id)
 
-        if validation_errors:
-            abort(400, str(validation_errors))
-
-        user_id = request.args.get("user_id")
-
-        if not WalletModel.find_by_user_id(user_id=user_id):
+        if not result:
             abort(404, f"Wallet for specified user {user_id} does not exist")
 
-        wallet, currency = WalletModel.find_by_user_id(user_id=user_id)
+        wallet, currency = result
+        balance, version = wallet.balance_and_version()
 
-        return {
-            "amount": wallet.amount,
-            "currency": currency.currency_code,
-        }, 200
+        return (
+            {
+                "amount": balance,
+                "currency": currency.currency_code,
+            },
+            200,
+            etag_headers(version),
+        )
 
     @jwt_required()
+    @idempotent
+    @parse_request(
+        args_schema=user_request_schema, body_schema=wallet_put_request_schema
+    )
     @ns_transaction.expect(wallet_update)
     @ns_transaction.response(200, "Wallet credited successfully")
     @ns_transaction.response(400, "Bad request")
     @ns_transaction.response(404, "Wallet does not exist")
+    @ns_transaction.response(409, "Request with the same key is in progress")
+    @ns_transaction.response(422, "Key was used with a different request")
     @ns_transaction.param("user_id", "ID of the user that the wallet belongs to")
-    def put(self):
+    @ns_transaction.param(
+        IDEMPOTENCY_KEY_HEADER, "Unique key to safely retry the request", _in="header"
+    )
+    def put(self, user_id, amount, currency_id=None):
         """Credits money wallet"""
-        request_body = request.json
-
-        request_param_schema = UserRequestSchema()
-        request_body_schema = WalletPutRequestSchema()
-
-        params_validation_errors = request_param_schema.validate(request.args)
-        body_validation_errors = request_body_schema.validate(request_body)
-
-        if params_validation_errors:
-            abort(400, str(params_validation_errors))
-
-        if body_validation_errors:
-            abort(400, str(body_validation_errors))
-
-        # query param
-        user_id = request.args.get("user_id")
-
-        if not WalletModel.find_by_user_id(user_id=user_id):
+        try:
+            WalletModel.credit(user_id=user_id, amount=amount)
+        except WalletNotFoundError:
+            metrics.record_wallet_operation("credit", "wallet_not_found")
             abort(404, f"Wallet for specified user {user_id} does not exist")
 
-        wallet, currency = WalletModel.find_by_user_id(user_id=user_id)
-
-        if not wallet:
-            return f"Wallet of user id {user_id} does not exist", 404
-
-        # request body
-        amount = request_body.get("amount")
-        currency_id = request_body.get("currency_id")
-
-        wallet.amount = wallet.amount + Decimal(amount)
-        # wallet.currency_id = currency_id
-        # wallet.user_id = user_id
-        wallet.save_to_db()
+        metrics.record_wallet_operation("credit", "credited")
         return {"message": "Wallet credited successfully"}, 200
 
     @jwt_required()
+    @idempotent
+    @parse_request(
+        args_schema=user_request_schema, body_schema=wallet_put_request_schema
+    )
     @ns_transaction.expect(wallet_update)
     @ns_transaction.response(200, "Wallet successfully")
     @ns_transaction.response(400, "Bad request")
     @ns_transaction.response(404, "Wallet does not exist")
     @ns_transaction.response(406, "You have insufficient funds")
+    @ns_transaction.response(409, "Request with the same key is in progress")
+    @ns_transaction.response(422, "Key was used with a different request")
     @ns_transaction.param("user_id", "ID of the user that the wallet belongs to")
-    def delete(self):
+    @ns_transaction.param(
+        IDEMPOTENCY_KEY_HEADER, "Unique key to safely retry the request", _in="header"
+    )
+    def delete(self, user_id, amount, currency_id=None):
         """Debits money wallet"""
-        request_body = request.json
-
-        request_param_schema = UserRequestSchema()
-        request_body_schema = WalletPutRequestSchema()
-
-        params_validation_errors = request_param_schema.validate(request.args)
-        body_validation_errors = request_body_schema.validate(request_body)
+        try:
+            WalletModel.debit(user_id=user_id, amount=amount)
+        except WalletNotFoundError:
+            metrics.record_wallet_operation("debit", "wallet_not_found")
+            abort(404, f"Wallet for specified user {user_id} does not exist")
+        except InsufficientFundsError:
+            metrics.record_wallet_operation("debit", "insufficient_funds")
+            return {"message": "You have insufficient funds"}, 406
 
-        if params_validation_errors:
-            abort(400, str(params_validation_errors))
+        metrics.record_wallet_operation("debit", "debited")
+        return {"message": "Wallet debited successfully"}, 200
 
-        if body_validation_errors:
-            abort(400, str(body_validation_errors))
 
-        # query param
-        user_id = request.args.get("user_id")
+@ns_transaction.route("/record")
+class RecordTransactions(Resource):
+    """Transaction ledger resource"""
 
-        if not WalletModel.find_by_user_id(user_id=user_id):
-            abort(404, f"Wallet for specified user {user_id} does not exist")
+    @jwt_required()
+    @parse_request(args_schema=transaction_list_request_schema)
+    @serialization.marshal_with(ns_transaction, transaction, as_list=True)
+    @ns_transaction.response(200, "Transactions returned successfully")
+    @ns_transaction.response(400, "Bad request")
+    @ns_transaction.param("user_id", "ID of the user that the transactions belong to")
+    @ns_transaction.param("limit", "Number of transactions per page")
+    @ns_transaction.param("cursor", "X-Next-Cursor header value of the previous page")
+    @ns_transaction.param("include_total", "Return the total count in X-Total-Count")
+    def get(self, user_id, page=None, limit=None, cursor=None, include_total=False):
+        """Gets transactions of a user, newest first"""
+        limit = pagination.bounded_limit_value(limit)
+
+        try:
+            before = pagination.decode_cursor(cursor)
+        except ValueError as e:
+            abort(400, str(e))
+
+        entries, has_more = TransactionsModel.get_user_transactions(
+            user_id=user_id, limit=limit, before=before
+        )
 
-        wallet, currency = WalletModel.find_by_user_id(user_id=user_id)
+        transactions = []
+        for entry in entries:
+            transaction_object = dict()
+            transaction_object["transaction_id"] = entry.id
+            transaction_object["reference"] = entry.reference
+            transaction_object["transaction_type"] = entry.transaction_type
+            transaction_object["entry_type"] = entry.entry_type
+            transaction_object["amount"] = entry.amount
+            transaction_object["balance_after"] = entry.balance_after
+            transaction_object["counterparty_user_id"] = entry.counterparty_user_id
+            transaction_object["exchange_rate"] = entry.exchange_rate
+            transaction_object["rate_snapshot_id"] = entry.rate_snapshot_id
+            transaction_object["created_at"] = entry.created_at
+            transactions.append(transaction_object)
 
-        if not wallet:
-            return f"Wallet of user id {user_id} does not exist", 404
+        total = None
+        if include_total:
+            total = TransactionsModel.count_user_transactions(user_id)
 
-        # request body
-        amount = request_body.get("amount")
-        currency_id = request_body.get("currency_id")
+        return transactions, 200, pagination.page_headers(entries, has_more, total)
 
-        if wallet.amount >= Decimal(amount):
-            wallet.amount = wallet.amount - Decimal(amount)
-            # wallet.currency_id = currency_id
-            # wallet.user_id = user_id
-            wallet.save_to_db()
-            return {"message": "Wallet debited successfully"}, 200
-        return {"message": "You have insufficient funds"}, 406
 
+@ns_transaction.route("/export")
+class ExportTransactions(Resource):
+    """Transaction ledger export resource"""
 
-@ns_transaction.route("/record")
-class RecordTransactions(Resource):
-    pass
+    @jwt_required()
+    @parse_request(args_schema=export_request_schema)
+    @ns_transaction.produces(list(export.MIMETYPES.values()))
+    @ns_transaction.response(200, "Transactions streamed as NDJSON or CSV")
+    @ns_transaction.response(400, "Bad request")
+    @ns_transaction.param("format", "ndjson (default) or csv")
+    @ns_transaction.param("user_id", "ID of the user whose transactions to export")
+    @ns_transaction.param("created_from", "Earliest time in ISO 8601, inclusive")
+    @ns_transaction.param("created_to", "Latest time in ISO 8601, exclusive")
+    def get(
+        self,
+        export_format=export.NDJSON,
+        user_id=None,
+        created_from=None,
+        created_to=None,
+    ):
+        """Exports ledger entries, oldest first
+
+        Rows are streamed as they are read, so exports of any size take the
+        same memory.
+        """
+        query = TransactionsModel.iter_export_rows(
+            user_id=user_id,
+            created_from=created_from,
+            created_to=created_to,
+            chunk_size=current_app.config["EXPORT_CHUNK_SIZE"],
+        )
+        return export.export_response(query, export_format, "transactions")
 
 
 @ns_transaction.route("/transfer")
@@ -152,61 +216,125 @@ class TransferFunds(Resource):
     """Transfer resource"""
 
     @jwt_required()
+    @idempotent
+    @parse_request(
+        args_schema=transfer_request_schema, body_schema=wallet_put_request_schema
+    )
     @ns_transaction.expect(wallet_update)
     @ns_transaction.response(200, "Wallet credited successfully")
     @ns_transaction.response(400, "Bad request")
     @ns_transaction.response(404, "Wallet does not exist")
+    @ns_transaction.response(409, "Request with the same key is in progress")
+    @ns_transaction.response(422, "Key was used with a different request")
+    @ns_transaction.response(503, "No exchange rate between the wallet currencies")
     @ns_transaction.param("current_user_id", "ID of the user wants to transfer funds")
     @ns_transaction.param(
         "target_user_id", "ID of the user that receives transferred funds"
     )
-    def put(self):
-        """Transfer money from one user to another"""
-        request_body = request.json
-
-        request_param_schema = TransferRequestSchema()
-        request_body_schema = WalletPutRequestSchema()
-
-        params_validation_errors = request_param_schema.validate(request.args)
-        body_validation_errors = request_body_schema.validate(request_body)
-
-        if params_validation_errors:
-            abort(400, str(params_validation_errors))
-
-        if body_validation_errors:
-            abort(400, str(body_validation_errors))
-
-        # query param
-        current_user_id = request.args.get("current_user_id")
-        target_user_id = request.args.get("target_user_id")
-
-        if not WalletModel.find_by_user_id(user_id=current_user_id):
-            abort(
-                404, f"Wallet for money transfer user {current_user_id} does not exist"
-            )
-
-        if not WalletModel.find_by_user_id(user_id=target_user_id):
-            abort(
-                404, f"Wallet for money receiving user {target_user_id} does not exist"
+    @ns_transaction.param(
+        IDEMPOTENCY_KEY_HEADER, "Unique key to safely retry the request", _in="header"
+    )
+    def put(self, current_user_id, target_user_id, amount, currency_id=None):
+        """Transfer money from one user to another
+
+        The amount is in the currency of the sender's wallet, currency_id
+        may only name that currency. When the receiver's wallet holds another
+        currency the amount is converted at the rate of the latest exchange
+        rate snapshot.
+        """
+        try:
+            WalletModel.transfer(
+                source_user_id=current_user_id,
+                target_user_id=target_user_id,
+                amount=amount,
+                rate_lookup=rate_table.rate,
+                currency_id=currency_id,
             )
+        except ValueError as e:
+            metrics.record_wallet_operation("transfer", "invalid_currency")
+            abort(400, str(e))
+        except WalletNotFoundError as e:
+            metrics.record_wallet_operation("transfer", "wallet_not_found")
+            abort(404, str(e))
+        except InsufficientFundsError:
+            metrics.record_wallet_operation("transfer", "insufficient_funds")
+            return {"message": "You have insufficient funds"}, 406
+        except ExchangeRateError as e:
+            metrics.record_wallet_operation("transfer", "exchange_rate_unavailable")
+            abort(503, str(e))
+
+        metrics.record_wallet_operation("transfer", "transferred")
+        return {"message": "Money has been transferred successfully"}, 200
+
+
+@ns_transaction.route("/transfers:batch")
+class TransferFundsBatch(Resource):
+    """Batch transfer resource"""
 
-        wallet_current, currency_current = WalletModel.find_by_user_id(
-            user_id=current_user_id
-        )
-
-        wallet_target, currency_target = WalletModel.find_by_user_id(
-            user_id=target_user_id
+    @jwt_required()
+    @parse_request(body_schema=transfer_batch_request_schema)
+    @ns_transaction.expect(transfer_batch_request)
+    @ns_transaction.response(200, "Transfers processed, see the result of each one")
+    @ns_transaction.response(400, "Bad request")
+    @ns_transaction.response(413, "Too many transfers in one batch")
+    def post(self, transfers):
+        """Transfers money between several pairs of users
+
+        Batches up to TRANSFER_BATCH_CHUNK_SIZE transfers are applied in one
+        transaction and answered with a JSON object. Larger batches are
+        applied one chunk per transaction and the result of each transfer is
+        streamed as a line of NDJSON as soon as its chunk is committed.
+        """
+        transfers = [
+            (item["source_user_id"], item["target_user_id"], item["amount"])
+            for item in transfers
+        ]
+
+        max_size = current_app.config["TRANSFER_BATCH_MAX_SIZE"]
+        if len(transfers) > max_size:
+            abort(413, f"A batch can contain at most {max_size} transfers")
+
+        chunk_size = current_app.config["TRANSFER_BATCH_CHUNK_SIZE"]
+        chunks = [
+            (offset, transfers[offset : offset + chunk_size])
+            for offset in range(0, len(transfers), chunk_size)
+        ]
+
+        if len(chunks) == 1:
+            return {"results": _transfer_chunk_results(*chunks[0])}, 200
+
+        def generate():
+            for offset, chunk in chunks:
+                for result in _transfer_chunk_results(offset, chunk):
+                    yield serialization.dumps(result) + b"\n"
+
+        return Response(
+            stream_with_context(generate()), mimetype="application/x-ndjson"
         )
 
-        # request body
-        amount = request_body.get("amount")
-        currency_id = request_body.get("currency_id")
-
-        if wallet_current.amount >= Decimal(amount):
-            wallet_current.amount = wallet_current.amount - Decimal(amount)
-            wallet_target.amount = wallet_target.amount + Decimal(amount)
 
-            wallet_current.save_to_db()
-            wallet_target.save_to_db()
-            return {"message": "Money has been transferred successfully"}, 200
-        return {"message": "You have insufficient funds"}, 406
+def _transfer_chunk_results(offset, transfers):
+    """Applies a chunk of a batch transfer and returns the result of each item"""
+    try:
+        errors = WalletModel.transfer_batch(transfers, rate_lookup=rate_table.rate)
+    except Exception as e:
+        db.session.rollback()
+        errors = [e] * len(transfers)
+
+    results = []
+    for index, error in enumerate(errors, start=offset):
+        if error is None:
+            status = "transferred"
+            message = "Money has been transferred successfully"
+        elif isinstance(error, InsufficientFundsError):
+            status, message = "insufficient_funds", "You have insufficient funds"
+        elif isinstance(error, WalletNotFoundError):
+            status, message = "wallet_not_found", str(error)
+        elif isinstance(error, ExchangeRateError):
+            status, message = "exchange_rate_unavailable", str(error)
+        else:
+            status, message = "failed", f"something went wrong: {str(error)}"
+        metrics.record_wallet_operation("transfer", status)
+        results.append({"index": index, "status": status, "message": message})
+
+    return results
@@ -1,16 +1,20 @@
-from datetime import datetime
-
-from flask import abort, request
+from flask import abort, current_app
 from flask_restx import Namespace, Resource
 from flask_jwt_extended import jwt_required
 
 from src.utils import pagination
-from src.app.db.model import UserModel, RolesModel, WalletModel
+from src.app.db.model import UserModel, WalletModel
+from src.helpers import export, serialization
+from src.helpers.conditional_get import conditional_get, etag_headers
+from src.helpers.password_hasher import password_hasher
+from src.helpers.request_parser import parse_request
 from src.app.schema.serializer import user_post_request, user, user_get_request
 from src.app.schema.validation_schema import (
-    UserRequestSchema,
-    UserRegistrationRequestSchema,
-    UserPutRequestSchema,
+    user_request_schema,
+    user_registration_request_schema,
+    user_put_request_schema,
+    pagination_request_schema,
+    export_request_schema,
 )
 
 ns_user = Namespace("users", description="User resource")
@@ -21,64 +25,53 @@ class User(Resource):
     """The user resource"""
 
     @jwt_required()
-    @ns_user.marshal_with(user)
+    @parse_request(args_schema=user_request_schema)
+    @conditional_get(UserModel.get_version)
+    @serialization.marshal_with(ns_user, user)
     @ns_user.response(200, "User details returned successfully")
+    @ns_user.response(304, "User has not changed since the given ETag")
     @ns_user.response(400, "Bad request")
     @ns_user.response(404, "User not found")
     @ns_user.param("user_id", "ID of the user")
-    def get(self):
+    @ns_user.param("If-None-Match", "ETag of a previous response", _in="header")
+    def get(self, user_id):
         """Get user"""
-        schema = UserRequestSchema()
-        validation_errors = schema.validate(request.args)
-
-        if validation_errors:
-            abort(400, str(validation_errors))
-
-        user_id = request.args.get("user_id")
-        user = UserModel.find_by_user_id(user_id)
+        user = UserModel.find_by_user_id_with_role(user_id)
 
         if user:
-            role_object = RolesModel().find_by_role_id(user.role_id)
-            return {
-                "user_id": user.id,
-                "name": user.name,
-                "email": user.email,
-                "telephone": user.telephone,
-                "profile_photo": user.profile_photo,
-                "last_login_date": user.last_login_date,
-                "role": role_object.name,
-                "is_disabled": user.is_disabled,
-            }, 200
+            return (
+                {
+                    "user_id": user.id,
+                    "name": user.name,
+                    "email": user.email,
+                    "telephone": user.telephone,
+                    "profile_photo": user.profile_photo,
+                    "last_login_date": user.last_login_date,
+                    "role": user.roles.name,
+                    "is_disabled": user.is_disabled,
+                },
+                200,
+                etag_headers(user.version()),
+            )
         else:
             abort(404, "User does not exist")
 
     @jwt_required()
+    @parse_request(body_schema=user_registration_request_schema)
     @ns_user.expect(user_post_request)
     @ns_user.response(200, "User was added successfully")
     @ns_user.response(400, "Bad request")
     @ns_user.response(409, "User already exists")
-    def post(self):
+    def post(
+        self, email, name, password, telephone, profile_photo, role_id, is_disabled
+    ):
         """Adds new user"""
-        request_body = request.json
-        schema = UserRegistrationRequestSchema()
-        validation_errors = schema.validate(request_body)
-
-        if validation_errors:
-            abort(400, str(validation_errors))
-
-        password = request_body.get("password")
-        name = request_body.get("name")
-        email = request_body.get("email")
-        telephone = request_body.get("telephone")
-        profile_photo = request_body.get("profile_photo")
-        role_id = request_body.get("role_id")
-
         if UserModel.find_by_username(email):
             return {"message": f"User {email} already exists"}, 409
 
         # create new user
         new_user = UserModel(
-            password=UserModel.generate_hash(password),
+            password=password_hasher.hash(password),
             name=name,
             email=email,
             telephone=telephone,
@@ -98,37 +91,24 @@ class User(Resource):
             return {"message": f"something went wrong: {str(e)}"}, 500
 
     @jwt_required()
+    @parse_request(args_schema=user_request_schema, body_schema=user_put_request_schema)
     @ns_user.expect(user_post_request)
     @ns_user.param("user_id", "ID of the user")
     @ns_user.response(200, "User updated successfully")
     @ns_user.response(400, "Bad request")
     @ns_user.response(404, "User does not exist")
-    def put(self):
+    def put(
+        self,
+        user_id,
+        email,
+        name,
+        profile_photo,
+        password,
+        telephone,
+        role_id,
+        is_disabled,
+    ):
         """Updates user"""
-        request_body = request.json
-        request_body_schema = UserPutRequestSchema()
-        request_param_schema = UserRequestSchema()
-        body_validation_errors = request_body_schema.validate(request_body)
-        args_validation_error = request_param_schema.validate(request.args)
-
-        if body_validation_errors:
-            abort(400, str(body_validation_errors))
-
-        if args_validation_error:
-            abort(400, str(args_validation_error))
-
-        # request body
-        email = request_body.get("email")
-        password = request_body.get("password")
-        name = request_body.get("name")
-        telephone = request_body.get("telephone")
-        profile_photo = request_body.get("profile_photo")
-        role_id = request_body.get("role_id")
-        is_disabled = request_body.get("is_disabled")
-
-        # query param
-        user_id = request.args.get("user_id")
-
         user = UserModel.find_by_user_id(user_id)
         if not user:
             return {"message": f"User of id {user_id} does not exist"}, 404
@@ -139,8 +119,7 @@ class User(Resource):
                 user.email = email
                 user.profile_photo = profile_photo
                 user.telephone = telephone
-                user.password = UserModel.generate_hash(password)
-                user.updated_at = datetime.utcnow()
+                user.password = password_hasher.hash(password)
                 user.role_id = role_id
                 user.is_disabled = is_disabled
                 user.save_to_db()
@@ -151,20 +130,13 @@ class User(Resource):
             return {"message": f"something went wrong: {str(e)}"}, 500
 
     @jwt_required()
+    @parse_request(args_schema=user_request_schema)
     @ns_user.response(200, "User deleted successfully")
     @ns_user.response(400, "Bad request")
     @ns_user.response(404, "User not found")
     @ns_user.param("user_id", "ID of the user")
-    def delete(self):
+    def delete(self, user_id):
         """Deletes user"""
-        schema = UserRequestSchema()
-        validation_errors = schema.validate(request.args)
-
-        if validation_errors:
-            abort(400, str(validation_errors))
-
-        user_id = request.args.get("user_id")
-
         try:
             user = UserModel.find_by_user_id(user_id)
             if user:
@@ -181,23 +153,38 @@ class Users(Resource):
     """The users resource"""
 
     @jwt_required()
-    @ns_user.marshal_with(user, as_list=True)
+    @parse_request(args_schema=pagination_request_schema)
+    @serialization.marshal_with(ns_user, user, as_list=True)
     @ns_user.response(200, "Users returned successfully")
     @ns_user.response(400, "Bad request")
     @ns_user.response(404, "Users not found")
-    @ns_user.param("page", "Page number")
+    @ns_user.param("page", "Page number, switches to offset pagination")
     @ns_user.param("limit", "Number of users per page")
-    def get(self):
+    @ns_user.param("cursor", "X-Next-Cursor header value of the previous page")
+    @ns_user.param("include_total", "Return the total count in X-Total-Count")
+    def get(self, page=None, limit=None, cursor=None, include_total=False):
         """Gets all users"""
-        page = request.args.get("page")
-        limit = request.args.get("limit")
-
-        user = UserModel.get_all_paginated_users(
-            page=pagination.default_page_value(page),
-            per_page=pagination.default_limit_value(limit),
-        )
-
-        user_items = user.items
+        headers = dict()
+
+        if page:
+            user = UserModel.get_all_paginated_users(
+                page=pagination.default_page_value(page),
+                per_page=pagination.default_limit_value(limit),
+            )
+            user_items = user.items
+        else:
+            try:
+                before = pagination.decode_cursor(cursor)
+            except ValueError as e:
+                abort(400, str(e))
+
+            user_items, has_more = UserModel.get_users_page(
+                limit=pagination.bounded_limit_value(limit), before=before
+            )
+            total = None
+            if include_total:
+                total = UserModel.count_users()
+            headers = pagination.page_headers(user_items, has_more, total)
 
         if user_items:
             new_users = []
@@ -205,15 +192,48 @@ class Users(Resource):
             # data transformation
             for user_object in user_items:
                 new_user_object = dict()
-                role_object = RolesModel().find_by_role_id(user_object.role_id)
                 new_user_object["user_id"] = user_object.id
                 new_user_object["name"] = user_object.name
                 new_user_object["email"] = user_object.email
                 new_user_object["telephone"] = user_object.telephone
                 new_user_object["profile_photo"] = user_object.profile_photo
-                new_user_object["role"] = role_object.name
+                new_user_object["role"] = user_object.roles.name
                 new_user_object["is_disabled"] = user_object.is_disabled
                 new_users.append(new_user_object)
-            return new_users, 200
+            return new_users, 200, headers
         else:
             abort(404, "No users found")
+
+
+@ns_user.route("/export")
+class UsersExport(Resource):
+    """The users export resource"""
+
+    @jwt_required()
+    @parse_request(args_schema=export_request_schema)
+    @ns_user.produces(list(export.MIMETYPES.values()))
+    @ns_user.response(200, "Users streamed as NDJSON or CSV")
+    @ns_user.response(400, "Bad request")
+    @ns_user.param("format", "ndjson (default) or csv")
+    @ns_user.param("user_id", "ID of a single user to export")
+    @ns_user.param("created_from", "Earliest creation time in ISO 8601, inclusive")
+    @ns_user.param("created_to", "Latest creation time in ISO 8601, exclusive")
+    def get(
+        self,
+        export_format=export.NDJSON,
+        user_id=None,
+        created_from=None,
+        created_to=None,
+    ):
+        """Exports users, oldest first
+
+        Rows are streamed as they are read, so exports of any size take the
+        same memory.
+        """
+        query = UserModel.iter_export_rows(
+            user_id=user_id,
+            created_from=created_from,
+            created_to=created_to,
+            chunk_size=current_app.config["EXPORT_CHUNK_SIZE"],
+        )
+        return export.export_response(query, export_format, "users")
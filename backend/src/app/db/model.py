@@ -1,8 +1,48 @@
+import json
 from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from uuid import uuid4
 
-from passlib.hash import pbkdf2_sha256
+from passlib.context import CryptContext
+from sqlalchemy import and_, func, literal_column, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import joinedload
+from sqlalchemy.sql.expression import FunctionElement
 
 from src.extensions import db
+from src.utils import pagination
+
+password_context = CryptContext(schemes=["pbkdf2_sha256"])
+
+
+class UtcNow(FunctionElement):
+    """Current UTC time as a naive timestamp, evaluated by the database
+
+    Timestamps are stored as naive UTC, like datetime.utcnow. now() would
+    store the time of the session time zone of PostgreSQL instead.
+    """
+
+    type = db.DateTime()
+    inherit_cache = True
+
+
+@compiles(UtcNow, "postgresql")
+def _compile_utcnow_postgresql(element, compiler, **kwargs):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(UtcNow, "sqlite")
+def _compile_utcnow_sqlite(element, compiler, **kwargs):
+    # UTC like CURRENT_TIMESTAMP, but with the milliseconds that keep rows
+    # in order, padded to the microseconds SQLAlchemy stores
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+@compiles(UtcNow)
+def _compile_utcnow(element, compiler, **kwargs):
+    return "CURRENT_TIMESTAMP"
 
 
 class BaseModel(db.Model):
@@ -16,8 +56,12 @@ class BaseModel(db.Model):
     __abstract__ = True
 
     id = db.Column(db.Integer, primary_key=True)
-    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow())
-    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow())
+    # stamped by the database clock, so every worker and rows inserted
+    # outside of the ORM agree on the time
+    created_at = db.Column(db.DateTime, nullable=False, server_default=UtcNow())
+    updated_at = db.Column(
+        db.DateTime, nullable=False, server_default=UtcNow(), onupdate=UtcNow()
+    )
 
     def save_to_db(self):
         """Writes data to the database"""
@@ -29,12 +73,159 @@ class BaseModel(db.Model):
         db.session.delete(self)
         db.session.commit()
 
+    @classmethod
+    def bulk_upsert(cls, rows, conflict_columns, update_columns=()):
+        """Inserts rows with a single INSERT ... ON CONFLICT statement
+
+        Rows that conflict with an existing row on conflict_columns overwrite
+        its update_columns, or are skipped when update_columns is empty.
+        Databases other than PostgreSQL and SQLite have no ON CONFLICT clause
+        and upsert the rows one at a time through the session instead.
+        Changes are not committed here.
+
+        Args:
+            rows (list): Dicts of column values, one per row
+
+        Returns:
+            int: The number of rows inserted or updated
+        """
+        if not rows:
+            return 0
+
+        dialect = db.engine.dialect.name
+        if dialect == "postgresql":
+            insert = postgresql.insert
+        elif dialect == "sqlite":
+            insert = sqlite.insert
+        else:
+            return cls._merge_rows(rows, conflict_columns, update_columns)
+
+        statement = insert(cls.__table__).values(rows)
+
+        if update_columns:
+            statement = statement.on_conflict_do_update(
+                index_elements=conflict_columns,
+                set_={
+                    column: statement.excluded[column]
+                    for column in (*update_columns, "updated_at")
+                },
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(
+                index_elements=conflict_columns
+            )
+
+        return db.session.execute(statement).rowcount
+
+    @classmethod
+    def _merge_rows(cls, rows, conflict_columns, update_columns):
+        """Upserts rows one at a time through the session, see bulk_upsert"""
+        count = 0
+
+        for row in rows:
+            existing = cls.query.filter_by(
+                **{column: row[column] for column in conflict_columns}
+            ).first()
+
+            if existing is None:
+                db.session.add(cls(**row))
+            elif update_columns:
+                for column in update_columns:
+                    setattr(existing, column, row[column])
+            else:
+                continue
+
+            count += 1
+
+        db.session.flush()
+        return count
+
+    @classmethod
+    def _filter_export(cls, query, user_column, user_id, created_from, created_to):
+        """Applies the user and creation time filters of an export to query"""
+        if user_id is not None:
+            query = query.filter(user_column == user_id)
+
+        if created_from is not None:
+            query = query.filter(cls.created_at >= created_from)
+
+        if created_to is not None:
+            query = query.filter(cls.created_at < created_to)
+
+        return query
+
+    @classmethod
+    def keyset_page(cls, query, limit=10, before=None):
+        """Returns a page of rows of query ordered newest first
+
+        Pages are read with keyset pagination on (created_at, id) so deep
+        pages cost the same as the first one. One extra row is fetched to
+        tell whether another page follows.
+
+        Args:
+            limit (int): Rows per page, kept between 1 and MAX_LIMIT_VALUE
+            before (tuple): created_at and id of the last row of the previous page
+
+        Returns:
+            tuple: The rows of the page and whether more rows follow
+        """
+        if before:
+            created_at, row_id = before
+            query = query.filter(
+                or_(
+                    cls.created_at < created_at,
+                    and_(cls.created_at == created_at, cls.id < row_id),
+                )
+            )
+
+        limit = pagination.bounded_limit_value(limit)
+        rows = (
+            query.order_by(cls.created_at.desc(), cls.id.desc()).limit(limit + 1).all()
+        )
+        return rows[:limit], len(rows) > limit
+
+
+class ReferenceDataVersionModel(BaseModel):
+    """Version counter of the roles and currency reference data
+
+    Bumped whenever roles or currencies change so that workers know to
+    reload their cached copy.
+    """
+
+    __tablename__ = "reference_data_version"
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def get_version(cls):
+        """Returns the current reference data version"""
+        return db.session.query(cls.version).filter_by(id=1).scalar() or 0
+
+    @classmethod
+    def bump(cls):
+        """Increments the reference data version and returns it"""
+        updated = cls.query.filter_by(id=1).update(
+            {"version": cls.version + 1}, synchronize_session=False
+        )
+
+        if not updated:
+            db.session.add(cls(id=1, version=1))
+
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # another worker created the row first
+            db.session.rollback()
+            return cls.bump()
+
+        return cls.get_version()
+
 
 class RolesModel(BaseModel):
     """Generates roles table"""
 
     __tablename__ = "roles"
-    name = db.Column(db.String(128), nullable=False)
+    __table_args__ = (db.Index("ix_roles_created_at_id", "created_at", "id"),)
+    name = db.Column(db.String(128), nullable=False, unique=True)
     users = db.relationship("UserModel", backref="roles", lazy=True)
 
     def __repr__(self):
@@ -60,6 +251,20 @@ class RolesModel(BaseModel):
         """Returns all roles"""
         return cls.query.all()
 
+    @classmethod
+    def get_roles_page(cls, limit=10, before=None):
+        """Returns a keyset page of roles, newest first
+
+        Returns:
+            tuple: The roles of the page and whether more roles follow
+        """
+        return cls.keyset_page(cls.query, limit=limit, before=before)
+
+    @classmethod
+    def count_roles(cls):
+        """Returns the number of roles"""
+        return cls.query.count()
+
     @classmethod
     def get_all_paginated_roles(cls, page=1, per_page=10):
         """Returns all roles by page and limit"""
@@ -73,16 +278,30 @@ class UserModel(BaseModel):
     """Generates user table"""
 
     __tablename__ = "users"
+    __table_args__ = (db.Index("ix_users_created_at_id", "created_at", "id"),)
     name = db.Column(db.String(40), nullable=False)
     email = db.Column(db.String(40), nullable=False, unique=True)
     telephone = db.Column(db.String(40), nullable=True)
     password = db.Column(db.String(), nullable=False)
     profile_photo = db.Column(db.String(), nullable=True)
     is_disabled = db.Column(db.Boolean, nullable=False, default=False)
-    last_login_date = db.Column(db.DateTime, nullable=True, default=datetime.utcnow())
+    last_login_date = db.Column(db.DateTime, nullable=True, server_default=UtcNow())
     role_id = db.Column(db.Integer, db.ForeignKey("roles.id"), nullable=False)
+    # bumped by every UPDATE of the row, ORM flushes and bulk statements alike
+    row_version = db.Column(
+        db.Integer,
+        nullable=False,
+        default=1,
+        server_default="1",
+        onupdate=literal_column("row_version + 1"),
+    )
     wallet = db.relationship("WalletModel", uselist=False, backref="users", lazy=True)
-    transactions = db.relationship("TransactionsModel", backref="users", lazy=True)
+    transactions = db.relationship(
+        "TransactionsModel",
+        backref="users",
+        lazy=True,
+        foreign_keys="TransactionsModel.user_id",
+    )
 
     def __repr__(self):
         return "<name: {} >".format(self.name)
@@ -97,27 +316,130 @@ class UserModel(BaseModel):
         """Returns user by user id"""
         return cls.query.filter_by(id=user_id).first()
 
+    @classmethod
+    def find_by_user_id_with_role(cls, user_id):
+        """Returns user by user id with its role loaded in the same query"""
+        return cls.query.options(joinedload(cls.roles)).filter_by(id=user_id).first()
+
+    def version(self):
+        """Returns the version of the user details, as get_version does"""
+        return self.row_version, self.roles.updated_at
+
+    @classmethod
+    def get_version(cls, user_id):
+        """Returns what the user details of a user depend on, without loading them
+
+        The role name is part of the details, so the update time of the role
+        is returned along with the row version of the user.
+
+        Returns:
+            tuple: The row version and the role update time, or None if the
+            user does not exist
+        """
+        return (
+            db.session.query(cls.row_version, RolesModel.updated_at)
+            .join(RolesModel, cls.role_id == RolesModel.id)
+            .filter(cls.id == user_id)
+            .first()
+        )
+
     @staticmethod
     def generate_hash(password):
         """Generates a password hash from raw password"""
-        return pbkdf2_sha256.hash(password)
+        return password_context.hash(password)
 
     @staticmethod
     def verify_hash(password, password_hash):
         """Verifies provided password against hashed password"""
-        return pbkdf2_sha256.verify(password, password_hash)
+        return password_context.verify(password, password_hash)
+
+    @staticmethod
+    def needs_rehash(password_hash):
+        """Checks if a hash was made with other parameters than the current ones"""
+        return password_context.needs_update(password_hash)
+
+    @staticmethod
+    def set_hash_rounds(rounds):
+        """Sets the pbkdf2 rounds of new hashes
+
+        Hashes with any other number of rounds are reported by needs_rehash.
+        """
+        password_context.update(
+            pbkdf2_sha256__default_rounds=rounds,
+            pbkdf2_sha256__min_rounds=rounds,
+            pbkdf2_sha256__max_rounds=rounds,
+        )
 
     @classmethod
     def get_all_users(cls):
         """Returns all users"""
         return cls.query.all()
 
+    @classmethod
+    def get_users_page(cls, limit=10, before=None):
+        """Returns a keyset page of users with their roles, newest first
+
+        Returns:
+            tuple: The users of the page and whether more users follow
+        """
+        return cls.keyset_page(
+            cls.query.options(joinedload(cls.roles)), limit=limit, before=before
+        )
+
+    @classmethod
+    def count_users(cls):
+        """Returns the number of users"""
+        return cls.query.count()
+
+    @classmethod
+    def iter_export_rows(
+        cls, user_id=None, created_from=None, created_to=None, chunk_size=1000
+    ):
+        """Yields the users to export as plain rows with their role names
+
+        Rows are fetched chunk_size at a time from a server-side cursor and
+        are not added to the session, so memory stays flat however many
+        users match.
+
+        Args:
+            created_from (datetime): Earliest creation time, inclusive
+            created_to (datetime): Latest creation time, exclusive
+        """
+        query = (
+            db.session.query(
+                cls.id.label("user_id"),
+                cls.name,
+                cls.email,
+                cls.telephone,
+                cls.profile_photo,
+                RolesModel.name.label("role"),
+                cls.is_disabled,
+                cls.last_login_date,
+                cls.created_at,
+            )
+            .join(RolesModel, cls.role_id == RolesModel.id)
+            .order_by(cls.id)
+        )
+        query = cls._filter_export(query, cls.id, user_id, created_from, created_to)
+        return query.yield_per(chunk_size)
+
+    @classmethod
+    def get_all_paginated_users(cls, page=1, per_page=10):
+        """Returns all users by page and limit with their roles in the same query"""
+        query = (
+            cls.query.options(joinedload(cls.roles))
+            .order_by(cls.created_at.desc())
+            .paginate(page=int(page), per_page=int(per_page), error_out=True)
+        )
+        return query
+
 
 class RevokedTokenModel(BaseModel):
     """Generates revoked token table"""
 
     __tablename__ = "revoked_token"
-    revoked_token = db.Column(db.String(120))
+    revoked_token = db.Column(db.String(120), nullable=False, unique=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
 
     def __repr__(self):
         return "<id: revoked_token: {} >".format(self.revoked_token)
@@ -127,6 +449,149 @@ class RevokedTokenModel(BaseModel):
         query = cls.query.filter_by(revoked_token=str(token)).first()
         return bool(query)
 
+    @classmethod
+    def revoke(cls, token, expires_at=None):
+        """Adds a token to the revoked token table
+
+        Revoking a token that is already revoked is not an error.
+        """
+        db.session.add(cls(revoked_token=str(token), expires_at=expires_at))
+
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+
+    @classmethod
+    def get_revoked_since(cls, last_id, now):
+        """Returns id, token and expiry of unexpired revocations after last_id"""
+        return (
+            db.session.query(cls.id, cls.revoked_token, cls.expires_at)
+            .filter(cls.id > last_id)
+            .filter(or_(cls.expires_at.is_(None), cls.expires_at > now))
+            .order_by(cls.id)
+            .all()
+        )
+
+    @classmethod
+    def purge_expired(cls, now=None):
+        """Deletes revocations of tokens that have expired and returns their count"""
+        deleted = cls.query.filter(cls.expires_at < (now or datetime.utcnow())).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+        return deleted
+
+
+class LoginAttemptModel(BaseModel):
+    """Failed login attempts shared by every worker for rate limiting
+
+    Only used when the login rate limiter is configured with the database
+    backend. Rows older than the rate limit window are no longer read and
+    can be purged.
+    """
+
+    __tablename__ = "login_attempt"
+    __table_args__ = (db.Index("ix_login_attempt_key_created_at", "key", "created_at"),)
+    key = db.Column(db.String(255), nullable=False)
+
+    @classmethod
+    def add(cls, key):
+        """Records an attempt for key"""
+        db.session.add(cls(key=key))
+        db.session.commit()
+
+    @classmethod
+    def get_window(cls, key, since):
+        """Returns the number of attempts for key since a time and the oldest one"""
+        return (
+            db.session.query(func.count(cls.id), func.min(cls.created_at))
+            .filter(cls.key == key, cls.created_at > since)
+            .one()
+        )
+
+    @classmethod
+    def delete_by_key(cls, key):
+        """Deletes every attempt for key"""
+        cls.query.filter_by(key=key).delete(synchronize_session=False)
+        db.session.commit()
+
+    @classmethod
+    def purge_older_than(cls, created_before):
+        """Deletes attempts made before created_before and returns their count"""
+        deleted = cls.query.filter(cls.created_at < created_before).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+        return deleted
+
+
+class IdempotencyKeyModel(BaseModel):
+    """Stores the response of a request made with an Idempotency-Key header"""
+
+    __tablename__ = "idempotency_key"
+    __table_args__ = (
+        db.UniqueConstraint("scope", "key", name="uq_idempotency_key_scope_key"),
+    )
+
+    scope = db.Column(db.String(255), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+
+    @classmethod
+    def find_by_key(cls, scope, key):
+        """Returns the stored request of a key"""
+        return cls.query.filter_by(scope=scope, key=key).first()
+
+    @classmethod
+    def reserve(cls, scope, key, request_hash):
+        """Claims a key before its request is processed
+
+        The unique constraint on (scope, key) lets exactly one of several
+        concurrent requests with the same key claim it.
+
+        Returns:
+            IdempotencyKeyModel: None if the key was claimed, otherwise the
+            existing row of the key
+        """
+        db.session.add(cls(scope=scope, key=key, request_hash=request_hash))
+
+        try:
+            db.session.commit()
+            return None
+        except IntegrityError:
+            db.session.rollback()
+            return cls.find_by_key(scope, key)
+
+    @classmethod
+    def complete(cls, scope, key, status_code, response_body):
+        """Stores the response of a claimed key"""
+        cls.query.filter_by(scope=scope, key=key).update(
+            {"status_code": status_code, "response_body": response_body},
+            synchronize_session=False,
+        )
+        db.session.commit()
+
+    @classmethod
+    def release(cls, scope, key):
+        """Removes a claimed key whose request failed so that it can be retried"""
+        db.session.rollback()
+        cls.query.filter_by(scope=scope, key=key, status_code=None).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+
+    @classmethod
+    def purge_older_than(cls, created_before):
+        """Deletes keys created before the given time and returns their count"""
+        deleted = cls.query.filter(cls.created_at < created_before).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+        return deleted
+
 
 class CurrencyModel(BaseModel):
     """Currency table representation"""
@@ -141,9 +606,109 @@ class CurrencyModel(BaseModel):
         """Returns currency by currency id"""
         return cls.query.filter_by(id=currency_id).first()
 
+    @classmethod
+    def get_all_currencies(cls):
+        """Returns all currencies"""
+        return cls.query.all()
+
+
+class ExchangeRateSnapshotModel(BaseModel):
+    """Exchange rates of every currency against one base currency
+
+    Snapshots are written by the rate snapshot refresher and never updated,
+    so a ledger entry that records a snapshot id can always be traced back
+    to the rate it was converted at. Old snapshots that no ledger entry
+    records are purged.
+    """
+
+    __tablename__ = "exchange_rate_snapshot"
+    base_currency = db.Column(db.String(3), nullable=False)
+    # JSON object of rates keyed by currency code
+    rates = db.Column(db.Text, nullable=False)
+
+    # PostgreSQL advisory lock held by the worker that takes a snapshot
+    REFRESH_LOCK_KEY = 7_240_512_011
+
+    @classmethod
+    def create(cls, base_currency, rates):
+        """Stores a snapshot of rates and returns it"""
+        snapshot = cls(base_currency=base_currency, rates=json.dumps(rates))
+        snapshot.save_to_db()
+        return snapshot
+
+    @classmethod
+    def get_latest(cls):
+        """Returns the most recent snapshot or None"""
+        return cls.query.order_by(cls.id.desc()).first()
+
+    @classmethod
+    def try_lock_refresh(cls):
+        """Takes the snapshot refresh lock until the current transaction ends
+
+        Returns:
+            bool: False if another session holds the lock. Always True on
+            databases without advisory locks
+        """
+        if db.engine.dialect.name != "postgresql":
+            return True
+
+        return db.session.execute(
+            select(func.pg_try_advisory_xact_lock(cls.REFRESH_LOCK_KEY))
+        ).scalar()
+
+    @classmethod
+    def purge_older_than(cls, created_before):
+        """Deletes snapshots created before the given time and returns their count
+
+        The latest snapshot and snapshots that a ledger entry was converted
+        at are kept.
+        """
+        latest = cls.get_latest()
+
+        if latest is None:
+            return 0
+
+        converted_at = (
+            select(TransactionsModel.id)
+            .where(TransactionsModel.rate_snapshot_id == cls.id)
+            .exists()
+        )
+        deleted = cls.query.filter(
+            cls.created_at < created_before, cls.id != latest.id, ~converted_at
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    def get_rates(self):
+        """Returns the rates of the snapshot keyed by currency code"""
+        return json.loads(self.rates)
+
+
+class WalletNotFoundError(Exception):
+    """Raised when a wallet does not exist for the specified user"""
+
+    pass
+
+
+class InsufficientFundsError(Exception):
+    """Raised when a wallet balance cannot cover a debit"""
+
+    pass
+
+
+class ExchangeRateError(Exception):
+    """Raised when no exchange rate is available between two currencies"""
+
+    pass
+
 
 class WalletModel(BaseModel):
-    """Wallet table representation"""
+    """Wallet table representation
+
+    Credits to a hot wallet are appended to the wallet_delta table instead of
+    updating the wallet row, so they do not queue on its row lock. Pending
+    deltas are folded into amount by compact_deltas.
+    """
 
     __tablename__ = "wallet"
     amount = db.Column(
@@ -153,6 +718,36 @@ class WalletModel(BaseModel):
     )
     currency_id = db.Column(db.Integer, db.ForeignKey("currency.id"), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    is_hot = db.Column(
+        db.Boolean, nullable=False, default=False, server_default=db.false()
+    )
+    # bumped by every UPDATE of the row, ORM flushes and bulk statements alike
+    row_version = db.Column(
+        db.Integer,
+        nullable=False,
+        default=1,
+        server_default="1",
+        onupdate=literal_column("row_version + 1"),
+    )
+
+    def available_balance(self):
+        """Returns the balance including credits that are not yet compacted"""
+        return self.balance_and_version()[0]
+
+    def balance_and_version(self):
+        """Returns the available balance and its version, as get_version does
+
+        Both come from one statement, so a credit appended in between cannot
+        give an ETag newer than the balance it is sent with. Only hot wallets
+        have pending deltas, so only they need a query.
+        """
+        if not self.is_hot:
+            return self.amount, (self.row_version, 0, None)
+
+        balance, *version = (
+            WalletModel._balance_version_query().filter(WalletModel.id == self.id).one()
+        )
+        return Decimal(balance), tuple(version)
 
     @classmethod
     def find_by_user_id(cls, user_id):
@@ -164,15 +759,628 @@ class WalletModel(BaseModel):
             .first()
         )
 
+    @classmethod
+    def get_version(cls, user_id):
+        """Returns what the balance of a wallet depends on, without loading it
+
+        Credits to a hot wallet are appended as deltas and leave the wallet
+        row untouched, so the number and the newest id of its pending deltas
+        are returned along with the row version. Compaction deletes deltas
+        and bumps the row version in the same transaction.
+
+        Returns:
+            tuple: The row version, pending delta count and newest delta id,
+            or None if the user has no wallet
+        """
+        row = cls._balance_version_query().filter(cls.user_id == user_id).first()
+        return tuple(row[1:]) if row else None
+
+    @classmethod
+    def _balance_version_query(cls):
+        """Selects the available balance of wallets together with their version"""
+        return (
+            db.session.query(
+                cls.amount + func.coalesce(func.sum(WalletDeltaModel.amount), 0),
+                cls.row_version,
+                func.count(WalletDeltaModel.id),
+                func.max(WalletDeltaModel.id),
+            )
+            .outerjoin(WalletDeltaModel, WalletDeltaModel.wallet_id == cls.id)
+            .group_by(cls.id, cls.row_version, cls.amount)
+        )
+
+    @classmethod
+    def lock_by_user_ids(cls, user_ids):
+        """Returns wallets of the given users locked with SELECT ... FOR UPDATE
+
+        Rows are locked in ascending wallet id order so that transactions
+        touching the same wallets queue behind each other instead of
+        deadlocking.
+
+        Returns:
+            dict: Wallets keyed by user id
+        """
+        wallets = (
+            cls.query.filter(cls.user_id.in_({int(user_id) for user_id in user_ids}))
+            .order_by(cls.id)
+            .with_for_update()
+            .all()
+        )
+        return {wallet.user_id: wallet for wallet in wallets}
+
+    @classmethod
+    def lock_for_transfer(cls, user_ids):
+        """Locks the wallets of the given users and compacts the hot ones
+
+        Returns:
+            dict: Wallets keyed by user id
+        """
+        wallets = cls.lock_by_user_ids(user_ids)
+
+        for wallet in wallets.values():
+            if wallet.is_hot:
+                cls.compact_deltas(wallet.id)
+
+        return wallets
+
+    @classmethod
+    def transfer(
+        cls,
+        source_user_id,
+        target_user_id,
+        amount,
+        commit=True,
+        rate_lookup=None,
+        currency_id=None,
+    ):
+        """Moves amount from one wallet to another in a single transaction
+
+        Both wallets are locked before either balance is read, so concurrent
+        transfers between the same wallets are serialized. The debit, the
+        credit and their ledger entries are committed together.
+
+        amount is in the currency of the source wallet. When the target
+        wallet holds another currency the credited amount is converted at
+        the rate returned by rate_lookup.
+
+        Args:
+            rate_lookup (callable): Takes the source and target currency ids
+            and returns the exchange rate and the id of its rate snapshot
+            currency_id (int): Currency the caller gave the amount in, checked
+            against the currency of the source wallet when given
+
+        Raises:
+            ValueError: If amount is not positive or currency_id is not the
+            currency of the source wallet
+            WalletNotFoundError: If either user has no wallet
+            InsufficientFundsError: If the source balance is lower than amount
+            ExchangeRateError: If the wallets hold different currencies and
+            no rate is available
+
+        Returns:
+            tuple: The source and target wallets after the transfer
+        """
+        cls._positive_amount(amount)
+        wallets = cls.lock_for_transfer([source_user_id, target_user_id])
+
+        try:
+            source_wallet, target_wallet = cls._move_funds(
+                wallets,
+                source_user_id,
+                target_user_id,
+                amount,
+                rate_lookup,
+                currency_id,
+            )
+        except (
+            ValueError,
+            WalletNotFoundError,
+            InsufficientFundsError,
+            ExchangeRateError,
+        ):
+            db.session.rollback()
+            raise
+
+        if commit:
+            db.session.commit()
+
+        return source_wallet, target_wallet
+
+    @classmethod
+    def transfer_batch(cls, transfers, rate_lookup=None):
+        """Applies several transfers in one transaction
+
+        The wallets of every transfer are locked in a single ordered pass and
+        the transfers are applied in the given order. A transfer that fails
+        does not stop the ones after it.
+
+        Args:
+            transfers (list): Tuples of source user id, target user id and amount
+            rate_lookup (callable): Converts transfers between currencies, see
+            transfer
+
+        Returns:
+            list: None for each applied transfer or the error that stopped it
+        """
+        user_ids = set()
+        for source_user_id, target_user_id, _ in transfers:
+            user_ids.update((source_user_id, target_user_id))
+
+        wallets = cls.lock_for_transfer(user_ids)
+
+        results = []
+        for source_user_id, target_user_id, amount in transfers:
+            try:
+                cls._move_funds(
+                    wallets, source_user_id, target_user_id, amount, rate_lookup
+                )
+                results.append(None)
+            except (
+                ValueError,
+                WalletNotFoundError,
+                InsufficientFundsError,
+                ExchangeRateError,
+            ) as e:
+                results.append(e)
+
+        db.session.commit()
+        return results
+
+    @classmethod
+    def _move_funds(
+        cls,
+        wallets,
+        source_user_id,
+        target_user_id,
+        amount,
+        rate_lookup=None,
+        currency_id=None,
+    ):
+        """Moves amount between two wallets locked by lock_for_transfer"""
+        amount = cls._positive_amount(amount)
+        source_wallet = wallets.get(int(source_user_id))
+        target_wallet = wallets.get(int(target_user_id))
+
+        if not source_wallet:
+            raise WalletNotFoundError(
+                f"Wallet for money transfer user {source_user_id} does not exist"
+            )
+
+        if not target_wallet:
+            raise WalletNotFoundError(
+                f"Wallet for money receiving user {target_user_id} does not exist"
+            )
+
+        if currency_id is not None and int(currency_id) != source_wallet.currency_id:
+            raise ValueError(
+                f"Amount must be in currency {source_wallet.currency_id} of the"
+                f" wallet of user {source_user_id}, got currency {currency_id}"
+            )
+
+        if source_wallet.amount < amount:
+            raise InsufficientFundsError(
+                f"Wallet of user id {source_user_id} has insufficient funds"
+            )
+
+        exchange_rate = rate_snapshot_id = None
+        credited_amount = amount
+
+        if source_wallet.currency_id != target_wallet.currency_id:
+            if rate_lookup is None:
+                raise ExchangeRateError(
+                    f"Wallets of users {source_user_id} and {target_user_id}"
+                    " hold different currencies"
+                )
+
+            exchange_rate, rate_snapshot_id = rate_lookup(
+                source_wallet.currency_id, target_wallet.currency_id
+            )
+            credited_amount = (amount * exchange_rate).quantize(
+                Decimal("0.01"), rounding=ROUND_HALF_UP
+            )
+
+        source_wallet.amount = source_wallet.amount - amount
+        target_wallet.amount = target_wallet.amount + credited_amount
+
+        reference = uuid4().hex
+        TransactionsModel.append_entry(
+            wallet=source_wallet,
+            transaction_type=TransactionsModel.TRANSFER,
+            entry_type=TransactionsModel.DEBIT,
+            amount=amount,
+            reference=reference,
+            counterparty_user_id=target_wallet.user_id,
+            exchange_rate=exchange_rate,
+            rate_snapshot_id=rate_snapshot_id,
+        )
+        TransactionsModel.append_entry(
+            wallet=target_wallet,
+            transaction_type=TransactionsModel.TRANSFER,
+            entry_type=TransactionsModel.CREDIT,
+            amount=credited_amount,
+            reference=reference,
+            counterparty_user_id=source_wallet.user_id,
+            exchange_rate=exchange_rate,
+            rate_snapshot_id=rate_snapshot_id,
+        )
+
+        return source_wallet, target_wallet
+
+    @classmethod
+    def credit(cls, user_id, amount, commit=True):
+        """Adds amount to the wallet of a user and returns the new balance
+
+        The balance is changed by a single UPDATE statement so concurrent
+        credits cannot overwrite each other. The ledger entry is written in
+        the same transaction.
+
+        Credits to a hot wallet are appended as deltas and None is returned
+        because the new balance is only known after compaction.
+
+        Raises:
+            ValueError: If amount is not positive
+            WalletNotFoundError: If the user has no wallet
+        """
+        return cls._apply_balance_change(
+            user_id, cls._positive_amount(amount), TransactionsModel.CREDIT, commit
+        )
+
+    @classmethod
+    def debit(cls, user_id, amount, commit=True):
+        """Subtracts amount from the wallet of a user and returns the new balance
+
+        The balance check and the subtraction happen in one conditional
+        UPDATE statement, so the balance can never go below zero. The ledger
+        entry is written in the same transaction.
+
+        Raises:
+            ValueError: If amount is not positive
+            WalletNotFoundError: If the user has no wallet
+            InsufficientFundsError: If the balance is lower than amount
+        """
+        return cls._apply_balance_change(
+            user_id, -cls._positive_amount(amount), TransactionsModel.DEBIT, commit
+        )
+
+    @staticmethod
+    def _positive_amount(amount):
+        """Returns amount as a Decimal, raising ValueError unless it is positive
+
+        A negative amount would turn a debit into a credit and make a
+        transfer pull money from the receiving wallet without a funds check.
+        """
+        amount = Decimal(str(amount))
+
+        if amount <= 0:
+            raise ValueError(f"Amount must be positive, got {amount}")
+
+        return amount
+
+    @classmethod
+    def _apply_balance_change(cls, user_id, delta, transaction_type, commit=True):
+        """Applies delta to the balance as UPDATE ... SET amount = amount + delta
+
+        Debits are guarded by ``amount >= -delta`` in the WHERE clause and
+        credits skip hot wallets. An affected row count of zero means the
+        wallet is missing, short of funds or hot. Hot wallets take credits as
+        deltas and have their deltas compacted before a debit is retried. The
+        new balance is read back with RETURNING where the database supports it.
+        """
+        statement = (
+            update(cls)
+            .where(cls.user_id == user_id)
+            .values(amount=cls.amount + delta)
+            .execution_options(synchronize_session=False)
+        )
+
+        if delta < 0:
+            statement = statement.where(cls.amount >= -delta)
+        else:
+            statement = statement.where(cls.is_hot.is_(False))
+
+        supports_returning = db.engine.dialect.full_returning
+
+        if supports_returning:
+            statement = statement.returning(cls.id, cls.amount)
+
+        result = db.session.execute(statement)
+
+        if result.rowcount == 0:
+            wallet = (
+                db.session.query(cls.id, cls.is_hot).filter_by(user_id=user_id).first()
+            )
+
+            if not wallet:
+                raise WalletNotFoundError(f"Wallet of user id {user_id} does not exist")
+
+            if delta >= 0:
+                entry = TransactionsModel.append_entry(
+                    wallet_id=wallet.id,
+                    user_id=user_id,
+                    transaction_type=transaction_type,
+                    entry_type=transaction_type,
+                    amount=delta,
+                )
+                WalletDeltaModel.append_delta(
+                    wallet_id=wallet.id, amount=delta, transaction=entry
+                )
+                if commit:
+                    db.session.commit()
+                return None
+
+            if wallet.is_hot and cls.compact_deltas(wallet.id):
+                return cls._apply_balance_change(
+                    user_id, delta, transaction_type, commit
+                )
+
+            raise InsufficientFundsError(
+                f"Wallet of user id {user_id} has insufficient funds"
+            )
+
+        if supports_returning:
+            wallet_id, balance = result.one()
+        else:
+            wallet_id, balance = (
+                db.session.query(cls.id, cls.amount).filter_by(user_id=user_id).one()
+            )
+
+        TransactionsModel.append_entry(
+            wallet_id=wallet_id,
+            user_id=user_id,
+            transaction_type=transaction_type,
+            entry_type=transaction_type,
+            amount=abs(delta),
+            balance_after=balance,
+        )
+
+        if commit:
+            db.session.commit()
+
+        return balance
+
+    @classmethod
+    def compact_deltas(cls, wallet_id):
+        """Folds the pending credits of a hot wallet into its balance
+
+        The wallet row is locked and exactly the deltas that were summed are
+        deleted, so credits appended while compacting are left for the next
+        run. The ledger entries of the credits get the balance the wallet
+        reaches as each one is folded in, in the order they were appended.
+        Changes are not committed here.
+
+        Returns:
+            Decimal: The amount that was folded into the balance
+        """
+        wallet = cls.query.filter_by(id=wallet_id).with_for_update().first()
+
+        if not wallet:
+            return Decimal("0")
+
+        deltas = (
+            db.session.query(
+                WalletDeltaModel.id,
+                WalletDeltaModel.amount,
+                WalletDeltaModel.transaction_id,
+            )
+            .filter(WalletDeltaModel.wallet_id == wallet_id)
+            .order_by(WalletDeltaModel.id)
+            .all()
+        )
+
+        if not deltas:
+            return Decimal("0")
+
+        balance = wallet.amount
+        balances = []
+        for delta in deltas:
+            balance += delta.amount
+            if delta.transaction_id is not None:
+                balances.append({"id": delta.transaction_id, "balance_after": balance})
+
+        db.session.bulk_update_mappings(TransactionsModel, balances)
+        WalletDeltaModel.query.filter(
+            WalletDeltaModel.id.in_([delta.id for delta in deltas])
+        ).delete(synchronize_session=False)
+        pending = balance - wallet.amount
+        wallet.amount = balance
+        return pending
+
+    @classmethod
+    def compact_hot_wallets(cls):
+        """Compacts every wallet with pending deltas, one transaction per wallet
+
+        Returns:
+            int: Number of wallets compacted
+        """
+        wallet_ids = [
+            wallet_id
+            for (wallet_id,) in db.session.query(WalletDeltaModel.wallet_id).distinct()
+        ]
+
+        for wallet_id in wallet_ids:
+            cls.compact_deltas(wallet_id)
+            db.session.commit()
+
+        return len(wallet_ids)
+
+    @classmethod
+    def set_hot(cls, user_id, is_hot=True):
+        """Turns hot wallet mode on or off for the wallet of a user
+
+        Pending deltas are compacted when the mode is turned off.
+
+        Raises:
+            WalletNotFoundError: If the user has no wallet
+        """
+        wallet = cls.query.filter_by(user_id=user_id).with_for_update().first()
+
+        if not wallet:
+            raise WalletNotFoundError(f"Wallet of user id {user_id} does not exist")
+
+        if not is_hot:
+            cls.compact_deltas(wallet.id)
+
+        wallet.is_hot = is_hot
+        db.session.commit()
+
+
+class WalletDeltaModel(BaseModel):
+    """Pending credits of hot wallets awaiting compaction"""
+
+    __tablename__ = "wallet_delta"
+    wallet_id = db.Column(
+        db.Integer, db.ForeignKey("wallet.id"), nullable=False, index=True
+    )
+    amount = db.Column(
+        db.Numeric(asdecimal=True, precision=8, decimal_return_scale=2),
+        nullable=False,
+    )
+    # ledger entry of the credit, its balance_after is set at compaction
+    transaction_id = db.Column(
+        db.Integer, db.ForeignKey("transactions.id"), nullable=True
+    )
+    transaction = db.relationship("TransactionsModel", lazy=True)
+
+    @classmethod
+    def append_delta(cls, wallet_id, amount, transaction=None):
+        """Adds a pending credit to the current database transaction"""
+        delta = cls(wallet_id=wallet_id, amount=amount, transaction=transaction)
+        db.session.add(delta)
+        return delta
+
 
 class TransactionsModel(BaseModel):
-    """Transactions table representation"""
+    """Transactions table representation
+
+    An append-only ledger with one row per wallet movement. Entries that
+    belong to the same operation, such as both legs of a transfer, share a
+    reference.
+    """
 
     __tablename__ = "transactions"
+    __table_args__ = (
+        db.Index("ix_transactions_user_id_created_at", "user_id", "created_at", "id"),
+        # entries are appended in time order, so each block range of the table
+        # covers one span of time and a tiny BRIN index serves time ranges
+        db.Index(
+            "ix_transactions_created_at_brin", "created_at", postgresql_using="brin"
+        ),
+    )
+
+    CREDIT = "credit"
+    DEBIT = "debit"
+    TRANSFER = "transfer"
+
     transaction_type = db.Column(db.String(40), nullable=False)
+    entry_type = db.Column(db.String(6), nullable=False)
+    reference = db.Column(db.String(32), nullable=False, index=True)
     amount = db.Column(
         db.Numeric(asdecimal=True, precision=8, decimal_return_scale=2),
         nullable=False,
         default=0.00,
     )
+    balance_after = db.Column(
+        db.Numeric(asdecimal=True, precision=8, decimal_return_scale=2),
+        nullable=True,
+    )
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    wallet_id = db.Column(db.Integer, db.ForeignKey("wallet.id"), nullable=False)
+    counterparty_user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=True
+    )
+    # units of the target currency per unit of the source currency
+    exchange_rate = db.Column(
+        db.Numeric(asdecimal=True, precision=18, scale=8), nullable=True
+    )
+    rate_snapshot_id = db.Column(
+        db.Integer, db.ForeignKey("exchange_rate_snapshot.id"), nullable=True
+    )
+
+    @classmethod
+    def append_entry(
+        cls,
+        transaction_type,
+        entry_type,
+        amount,
+        wallet=None,
+        wallet_id=None,
+        user_id=None,
+        balance_after=None,
+        reference=None,
+        counterparty_user_id=None,
+        exchange_rate=None,
+        rate_snapshot_id=None,
+    ):
+        """Adds a ledger entry to the current database transaction
+
+        The entry is not committed here so that it is persisted atomically
+        with the balance change it records.
+        """
+        if wallet is not None:
+            wallet_id = wallet.id
+            user_id = wallet.user_id
+            balance_after = wallet.amount
+
+        entry = cls(
+            transaction_type=transaction_type,
+            entry_type=entry_type,
+            reference=reference or uuid4().hex,
+            amount=amount,
+            balance_after=balance_after,
+            user_id=user_id,
+            wallet_id=wallet_id,
+            counterparty_user_id=counterparty_user_id,
+            exchange_rate=exchange_rate,
+            rate_snapshot_id=rate_snapshot_id,
+        )
+        db.session.add(entry)
+        return entry
+
+    @classmethod
+    def get_user_transactions(cls, user_id, limit=10, before=None):
+        """Returns a keyset page of ledger entries of a user, newest first
+
+        Returns:
+            tuple: The entries of the page and whether more entries follow
+        """
+        return cls.keyset_page(
+            cls.query.filter(cls.user_id == user_id), limit=limit, before=before
+        )
+
+    @classmethod
+    def count_user_transactions(cls, user_id):
+        """Returns the number of ledger entries of a user"""
+        return cls.query.filter(cls.user_id == user_id).count()
+
+    @classmethod
+    def iter_export_rows(
+        cls, user_id=None, created_from=None, created_to=None, chunk_size=1000
+    ):
+        """Yields the ledger entries to export as plain rows, oldest first
+
+        Rows are fetched chunk_size at a time from a server-side cursor and
+        are not added to the session, so memory stays flat however many
+        entries match.
+
+        Args:
+            created_from (datetime): Earliest creation time, inclusive
+            created_to (datetime): Latest creation time, exclusive
+        """
+        query = db.session.query(
+            cls.id.label("transaction_id"),
+            cls.reference,
+            cls.user_id,
+            cls.wallet_id,
+            cls.transaction_type,
+            cls.entry_type,
+            cls.amount,
+            cls.balance_after,
+            cls.counterparty_user_id,
+            cls.exchange_rate,
+            cls.rate_snapshot_id,
+            cls.created_at,
+        ).order_by(cls.id)
+        query = cls._filter_export(
+            query, cls.user_id, user_id, created_from, created_to
+        )
+        return query.yield_per(chunk_size)
@@ -95,7 +95,49 @@ wallet = api.model(
 wallet_update = api.model(
     "WalletUpdateSchema",
     {
-        "amount": fields.Decimal(),
+        "amount": fields.Arbitrary(description="Amount of money"),
         "currency_id": fields.Integer(description="Id of currency"),
     },
 )
+
+transaction = api.model(
+    "TransactionSchema",
+    {
+        "transaction_id": fields.Integer(description="ID of the ledger entry"),
+        "reference": fields.String(
+            description="Reference shared by the entries of one operation"
+        ),
+        "transaction_type": fields.String(description="credit, debit or transfer"),
+        "entry_type": fields.String(description="credit or debit of the wallet"),
+        "amount": fields.Fixed(decimals=2),
+        "balance_after": fields.Fixed(
+            decimals=2,
+            description="Balance after the entry, null for a credit to a hot"
+            " wallet until the credit is folded into the balance",
+        ),
+        "counterparty_user_id": fields.Integer(
+            description="ID of the other user of a transfer"
+        ),
+        "exchange_rate": fields.String(
+            description="Rate a transfer between currencies was converted at"
+        ),
+        "rate_snapshot_id": fields.Integer(
+            description="ID of the exchange rate snapshot of the rate"
+        ),
+        "created_at": fields.DateTime(description="time of the transaction"),
+    },
+)
+
+transfer_batch_item = api.model(
+    "TransferBatchItemSchema",
+    {
+        "source_user_id": fields.Integer(description="ID of the paying user"),
+        "target_user_id": fields.Integer(description="ID of the receiving user"),
+        "amount": fields.Arbitrary(description="Amount of money"),
+    },
+)
+
+transfer_batch_request = api.model(
+    "TransferBatchRequestSchema",
+    {"transfers": fields.List(fields.Nested(transfer_batch_item))},
+)
@@ -1,10 +1,13 @@
-""" Schema for parsing & validating request data"""
-from re import L
-from marshmallow import Schema, fields
+"""Schema for parsing & validating request data"""
+from datetime import timezone
+
+from marshmallow import Schema, fields, validate
+
+from src.helpers import export
 
 
 class UserRequestSchema(Schema):
-    user_id = fields.Number(required=True)
+    user_id = fields.Integer(required=True)
 
 
 class UserRegistrationRequestSchema(Schema):
@@ -13,7 +16,7 @@ class UserRegistrationRequestSchema(Schema):
     password = fields.String(required=True)
     telephone = fields.String(required=True)
     profile_photo = fields.String(required=True)
-    role_id = fields.Number(required=True)
+    role_id = fields.Integer(required=True)
     is_disabled = fields.Boolean(required=True)
 
 
@@ -23,7 +26,7 @@ class UserPutRequestSchema(Schema):
     profile_photo = fields.String(required=True)
     password = fields.String(required=True)
     telephone = fields.String(required=True)
-    role_id = fields.Number(required=True)
+    role_id = fields.Integer(required=True)
     is_disabled = fields.Boolean(required=True)
 
 
@@ -33,7 +36,7 @@ class UserLoginRequestSchema(Schema):
 
 
 class RoleParamRequestSchema(Schema):
-    role_id = fields.Number(required=True)
+    role_id = fields.Integer(required=True)
 
 
 class RolePostRequestSchema(Schema):
@@ -49,10 +52,67 @@ class AthleteVerificationRequestSchema(Schema):
 
 
 class WalletPutRequestSchema(Schema):
-    amount = fields.Float(required=True)
+    amount = fields.Decimal(
+        required=True, validate=validate.Range(min=0, min_inclusive=False)
+    )
     currency_id = fields.Integer(required=False)
 
 
 class TransferRequestSchema(Schema):
     current_user_id = fields.Integer(required=True)
     target_user_id = fields.Integer(required=True)
+
+
+class PaginationRequestSchema(Schema):
+    page = fields.Integer(required=False, validate=validate.Range(min=1))
+    limit = fields.Integer(required=False, validate=validate.Range(min=1))
+    cursor = fields.String(required=False)
+    include_total = fields.Boolean(required=False)
+
+
+class TransactionListRequestSchema(PaginationRequestSchema):
+    user_id = fields.Integer(required=True)
+
+
+class TransferBatchItemSchema(Schema):
+    source_user_id = fields.Integer(required=True)
+    target_user_id = fields.Integer(required=True)
+    amount = fields.Decimal(
+        required=True, validate=validate.Range(min=0, min_inclusive=False)
+    )
+
+
+class TransferBatchRequestSchema(Schema):
+    transfers = fields.List(
+        fields.Nested(TransferBatchItemSchema),
+        required=True,
+        validate=validate.Length(min=1),
+    )
+
+
+class ExportRequestSchema(Schema):
+    export_format = fields.String(
+        data_key="format",
+        required=False,
+        validate=validate.OneOf(export.EXPORT_FORMATS),
+    )
+    user_id = fields.Integer(required=False)
+    # timezone-aware values are converted to naive UTC like the stored times
+    created_from = fields.NaiveDateTime(required=False, timezone=timezone.utc)
+    created_to = fields.NaiveDateTime(required=False, timezone=timezone.utc)
+
+
+# schemas hold no request state, so one instance of each serves every request
+user_request_schema = UserRequestSchema()
+user_registration_request_schema = UserRegistrationRequestSchema()
+user_put_request_schema = UserPutRequestSchema()
+user_login_request_schema = UserLoginRequestSchema()
+role_param_request_schema = RoleParamRequestSchema()
+role_post_request_schema = RolePostRequestSchema()
+role_put_request_schema = RolePutRequestSchema()
+wallet_put_request_schema = WalletPutRequestSchema()
+transfer_request_schema = TransferRequestSchema()
+pagination_request_schema = PaginationRequestSchema()
+transaction_list_request_schema = TransactionListRequestSchema()
+transfer_batch_request_schema = TransferBatchRequestSchema()
+export_request_schema = ExportRequestSchema()
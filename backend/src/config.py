@@ -10,14 +10,99 @@ class Config:
     load_dotenv(dotenv_path=env_file)
 
     SECRET_KEY = str(os.getenv("SECRET_KEY"))
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    # json writes one object per line, text the plain format used in development
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+    # share of info records that are written, warnings and errors are always kept
+    LOG_INFO_SAMPLE_RATE = float(os.environ.get("LOG_INFO_SAMPLE_RATE", 1.0))
     SQLALCHEMY_DATABASE_URI = str(os.getenv("DATABASE_URI"))
     SQLALCHEMY_TRACK_MODIFICATIONS = os.getenv("SQLALCHEMY_TRACK_MODIFICATIONS")
+    # connections kept open by each worker and extra ones opened under load
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 0))
+    # seconds a request waits for a free connection before failing
+    DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+    # seconds after which a connection is replaced, below server idle timeouts
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+    # connections all workers may open, 0 asks PostgreSQL at startup
+    DB_MAX_CONNECTIONS = int(os.environ.get("DB_MAX_CONNECTIONS", 0))
+    # leave pooling to a local PgBouncer and open a connection per checkout
+    DB_PGBOUNCER = os.environ.get("DB_PGBOUNCER", "false").lower() == "true"
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
     JWT_BLACKLIST_ENABLED = os.getenv("JWT_BLACKLIST_ENABLED")
     JWT_BLACKLIST_TOKEN_CHECKS = ["access", "refresh"]
+    # seconds between polls of the revoked token table by each worker
+    JWT_BLOCKLIST_REFRESH_INTERVAL = float(
+        os.environ.get("JWT_BLOCKLIST_REFRESH_INTERVAL", 1)
+    )
     DEFAULT_USER_PASSWORD = os.environ.get("DEFAULT_USER_PASSWORD")
+    # failed logins allowed per account from one client IP, and per client IP,
+    # within the window
+    LOGIN_RATE_LIMIT_PER_ACCOUNT = int(
+        os.environ.get("LOGIN_RATE_LIMIT_PER_ACCOUNT", 5)
+    )
+    LOGIN_RATE_LIMIT_PER_IP = int(os.environ.get("LOGIN_RATE_LIMIT_PER_IP", 50))
+    LOGIN_RATE_LIMIT_WINDOW = float(os.environ.get("LOGIN_RATE_LIMIT_WINDOW", 300))
+    # memory limits each worker on its own, database shares attempts between workers
+    LOGIN_RATE_LIMIT_BACKEND = os.environ.get("LOGIN_RATE_LIMIT_BACKEND", "memory")
+    # proxies in front of the app whose X-Forwarded-For header is trusted
+    TRUSTED_PROXY_COUNT = int(os.environ.get("TRUSTED_PROXY_COUNT", 1))
+    # pbkdf2 rounds of new password hashes, older hashes are upgraded on login
+    PASSWORD_HASH_ROUNDS = int(os.environ.get("PASSWORD_HASH_ROUNDS", 29000))
+    # password hashes computed at once by each worker, 0 hashes in the request
+    PASSWORD_HASH_POOL_SIZE = int(os.environ.get("PASSWORD_HASH_POOL_SIZE", 4))
     FIXER_API_KEY = os.environ.get("FIXER_API_KEY")
     FIXER_BASE_URL = os.environ.get("FIXER_BASE_URL")
+    FIXER_TIMEOUT = float(os.environ.get("FIXER_TIMEOUT", 5))
+    # seconds exchange rates are served without a refresh
+    FX_RATE_TTL = float(os.environ.get("FX_RATE_TTL", 300))
+    # seconds stale exchange rates are served while they refresh in the background
+    FX_RATE_MAX_STALE = float(os.environ.get("FX_RATE_MAX_STALE", 3600))
+    # profile every request, otherwise only requests with a profile token
+    PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+    # collect cProfile stats of every profiled request
+    PROFILING_CPROFILE = os.environ.get("PROFILING_CPROFILE", "false").lower() == "true"
+    # milliseconds after which a profiled request is logged as slow
+    PROFILING_SLOW_REQUEST_MS = float(os.environ.get("PROFILING_SLOW_REQUEST_MS", 500))
+    # runs of one statement in a request that are logged as an N+1 pattern
+    PROFILING_REPEATED_QUERY_THRESHOLD = int(
+        os.environ.get("PROFILING_REPEATED_QUERY_THRESHOLD", 3)
+    )
+    # seconds a profile token created by the profile_token command is valid
+    PROFILING_TOKEN_MAX_AGE = int(os.environ.get("PROFILING_TOKEN_MAX_AGE", 3600))
+    # milliseconds a readiness check result is reused by a worker
+    HEALTH_READINESS_CACHE_MS = float(os.environ.get("HEALTH_READINESS_CACHE_MS", 250))
+    # share of pool connections in use at which a worker reports not ready
+    HEALTH_POOL_SATURATION = float(os.environ.get("HEALTH_POOL_SATURATION", 1.0))
+    # currency every exchange rate snapshot is quoted against
+    FX_SNAPSHOT_BASE_CURRENCY = os.environ.get("FX_SNAPSHOT_BASE_CURRENCY", "EUR")
+    # seconds between exchange rate snapshots of the deployment, 0 disables them
+    FX_SNAPSHOT_REFRESH_INTERVAL = float(
+        os.environ.get("FX_SNAPSHOT_REFRESH_INTERVAL", 900)
+    )
+    # days snapshots no ledger entry was converted at are kept, 0 keeps them all
+    FX_SNAPSHOT_RETENTION_DAYS = int(os.environ.get("FX_SNAPSHOT_RETENTION_DAYS", 30))
+    # seconds between checks for a newer exchange rate snapshot by each worker
+    FX_SNAPSHOT_CHECK_INTERVAL = float(os.environ.get("FX_SNAPSHOT_CHECK_INTERVAL", 60))
+    # seconds between checks of the reference data version by each worker
+    REFERENCE_DATA_CHECK_INTERVAL = float(
+        os.environ.get("REFERENCE_DATA_CHECK_INTERVAL", 5)
+    )
+    # completed idempotent responses cached per worker, 0 disables the cache
+    IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", 1024))
+    # largest number of transfers accepted by a batch transfer request
+    TRANSFER_BATCH_MAX_SIZE = int(os.environ.get("TRANSFER_BATCH_MAX_SIZE", 10000))
+    # transfers applied per database transaction in a batch
+    TRANSFER_BATCH_CHUNK_SIZE = int(os.environ.get("TRANSFER_BATCH_CHUNK_SIZE", 500))
+    # rows fetched from the database per round trip of an export
+    EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 1000))
+    # serialize responses with compiled models and orjson instead of flask-restx
+    FAST_SERIALIZATION = os.environ.get("FAST_SERIALIZATION", "true").lower() == "true"
+    # seconds between hot wallet compaction runs, 0 disables the compactor
+    HOT_WALLET_COMPACTION_INTERVAL = float(
+        os.environ.get("HOT_WALLET_COMPACTION_INTERVAL", 5)
+    )
 
 
 class ProductionConfig(Config):
@@ -35,6 +120,12 @@ class TestingConfig(Config):
     db_base_dir = os.path.abspath(os.path.dirname(__file__))
     TESTING = True
     DEBUG = True
+    JWT_BLOCKLIST_REFRESH_INTERVAL = 0
+    REFERENCE_DATA_CHECK_INTERVAL = 0
+    HOT_WALLET_COMPACTION_INTERVAL = 0
+    FX_SNAPSHOT_REFRESH_INTERVAL = 0
+    FX_SNAPSHOT_CHECK_INTERVAL = 0
+    PASSWORD_HASH_ROUNDS = 1000
     SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(db_base_dir, "testing.sqlite")
 
 
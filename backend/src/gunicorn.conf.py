@@ -1,5 +1,11 @@
+import ast
+import os
+import shutil
 from multiprocessing import cpu_count
 
+# every worker writes its metrics here so that /metrics can aggregate them
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/wallet-metrics")
+
 
 def max_workers():
     return cpu_count()
@@ -11,3 +17,61 @@ workers = max_workers() * 2 + 1
 timeout = 480
 threads = workers
 reload = True
+
+
+def app_config_name(app_uri):
+    """Returns the config name the app factory of app_uri is called with
+
+    The app is served as "wsgi:create_app('production')", so the name is
+    the first argument of the call. Without one, create_app uses "default".
+    """
+    call = (app_uri or "").partition(":")[2]
+
+    try:
+        node = ast.parse(call, mode="eval").body
+    except SyntaxError:
+        return "default"
+
+    if isinstance(node, ast.Call) and node.args:
+        return ast.literal_eval(node.args[0])
+
+    for keyword in getattr(node, "keywords", ()):
+        if keyword.arg == "config_name":
+            return ast.literal_eval(keyword.value)
+
+    return "default"
+
+
+def on_starting(server):
+    """Refuses to start when the workers can exhaust database connections
+
+    The check reads the config the app is created with. When the database
+    cannot be reached yet it is skipped with a warning, so the server does
+    not depend on the database starting first. Also empties the metrics
+    directory of a previous run.
+    """
+    from sqlalchemy.exc import SQLAlchemyError
+
+    from src.config import config
+    from src.helpers.db_pool import check_pool_capacity
+
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+    app_config = config[app_config_name(server.app.app_uri or server.cfg.wsgi_app)]
+    settings = {
+        key: getattr(app_config, key) for key in dir(app_config) if key.isupper()
+    }
+
+    try:
+        check_pool_capacity(server.cfg.workers, settings)
+    except SQLAlchemyError as e:
+        server.log.warning("Skipped the database connection capacity check: %s", e)
+
+
+def child_exit(server, worker):
+    """Drops the live metrics of a worker that exited"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,8 +1,13 @@
 import re
+import threading
+import time
+from decimal import Decimal
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from src.app import api
+from src.helpers.metrics import FIXER_REQUEST_LATENCY
 
 
 class CurrencyConversionError(Exception):
@@ -17,18 +22,60 @@ class CurrencySymbolsError(Exception):
     pass
 
 
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session(pool_maxsize=32):
+    """Returns the HTTP session shared by all Fixer API calls of this worker
+
+    Reusing one session keeps connections to the Fixer API alive between
+    calls instead of opening a new one for every request.
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+
+    return _session
+
+
+def fixer_get(base_url, endpoint, params, timeout):
+    """Calls an endpoint of the Fixer API and records its latency"""
+    started = time.perf_counter()
+    outcome = "error"
+
+    try:
+        response = get_session().get(
+            f"{base_url}/{endpoint}", params=params, timeout=timeout
+        )
+        outcome = "success" if response.status_code == 200 else "failure"
+        return response
+    finally:
+        FIXER_REQUEST_LATENCY.labels(endpoint=endpoint, outcome=outcome).observe(
+            time.perf_counter() - started
+        )
+
+
 class CurrencyConverter:
     def __init__(
-        self, url="", api_key=None, base_currency="", target_currency=""
+        self, url="", api_key=None, base_currency="", target_currency="", timeout=5
     ) -> None:
         self._api_key = api_key
         self._url = url
         self._base_currency = base_currency
         self._target_currency = target_currency
+        self._timeout = timeout
 
     def fetch_currency_symbols(self):
         payload = {"access_key": self._api_key}
-        response = requests.get(f"{self._url}/symbols", params=payload)
+        response = fixer_get(self._url, "symbols", payload, self._timeout)
 
         if response.status_code == 200:
             return response.json()
@@ -42,9 +89,140 @@ class CurrencyConverter:
             "symbols": self._target_currency,
         }
 
-        response = requests.get(f"{self._url}/latest", params=payload)
+        response = fixer_get(self._url, "latest", payload, self._timeout)
 
         if response.status_code == 200:
             return response.json()
         else:
             raise CurrencyConversionError("Error in converting currency value")
+
+
+class _RateFetch:
+    """A fetch of the rates of one base currency that other callers can wait on"""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+class RateProvider:
+    """Per-worker cache of exchange rates from the Fixer API
+
+    Rates are cached per base currency. Within ttl seconds of being fetched
+    they are served from memory. Up to max_stale seconds they are still
+    served, but a background refresh is started. Older rates, or rates that
+    were never fetched, are fetched before returning. Concurrent callers
+    that need the same base currency share one upstream call.
+    """
+
+    def __init__(self, url="", api_key=None, ttl=300, max_stale=3600, timeout=5):
+        self.configure(url, api_key, ttl, max_stale, timeout)
+        self._entries = {}
+        self._fetches = {}
+        self._lock = threading.Lock()
+
+    def configure(self, url="", api_key=None, ttl=300, max_stale=3600, timeout=5):
+        self._url = url
+        self._api_key = api_key
+        self._ttl = ttl
+        self._max_stale = max_stale
+        self._timeout = timeout
+
+    def get_rates(self, base_currency):
+        """Returns the rates of base_currency keyed by target currency code
+
+        Raises:
+            CurrencyConversionError: If the rates have to be fetched and the
+            Fixer API call fails
+        """
+        entry = self._entries.get(base_currency)
+
+        if entry is not None:
+            age = time.monotonic() - entry["fetched_at"]
+
+            if age < self._ttl:
+                return entry["rates"]
+
+            if age < self._max_stale:
+                self._refresh_in_background(base_currency)
+                return entry["rates"]
+
+        return self._fetch_once(base_currency)["rates"]
+
+    def convert(self, amount, base_currency, target_currency):
+        """Converts amount from base_currency to target_currency"""
+        if base_currency == target_currency:
+            return Decimal(str(amount))
+
+        rate = self.get_rates(base_currency).get(target_currency)
+
+        if rate is None:
+            raise CurrencyConversionError(
+                f"No rate from {base_currency} to {target_currency}"
+            )
+
+        return Decimal(str(amount)) * Decimal(str(rate))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _refresh_in_background(self, base_currency):
+        if base_currency in self._fetches:
+            return
+
+        thread = threading.Thread(
+            target=self._refresh_quietly, args=(base_currency,), daemon=True
+        )
+        thread.start()
+
+    def _refresh_quietly(self, base_currency):
+        try:
+            self._fetch_once(base_currency)
+        except Exception:
+            # the stale rates keep being served until max_stale
+            pass
+
+    def _fetch_once(self, base_currency):
+        with self._lock:
+            fetch = self._fetches.get(base_currency)
+            is_leader = fetch is None
+            if is_leader:
+                fetch = self._fetches[base_currency] = _RateFetch()
+
+        if not is_leader:
+            fetch.done.wait()
+            if fetch.error is not None:
+                raise fetch.error
+            return fetch.entry
+
+        try:
+            fetch.entry = self._fetch(base_currency)
+            self._entries[base_currency] = fetch.entry
+            return fetch.entry
+        except Exception as e:
+            # waiting callers get the same error instead of a missing entry
+            fetch.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._fetches[base_currency]
+            fetch.done.set()
+
+    def _fetch(self, base_currency):
+        payload = {"access_key": self._api_key, "base": base_currency}
+
+        try:
+            response = fixer_get(self._url, "latest", payload, self._timeout)
+            body = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise CurrencyConversionError(f"Error in fetching rates: {str(e)}")
+
+        if response.status_code != 200 or body.get("success") is False:
+            raise CurrencyConversionError("Error in converting currency value")
+
+        return {"rates": body["rates"], "fetched_at": time.monotonic()}
+
+
+rate_provider = RateProvider()
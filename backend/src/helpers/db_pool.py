@@ -0,0 +1,139 @@
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+class PoolStats:
+    """Checkout wait times of the connection pool of this worker"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.clear()
+
+    def record_checkout(self, wait, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            if timed_out:
+                self.timeouts += 1
+
+    def clear(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def snapshot(self, pool):
+        """Returns the wait statistics together with the current pool usage"""
+        stats = {
+            "pool": type(pool).__name__,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "average_wait_ms": (
+                self.total_wait / self.checkouts * 1000 if self.checkouts else 0.0
+            ),
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+        if isinstance(pool, QueuePool):
+            stats.update(
+                {
+                    "size": pool.size(),
+                    "checked_out": pool.checkedout(),
+                    "checked_in": pool.checkedin(),
+                    "overflow": max(pool.overflow(), 0),
+                }
+            )
+
+        return stats
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record_checkout(time.perf_counter() - started, timed_out=True)
+            raise
+
+        pool_stats.record_checkout(time.perf_counter() - started)
+        return connection
+
+
+def engine_options(config):
+    """Returns the SQLAlchemy engine options for the pool settings of config
+
+    Behind PgBouncer the application keeps no connections of its own and
+    opens one per checkout, leaving pooling to PgBouncer.
+    """
+    if config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        return {}
+
+    if config["DB_PGBOUNCER"]:
+        return {"poolclass": NullPool}
+
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+
+
+def max_connections(config):
+    """Returns the connections the database accepts from this application
+
+    DB_MAX_CONNECTIONS takes precedence. Otherwise the PostgreSQL server is
+    asked for max_connections less its superuser reserved connections.
+    """
+    if config["DB_MAX_CONNECTIONS"]:
+        return config["DB_MAX_CONNECTIONS"]
+
+    engine = create_engine(config["SQLALCHEMY_DATABASE_URI"], poolclass=NullPool)
+    try:
+        with engine.connect() as connection:
+            limit = int(connection.execute(text("SHOW max_connections")).scalar())
+            reserved = int(
+                connection.execute(text("SHOW superuser_reserved_connections")).scalar()
+            )
+    finally:
+        engine.dispose()
+
+    return limit - reserved
+
+
+def check_pool_capacity(workers, config):
+    """Raises if the pools of all workers can open more connections than allowed
+
+    Raises:
+        RuntimeError: If workers times the pool size and overflow exceeds
+        the connections the database accepts
+    """
+    uri = config["SQLALCHEMY_DATABASE_URI"]
+    if config["DB_PGBOUNCER"] or not uri.startswith("postgres"):
+        return
+
+    per_worker = config["DB_POOL_SIZE"] + config["DB_MAX_OVERFLOW"]
+    allowed = max_connections(config)
+
+    if workers * per_worker > allowed:
+        raise RuntimeError(
+            f"{workers} workers with a pool of {config['DB_POOL_SIZE']} and an"
+            f" overflow of {config['DB_MAX_OVERFLOW']} can open"
+            f" {workers * per_worker} connections but the database accepts"
+            f" {allowed}. Lower DB_POOL_SIZE or DB_MAX_OVERFLOW, or run behind"
+            " PgBouncer with DB_PGBOUNCER=true"
+        )
@@ -0,0 +1,95 @@
+import csv
+import io
+from datetime import date, datetime
+
+from flask import Response, stream_with_context
+
+from src.helpers import serialization
+
+NDJSON = "ndjson"
+CSV = "csv"
+EXPORT_FORMATS = (NDJSON, CSV)
+MIMETYPES = {NDJSON: "application/x-ndjson", CSV: "text/csv"}
+# spreadsheets evaluate cells starting with these characters as formulas,
+# tab and carriage return are skipped before one of the others is checked
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+
+    # user supplied text such as names must not run as a formula when an
+    # admin opens the export, numbers are left as they are
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return f"'{value}"
+
+    return value
+
+
+def _ndjson_lines(rows, rows_per_write):
+    buffer = []
+
+    for row in rows:
+        buffer.append(serialization.dumps(row._asdict()))
+
+        if len(buffer) >= rows_per_write:
+            buffer.append(b"")
+            yield b"\n".join(buffer)
+            buffer = []
+
+    if buffer:
+        buffer.append(b"")
+        yield b"\n".join(buffer)
+
+
+def _csv_lines(rows, columns, rows_per_write):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    written = 0
+
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        written += 1
+
+        if written >= rows_per_write:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            written = 0
+
+    yield buffer.getvalue()
+
+
+def export_response(query, export_format, filename, rows_per_write=500):
+    """Streams rows as NDJSON or CSV in a chunked response
+
+    Rows are encoded as they are read and written rows_per_write at a time,
+    so the response never holds more than one write in memory. The request
+    context, and with it the database session the rows are read from, stays
+    open until the last row is sent.
+
+    Args:
+        query (Query): Column query, usually with yield_per, read lazily
+        export_format (str): ndjson or csv
+        filename (str): Name of the download without extension
+    """
+    if export_format == CSV:
+        columns = [column["name"] for column in query.column_descriptions]
+        lines = _csv_lines(query, columns, rows_per_write)
+    else:
+        lines = _ndjson_lines(query, rows_per_write)
+
+    return Response(
+        stream_with_context(lines),
+        mimetype=MIMETYPES[export_format],
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}.{export_format}",
+            # nginx would otherwise buffer the whole export before passing it on
+            "X-Accel-Buffering": "no",
+        },
+    )
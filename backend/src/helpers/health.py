@@ -0,0 +1,131 @@
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from src.extensions import db
+from src.helpers.db_pool import pool_stats
+from src.helpers.rate_table import rate_table
+
+LIVENESS_PATH = "/api/v1/healthz/live"
+
+
+class LivenessMiddleware:
+    """Answers liveness probes before the request reaches Flask
+
+    A worker that can run this code is alive, so the probe skips routing,
+    request hooks and the database entirely.
+    """
+
+    def __init__(self, wsgi_app) -> None:
+        self._wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO") == LIVENESS_PATH:
+            start_response(
+                "200 OK",
+                [("Content-Type", "application/json"), ("Content-Length", "16")],
+            )
+            return [b'{"status": "ok"}']
+
+        return self._wsgi_app(environ, start_response)
+
+
+class ReadinessCheck:
+    """Checks whether this worker can serve requests and caches the result
+
+    The database and the connection pool decide readiness. The age of the
+    exchange rate snapshot is reported but does not make a worker unready,
+    since every worker shares the same snapshots. The result is reused for
+    cache_ttl seconds so that frequent probes cost at most one query per
+    worker per cache_ttl.
+    """
+
+    def __init__(self, cache_ttl=0.25, pool_saturation=1.0, fx_max_age=3600) -> None:
+        self.configure(cache_ttl, pool_saturation, fx_max_age)
+        self._result = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def configure(self, cache_ttl=0.25, pool_saturation=1.0, fx_max_age=3600):
+        self._cache_ttl = cache_ttl
+        self._pool_saturation = pool_saturation
+        self._fx_max_age = fx_max_age
+
+    def check(self, pool_capacity):
+        """Returns whether the worker is ready and the result of each check
+
+        Args:
+            pool_capacity (int): Connections the pool may open, 0 if unbounded
+        """
+        with self._lock:
+            checked_at = self._checked_at
+            if checked_at is None or time.monotonic() - checked_at >= self._cache_ttl:
+                self._result = self._check(pool_capacity)
+                self._checked_at = time.monotonic()
+
+            return self._result
+
+    def clear(self):
+        with self._lock:
+            self._result = None
+            self._checked_at = None
+
+    def _check(self, pool_capacity):
+        # a saturated pool would make the database check and the snapshot
+        # refresh wait for a connection while holding the lock of the check
+        pool = self._check_pool(pool_capacity)
+        database = (
+            self._check_database()
+            if pool["ok"]
+            else {"ok": False, "error": "No free connection in the pool"}
+        )
+        checks = {
+            "database": database,
+            "pool": pool,
+            "fx_rates": self._check_fx_rates(refresh=pool["ok"]),
+        }
+        return database["ok"] and pool["ok"], checks
+
+    @staticmethod
+    def _check_database():
+        started = time.perf_counter()
+
+        try:
+            db.session.execute(text("SELECT 1"))
+        except Exception as e:
+            db.session.rollback()
+            return {"ok": False, "error": str(e)}
+
+        return {"ok": True, "latency_ms": (time.perf_counter() - started) * 1000}
+
+    def _check_pool(self, pool_capacity):
+        stats = pool_stats.snapshot(db.engine.pool)
+
+        if not pool_capacity or "checked_out" not in stats:
+            return dict(stats, ok=True)
+
+        saturation = stats["checked_out"] / pool_capacity
+        return dict(
+            stats,
+            saturation=saturation,
+            ok=saturation < self._pool_saturation,
+        )
+
+    def _check_fx_rates(self, refresh=True):
+        try:
+            snapshot = (
+                rate_table.snapshot() if refresh else rate_table.cached_snapshot()
+            )
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+        if snapshot is None:
+            return {"ok": False, "age_seconds": None}
+
+        age = (datetime.utcnow() - snapshot.created_at).total_seconds()
+        return {"ok": age <= self._fx_max_age, "age_seconds": age}
+
+
+readiness_check = ReadinessCheck()
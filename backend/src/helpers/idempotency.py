@@ -0,0 +1,120 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request
+from flask_jwt_extended import get_jwt_identity
+
+from src.app.db.model import IdempotencyKeyModel
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
+
+class ResponseCache:
+    """Thread safe LRU cache of completed idempotent responses"""
+
+    def __init__(self, maxsize=1024) -> None:
+        self._maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set_maxsize(self, maxsize):
+        with self._lock:
+            self._maxsize = maxsize
+            while len(self._items) > max(maxsize, 0):
+                self._items.popitem(last=False)
+
+    def get(self, cache_key):
+        with self._lock:
+            response = self._items.get(cache_key)
+            if response is not None:
+                self._items.move_to_end(cache_key)
+            return response
+
+    def put(self, cache_key, response):
+        if self._maxsize <= 0:
+            return
+
+        with self._lock:
+            self._items[cache_key] = response
+            self._items.move_to_end(cache_key)
+            while len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+response_cache = ResponseCache()
+
+
+def _request_hash():
+    """Fingerprints the request so that a reused key with a new payload is caught"""
+    fingerprint = hashlib.sha256()
+    fingerprint.update(request.query_string)
+    fingerprint.update(request.get_data())
+    return fingerprint.hexdigest()
+
+
+def idempotent(func):
+    """Replays the stored response of requests that repeat an Idempotency-Key
+
+    The first request with a key claims it in the idempotency_key table and
+    its response is stored once the handler returns. Repeats of the key get
+    that response back from the in-process cache or the table without
+    running the handler. Requests without the header run as usual.
+
+    Must be applied below jwt_required so that keys are scoped per user.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+
+        if not key:
+            return func(*args, **kwargs)
+
+        scope = f"{get_jwt_identity()}:{request.method}:{request.path}"
+        request_hash = _request_hash()
+        cached = response_cache.get((scope, key))
+
+        if cached is None:
+            stored = IdempotencyKeyModel.reserve(scope, key, request_hash)
+
+            if stored is None:
+                return _run_and_store(func, scope, key, request_hash, args, kwargs)
+
+            if stored.status_code is None:
+                return {"message": f"A request with key {key} is in progress"}, 409
+
+            cached = (
+                stored.request_hash,
+                json.loads(stored.response_body),
+                stored.status_code,
+            )
+            response_cache.put((scope, key), cached)
+
+        stored_hash, body, status_code = cached
+
+        if stored_hash != request_hash:
+            return {"message": f"Key {key} was used with a different request"}, 422
+
+        return body, status_code
+
+    return wrapper
+
+
+def _run_and_store(func, scope, key, request_hash, args, kwargs):
+    try:
+        response = func(*args, **kwargs)
+    except Exception:
+        IdempotencyKeyModel.release(scope, key)
+        raise
+
+    body, status_code = response[0], response[1]
+    IdempotencyKeyModel.complete(scope, key, status_code, json.dumps(body))
+    response_cache.put((scope, key), (request_hash, body, status_code))
+    return response
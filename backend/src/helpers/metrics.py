@@ -0,0 +1,133 @@
+import os
+import time
+
+from flask import g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+REQUEST_LATENCY = Histogram(
+    "wallet_http_request_duration_seconds",
+    "Latency of API requests",
+    ["endpoint", "method", "status"],
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "wallet_db_queries_per_request",
+    "SQL statements executed by one API request",
+    ["endpoint", "method"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "wallet_db_query_seconds_per_request",
+    "Time one API request spent executing SQL statements",
+    ["endpoint", "method"],
+)
+JWT_BLOCKLIST_LOOKUP = Histogram(
+    "wallet_jwt_blocklist_lookup_seconds",
+    "Time to check whether a JWT is revoked",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5),
+)
+FIXER_REQUEST_LATENCY = Histogram(
+    "wallet_fixer_request_duration_seconds",
+    "Latency of Fixer API calls",
+    ["endpoint", "outcome"],
+)
+WALLET_OPERATIONS = Counter(
+    "wallet_operations_total",
+    "Outcomes of wallet operations",
+    ["operation", "outcome"],
+)
+
+# called with the statement and duration of every SQL statement of a request
+_query_observers = []
+
+
+def add_query_observer(observer):
+    """Passes every SQL statement of a request and its duration to observer
+
+    The statements are timed by the engine listeners of this module, so
+    observers do not register listeners of their own.
+    """
+    _query_observers.append(observer)
+
+
+def record_wallet_operation(operation, outcome):
+    """Counts one credit, debit or transfer by its outcome"""
+    WALLET_OPERATIONS.labels(operation=operation, outcome=outcome).inc()
+
+
+def latest():
+    """Returns the metrics in the Prometheus text format and its content type
+
+    When PROMETHEUS_MULTIPROC_DIR is set, as it is under gunicorn, every
+    worker writes its samples to that directory and the metrics of all
+    workers are aggregated from it, whichever worker answers the scrape.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def init_app(app):
+    """Records request latency and SQL statements of every request of app"""
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_query_time = 0.0
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop("metrics_started", None)
+
+        if started is not None:
+            endpoint = request.endpoint or "unmatched"
+            REQUEST_LATENCY.labels(
+                endpoint=endpoint,
+                method=request.method,
+                status=response.status_code,
+            ).observe(time.perf_counter() - started)
+            DB_QUERIES_PER_REQUEST.labels(
+                endpoint=endpoint, method=request.method
+            ).observe(g.pop("metrics_queries", 0))
+            DB_TIME_PER_REQUEST.labels(
+                endpoint=endpoint, method=request.method
+            ).observe(g.pop("metrics_query_time", 0.0))
+
+        return response
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info["metrics_query_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _observe_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("metrics_query_started", None)
+
+    if started is None or not has_request_context():
+        return
+
+    duration = time.perf_counter() - started
+
+    if "metrics_queries" in g:
+        g.metrics_queries += 1
+        g.metrics_query_time += duration
+
+    for observer in _query_observers:
+        observer(statement, duration)
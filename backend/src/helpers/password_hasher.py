@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.app.db.model import UserModel
+
+try:
+    from gevent import monkey
+    from gevent.threadpool import ThreadPool
+except ImportError:  # pragma: no cover - gevent is only installed for gunicorn
+    monkey = None
+    ThreadPool = None
+
+
+def _gevent_is_active():
+    return monkey is not None and monkey.is_module_patched("threading")
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords on a bounded pool of native threads
+
+    pbkdf2 spends its time in hashlib, which releases the GIL, so a
+    thread can hash while the worker keeps serving other requests. Under
+    gevent the pool is a gevent thread pool, so the waiting greenlet yields
+    to the hub. Otherwise a plain thread pool is used. At most pool_size
+    hashes run at once per worker and the rest wait in the queue.
+    """
+
+    def __init__(self, pool_size=4) -> None:
+        self._pool_size = pool_size
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def configure(self, pool_size=4):
+        with self._lock:
+            self._shutdown()
+            self._pool_size = pool_size
+
+    def hash(self, password):
+        """Returns the hash of password"""
+        return self._run(UserModel.generate_hash, password)
+
+    def verify(self, password, password_hash):
+        """Checks password against password_hash"""
+        return self._run(UserModel.verify_hash, password, password_hash)
+
+    def _run(self, function, *args):
+        if not self._pool_size:
+            return function(*args)
+
+        pool = self._get_pool()
+
+        if _gevent_is_active():
+            return pool.apply(function, args)
+
+        return pool.submit(function, *args).result()
+
+    def _get_pool(self):
+        # created on first use so that every forked worker gets its own threads
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if _gevent_is_active():
+                        self._pool = ThreadPool(self._pool_size)
+                    else:
+                        self._pool = ThreadPoolExecutor(
+                            max_workers=self._pool_size,
+                            thread_name_prefix="password-hasher",
+                        )
+
+        return self._pool
+
+    def _shutdown(self):
+        if self._pool is None:
+            return
+
+        if isinstance(self._pool, ThreadPoolExecutor):
+            self._pool.shutdown(wait=False)
+        else:
+            self._pool.kill()
+
+        self._pool = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,177 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from src.helpers import metrics
+from src.utils import logger
+
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_TOKEN_SALT = "request-profiling"
+# statements and profiled functions kept in one log record
+MAX_LOGGED_QUERIES = 50
+MAX_LOGGED_FUNCTIONS = 30
+
+# cProfile cannot follow requests that interleave in one worker, so only one
+# request of a worker collects cProfile stats at a time
+_cprofile_lock = threading.Lock()
+
+
+def _serializer():
+    return URLSafeTimedSerializer(
+        current_app.config["SECRET_KEY"], salt=PROFILE_TOKEN_SALT
+    )
+
+
+def create_profile_token(with_cprofile=False):
+    """Returns a value of the X-Profile-Token header that profiles a request"""
+    return _serializer().dumps({"cprofile": bool(with_cprofile)})
+
+
+def _token_options():
+    """Returns the options of a valid profile token of the request or None"""
+    token = request.headers.get(PROFILE_HEADER)
+
+    if not token:
+        return None
+
+    try:
+        return _serializer().loads(
+            token, max_age=current_app.config["PROFILING_TOKEN_MAX_AGE"]
+        )
+    except BadSignature:
+        return None
+
+
+class RequestProfile:
+    """SQL statements and optional cProfile stats of one request
+
+    cProfile stats are skipped while another request of the worker collects
+    them, the request is then logged with cprofile_skipped.
+    """
+
+    def __init__(self, forced, with_cprofile) -> None:
+        self.forced = forced
+        self.queries = []
+        self.started = time.perf_counter()
+        self.cprofile = None
+        self.cprofile_skipped = False
+        self._cprofiling = False
+
+        if with_cprofile:
+            if _cprofile_lock.acquire(blocking=False):
+                self.cprofile = cProfile.Profile()
+                self.cprofile.enable()
+                self._cprofiling = True
+            else:
+                self.cprofile_skipped = True
+
+    def add_query(self, statement, duration):
+        self.queries.append((statement, duration))
+
+    def stop_cprofile(self):
+        """Stops collecting cProfile stats and lets another request collect them"""
+        if self._cprofiling:
+            self.cprofile.disable()
+            self._cprofiling = False
+            _cprofile_lock.release()
+
+    def finish(self, response):
+        """Returns the log record of the request or None if it is unremarkable"""
+        duration_ms = (time.perf_counter() - self.started) * 1000
+        self.stop_cprofile()
+
+        config = current_app.config
+        slow = duration_ms >= config["PROFILING_SLOW_REQUEST_MS"]
+        repeated = [
+            {"statement": statement, "count": count}
+            for statement, count in Counter(s for s, _ in self.queries).most_common()
+            if count >= config["PROFILING_REPEATED_QUERY_THRESHOLD"]
+        ]
+
+        if not (self.forced or slow or repeated):
+            return None
+
+        slowest = sorted(self.queries, key=lambda query: query[1], reverse=True)
+        record = {
+            "event": "request_profile",
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "duration_ms": round(duration_ms, 3),
+            "slow": slow,
+            "query_count": len(self.queries),
+            "query_time_ms": round(sum(d for _, d in self.queries) * 1000, 3),
+            "queries": [
+                {"statement": statement, "duration_ms": round(duration * 1000, 3)}
+                for statement, duration in slowest[:MAX_LOGGED_QUERIES]
+            ],
+            "repeated_queries": repeated,
+        }
+
+        if self.cprofile_skipped:
+            record["cprofile_skipped"] = True
+
+        if self.cprofile:
+            stats_output = io.StringIO()
+            stats = pstats.Stats(self.cprofile, stream=stats_output)
+            stats.sort_stats("cumulative").print_stats(MAX_LOGGED_FUNCTIONS)
+            record["profile"] = stats_output.getvalue()
+
+        return record
+
+
+def init_app(app):
+    """Profiles the requests of app when enabled by config or a profile token
+
+    With PROFILING_ENABLED every request is profiled and logged when it is
+    slow or repeats a statement. A request carrying a valid X-Profile-Token
+    header is always logged, with cProfile stats if the token asks for them.
+    """
+
+    @app.before_request
+    def start_profile():
+        options = _token_options()
+
+        if options is None and not app.config["PROFILING_ENABLED"]:
+            return
+
+        with_cprofile = app.config["PROFILING_CPROFILE"] or bool(
+            options and options.get("cprofile")
+        )
+        g.request_profile = RequestProfile(options is not None, with_cprofile)
+
+    @app.after_request
+    def log_profile(response):
+        profile = g.pop("request_profile", None)
+
+        if profile is not None:
+            record = profile.finish(response)
+            if record is not None:
+                logger.warning("Request profile", **record)
+
+        return response
+
+    @app.teardown_request
+    def stop_profile(exception):
+        # after_request hooks are skipped when the request raised
+        profile = g.pop("request_profile", None)
+
+        if profile is not None:
+            profile.stop_cprofile()
+
+
+def _record_query(statement, duration):
+    profile = g.get("request_profile")
+
+    if profile is not None:
+        profile.add_query(statement, duration)
+
+
+metrics.add_query_observer(_record_query)
@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+from src.app.db.model import LoginAttemptModel
+
+
+class MemoryWindowStore:
+    """Attempt timestamps of each key held in the memory of this worker
+
+    Keys are ordered by their latest attempt. Keys whose latest attempt left
+    the window are dropped as new attempts come in. Past MAX_KEYS, the keys
+    with the oldest attempts are dropped, so memory stays bounded however
+    many emails and IPs are tried.
+    """
+
+    MAX_KEYS = 100000
+
+    def __init__(self) -> None:
+        self._attempts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_window(self, key, window):
+        """Returns the attempt count of key and seconds until the oldest expires"""
+        with self._lock:
+            attempts = self._attempts.get(key)
+
+            if not attempts:
+                return 0, 0
+
+            self._expire(attempts, time.monotonic() - window)
+
+            if not attempts:
+                del self._attempts[key]
+                return 0, 0
+
+            return len(attempts), attempts[0] + window - time.monotonic()
+
+    def add(self, key, window):
+        with self._lock:
+            now = time.monotonic()
+            self._drop_expired(now - window)
+
+            if key in self._attempts:
+                self._attempts.move_to_end(key)
+            else:
+                while len(self._attempts) >= self.MAX_KEYS:
+                    self._attempts.popitem(last=False)
+                self._attempts[key] = deque()
+
+            self._attempts[key].append(now)
+
+    def reset(self, key):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._attempts.clear()
+
+    @staticmethod
+    def _expire(attempts, since):
+        while attempts and attempts[0] <= since:
+            attempts.popleft()
+
+    def _drop_expired(self, since):
+        # the first key has the oldest latest attempt
+        while self._attempts:
+            key, attempts = next(iter(self._attempts.items()))
+            if attempts and attempts[-1] > since:
+                return
+            del self._attempts[key]
+
+
+class DatabaseWindowStore:
+    """Attempts of each key in the login_attempt table, shared by every worker"""
+
+    def get_window(self, key, window):
+        now = datetime.utcnow()
+        count, oldest = LoginAttemptModel.get_window(
+            key, now - timedelta(seconds=window)
+        )
+
+        if not count:
+            return 0, 0
+
+        return count, (oldest - now).total_seconds() + window
+
+    def add(self, key, window):
+        LoginAttemptModel.add(key)
+
+    def reset(self, key):
+        LoginAttemptModel.delete_by_key(key)
+
+    def clear(self):
+        pass
+
+
+class LoginRateLimiter:
+    """Sliding window limit of failed logins per account and client IP pair
+    and per client IP
+
+    A login is refused before the user is looked up or the password is
+    hashed once too many attempts failed within window seconds. Failed
+    attempts on an account only count against the IP they came from, so
+    failed attempts from other clients cannot lock its owner out.
+    Successful logins are not counted and clear the failures of the account
+    from that IP, so legitimate users are not slowed down.
+    """
+
+    MEMORY_BACKEND = "memory"
+    DATABASE_BACKEND = "database"
+
+    def __init__(
+        self, account_limit=5, ip_limit=50, window=300.0, backend=MEMORY_BACKEND
+    ) -> None:
+        self.configure(account_limit, ip_limit, window, backend)
+
+    def configure(
+        self, account_limit=5, ip_limit=50, window=300.0, backend=MEMORY_BACKEND
+    ):
+        if backend not in (self.MEMORY_BACKEND, self.DATABASE_BACKEND):
+            raise ValueError(f"Unknown login rate limit backend {backend}")
+
+        self._limits = {"account": account_limit, "ip": ip_limit}
+        self._window = window
+        self._store = (
+            DatabaseWindowStore()
+            if backend == self.DATABASE_BACKEND
+            else MemoryWindowStore()
+        )
+
+    def retry_after(self, email, ip):
+        """Returns seconds until a login may be attempted, 0 if it may be now"""
+        retry_after = 0
+
+        for key, limit in self._keys(email, ip):
+            if not limit:
+                continue
+
+            count, expires_in = self._store.get_window(key, self._window)
+            if count >= limit:
+                retry_after = max(retry_after, expires_in)
+
+        return retry_after
+
+    def record_failure(self, email, ip):
+        for key, limit in self._keys(email, ip):
+            if limit:
+                self._store.add(key, self._window)
+
+    def record_success(self, email, ip):
+        self._store.reset(self._account_key(email, ip))
+
+    def clear(self):
+        self._store.clear()
+
+    def _keys(self, email, ip):
+        return (
+            (self._account_key(email, ip), self._limits["account"]),
+            (f"ip:{ip}", self._limits["ip"]),
+        )
+
+    @staticmethod
+    def _account_key(email, ip):
+        return f"account:{email.strip().lower()}:ip:{ip}"
+
+
+login_rate_limiter = LoginRateLimiter()
@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.extensions import db
+from src.utils import logger
+from src.app.db.model import ExchangeRateError, ExchangeRateSnapshotModel
+from src.helpers.currency_converter import rate_provider
+from src.helpers.reference_cache import reference_cache
+
+RateSnapshot = namedtuple(
+    "RateSnapshot", ["id", "base_currency", "rates", "created_at"]
+)
+
+
+class RateTable:
+    """Per-worker copy of the latest exchange rate snapshot
+
+    Transfers between currencies are converted at the rates of the latest
+    row of the exchange_rate_snapshot table. Each worker keeps that row in
+    memory and looks for a newer one at most once per check interval, so
+    converting a transfer never calls the Fixer API.
+    """
+
+    def __init__(self, base_currency="EUR", check_interval=60.0) -> None:
+        self._base_currency = base_currency
+        self._check_interval = check_interval
+        self._snapshot = None
+        self._last_check = None
+        self._lock = threading.Lock()
+
+    def configure(self, base_currency="EUR", check_interval=60.0):
+        self._base_currency = base_currency
+        self._check_interval = check_interval
+
+    def snapshot(self):
+        """Returns the latest rate snapshot or None if none was taken yet"""
+        self._refresh_if_due()
+        return self._snapshot
+
+    def cached_snapshot(self):
+        """Returns the snapshot held by this worker without looking for a newer one"""
+        return self._snapshot
+
+    def rate(self, source_currency_id, target_currency_id):
+        """Returns the rate between two currencies and the id of its snapshot
+
+        Snapshot rates are quoted against the base currency, so the rate
+        between two other currencies is the ratio of their base rates.
+
+        Raises:
+            ExchangeRateError: If there is no snapshot or it has no rate for
+            either currency
+        """
+        snapshot = self.snapshot()
+
+        if snapshot is None:
+            raise ExchangeRateError("No exchange rates are available")
+
+        source_rate = self._base_rate(snapshot, source_currency_id)
+        target_rate = self._base_rate(snapshot, target_currency_id)
+        return target_rate / source_rate, snapshot.id
+
+    def take_snapshot(self):
+        """Stores the current rates of the base currency as a new snapshot
+
+        Raises:
+            CurrencyConversionError: If the rates cannot be fetched
+        """
+        rates = rate_provider.get_rates(self._base_currency)
+        model = ExchangeRateSnapshotModel.create(self._base_currency, rates)
+
+        with self._lock:
+            self._snapshot = self._to_record(model)
+            self._last_check = time.monotonic()
+
+        return self._snapshot
+
+    def refresh_snapshot(self, max_age):
+        """Takes a snapshot unless the latest one is younger than max_age seconds
+
+        Workers of every instance race for one database lock and the winner
+        checks the age of the latest snapshot, so a deployment stores one
+        snapshot per max_age however many workers it runs, and workers that
+        lose never call the Fixer API.
+
+        Returns:
+            RateSnapshot: The new snapshot, or None if none was due
+        """
+        try:
+            if not ExchangeRateSnapshotModel.try_lock_refresh():
+                return None
+
+            latest = ExchangeRateSnapshotModel.get_latest()
+            fresh_after = datetime.utcnow() - timedelta(seconds=max_age)
+            if latest is not None and latest.created_at > fresh_after:
+                return None
+
+            return self.take_snapshot()
+        finally:
+            # ends the transaction, and with it the lock, when no snapshot was due
+            db.session.rollback()
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = None
+            self._last_check = None
+
+    def _base_rate(self, snapshot, currency_id):
+        currency = reference_cache.currency(currency_id)
+
+        if currency is None:
+            raise ExchangeRateError(f"Currency {currency_id} does not exist")
+
+        if currency.currency_code == snapshot.base_currency:
+            return Decimal(1)
+
+        rate = snapshot.rates.get(currency.currency_code)
+
+        if not rate:
+            raise ExchangeRateError(f"No exchange rate for {currency.currency_code}")
+
+        return Decimal(str(rate))
+
+    def _refresh_if_due(self):
+        last_check = self._last_check
+        if (
+            last_check is not None
+            and time.monotonic() - last_check < self._check_interval
+        ):
+            return
+
+        with self._lock:
+            if self._last_check is not last_check:
+                return
+
+            model = ExchangeRateSnapshotModel.get_latest()
+            if model is not None and (
+                self._snapshot is None or model.id != self._snapshot.id
+            ):
+                self._snapshot = self._to_record(model)
+
+            self._last_check = time.monotonic()
+
+    @staticmethod
+    def _to_record(model):
+        return RateSnapshot(
+            id=model.id,
+            base_currency=model.base_currency,
+            rates=model.get_rates(),
+            created_at=model.created_at,
+        )
+
+
+class RateSnapshotRefresher(threading.Thread):
+    """Background thread that stores a new exchange rate snapshot periodically
+
+    Every worker runs a refresher, but refresh_snapshot lets only one of them
+    store a snapshot per interval. The worker that does also deletes the
+    snapshots older than the retention period.
+    """
+
+    def __init__(self, app, interval, retention=None) -> None:
+        super().__init__(name="rate-snapshot-refresher", daemon=True)
+        self._app = app
+        self._interval = interval
+        self._retention = retention
+        self._stopped = threading.Event()
+
+    def run(self):
+        while True:
+            with self._app.app_context():
+                try:
+                    snapshot = rate_table.refresh_snapshot(self._interval)
+                    if snapshot is not None and self._retention:
+                        ExchangeRateSnapshotModel.purge_older_than(
+                            datetime.utcnow() - timedelta(seconds=self._retention)
+                        )
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error("Failure in taking exchange rate snapshot: %s", e)
+                finally:
+                    db.session.remove()
+
+            if self._stopped.wait(self._interval):
+                return
+
+    def stop(self):
+        self._stopped.set()
+
+
+rate_table = RateTable()
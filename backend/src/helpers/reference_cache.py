@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import namedtuple
+
+from src.app.db.model import CurrencyModel, ReferenceDataVersionModel, RolesModel
+
+RoleRecord = namedtuple("RoleRecord", ["id", "name"])
+CurrencyRecord = namedtuple("CurrencyRecord", ["id", "currency_code", "currency_name"])
+
+
+class ReferenceDataCache:
+    """Per-worker cache of roles and currencies
+
+    Roles and currencies are small and rarely change, so each worker holds a
+    full copy. The copy is reloaded when the version in the
+    reference_data_version table changes, which is checked at most once per
+    check interval. Changes made by this worker invalidate its copy at once.
+
+    Lookups return read-only records, not ORM objects, so handlers that
+    modify a role still load it with RolesModel.
+    """
+
+    def __init__(self, check_interval=5.0) -> None:
+        self._check_interval = check_interval
+        self._roles_by_id = {}
+        self._roles_by_name = {}
+        self._currencies_by_id = {}
+        self._currencies_by_code = {}
+        self._version = None
+        self._last_check = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def set_check_interval(self, check_interval):
+        self._check_interval = check_interval
+
+    def load(self):
+        """Loads all roles and currencies"""
+        with self._lock:
+            self._load()
+
+    def role(self, role_id):
+        """Returns the role with the given id or None"""
+        self._refresh_if_due()
+        return self._lookup(
+            self._roles_by_id,
+            int(role_id),
+            lambda: RolesModel.find_by_role_id(role_id),
+            self._add_role,
+        )
+
+    def role_by_name(self, role_name):
+        """Returns the role with the given name or None"""
+        self._refresh_if_due()
+        return self._lookup(
+            self._roles_by_name,
+            role_name,
+            lambda: RolesModel.find_by_name(role_name),
+            self._add_role,
+        )
+
+    def currency(self, currency_id):
+        """Returns the currency with the given id or None"""
+        self._refresh_if_due()
+        return self._lookup(
+            self._currencies_by_id,
+            int(currency_id),
+            lambda: CurrencyModel.find_by_currency_id(currency_id),
+            self._add_currency,
+        )
+
+    def bump_version(self):
+        """Marks reference data as changed for this and every other worker"""
+        ReferenceDataVersionModel.bump()
+        with self._lock:
+            self._version = None
+            self._last_check = None
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": self._version,
+            "roles": len(self._roles_by_id),
+            "currencies": len(self._currencies_by_id),
+        }
+
+    def _lookup(self, records, key, find_in_db, add_record):
+        record = records.get(key)
+
+        if record is not None:
+            self.hits += 1
+            return record
+
+        # the record may have been added by another worker since the last load
+        self.misses += 1
+        model = find_in_db()
+        return add_record(model) if model else None
+
+    def _add_role(self, role):
+        record = RoleRecord(id=role.id, name=role.name)
+        self._roles_by_id[record.id] = record
+        self._roles_by_name[record.name] = record
+        return record
+
+    def _add_currency(self, currency):
+        record = CurrencyRecord(
+            id=currency.id,
+            currency_code=currency.currency_code,
+            currency_name=currency.currency_name,
+        )
+        self._currencies_by_id[record.id] = record
+        self._currencies_by_code[record.currency_code] = record
+        return record
+
+    def _refresh_if_due(self):
+        last_check = self._last_check
+        if (
+            last_check is not None
+            and time.monotonic() - last_check < self._check_interval
+        ):
+            return
+
+        with self._lock:
+            if self._last_check is not last_check:
+                return
+
+            if ReferenceDataVersionModel.get_version() != self._version:
+                self._load()
+
+            self._last_check = time.monotonic()
+
+    def _load(self):
+        version = ReferenceDataVersionModel.get_version()
+        self._roles_by_id = {}
+        self._roles_by_name = {}
+        self._currencies_by_id = {}
+        self._currencies_by_code = {}
+
+        for role in RolesModel.get_all_roles():
+            self._add_role(role)
+
+        for currency in CurrencyModel.get_all_currencies():
+            self._add_currency(currency)
+
+        self._version = version
+        self._last_check = time.monotonic()
+
+
+reference_cache = ReferenceDataCache()
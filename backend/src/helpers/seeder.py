@@ -0,0 +1,79 @@
+import json
+import os
+from datetime import datetime
+
+from src.extensions import db
+from src.app.db.model import CurrencyModel, RolesModel, UserModel
+from src.helpers.reference_cache import reference_cache
+
+CURRENCY_SYMBOLS_SNAPSHOT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "app",
+    "db",
+    "seed_data",
+    "currency_symbols.json",
+)
+DEFAULT_ROLES = ("Super Admin", "Admin", "General")
+DEFAULT_USER_EMAIL = "superadmin@wallet.co"
+
+
+def load_currency_symbols(path=CURRENCY_SYMBOLS_SNAPSHOT):
+    """Returns currency names keyed by code from a Fixer symbols response file"""
+    with open(path, encoding="utf-8") as snapshot:
+        return json.load(snapshot)["symbols"]
+
+
+def seed_currencies(currency_symbols):
+    """Inserts or renames every currency in one statement
+
+    Args:
+        currency_symbols (dict): Currency names keyed by currency code
+
+    Returns:
+        int: The number of currencies inserted or updated
+    """
+    rows = [
+        {"currency_code": code, "currency_name": name}
+        for code, name in currency_symbols.items()
+    ]
+    count = CurrencyModel.bulk_upsert(rows, ["currency_code"], ["currency_name"])
+    db.session.commit()
+    reference_cache.bump_version()
+    return count
+
+
+def seed_roles(role_names=DEFAULT_ROLES):
+    """Inserts the roles that do not exist yet and returns how many were added"""
+    count = RolesModel.bulk_upsert([{"name": name} for name in role_names], ["name"])
+    db.session.commit()
+    reference_cache.bump_version()
+    return count
+
+
+def seed_default_user(password, email=DEFAULT_USER_EMAIL):
+    """Inserts the super admin user unless a user with its email exists
+
+    An existing user is left untouched so that rerunning the seeder does not
+    reset a changed password.
+
+    Returns:
+        bool: Whether the user was inserted
+    """
+    role = RolesModel.find_by_name(DEFAULT_ROLES[0])
+
+    if not role:
+        raise ValueError("Seed the roles table before the default user")
+
+    row = {
+        "name": "Super Admin",
+        "email": email,
+        "password": UserModel.generate_hash(password),
+        "role_id": role.id,
+        "telephone": "",
+        "is_disabled": False,
+        "last_login_date": datetime.utcnow(),
+        "profile_photo": "",
+    }
+    count = UserModel.bulk_upsert([row], ["email"])
+    db.session.commit()
+    return count > 0
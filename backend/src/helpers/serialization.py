@@ -0,0 +1,180 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import partial, wraps
+from http import HTTPStatus
+
+from flask import current_app, make_response, request
+from flask_restx import fields, marshal
+from flask_restx.utils import merge, unpack
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# fields whose format is a plain conversion once None is ruled out
+_PLAIN_FORMATS = {
+    fields.Integer: int,
+    fields.String: str,
+    fields.Float: float,
+}
+
+
+def _default(value):
+    """Encodes the values the JSON encoders cannot encode themselves"""
+    if isinstance(value, Decimal):
+        return str(value)
+
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data, indent=False):
+    """Encodes data as JSON bytes with orjson when installed
+
+    Decimals are encoded as strings so that amounts keep their precision.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
+
+    separators = None if indent else (",", ":")
+    return json.dumps(
+        data, default=_default, indent=4 if indent else None, separators=separators
+    ).encode()
+
+
+def output_json(data, code, headers=None):
+    """Makes a Flask response with a JSON encoded body
+
+    Replaces the JSON representation of flask-restx. Settings in RESTX_JSON
+    are only understood by the json module, so they route back to it.
+    """
+    settings = current_app.config.get("RESTX_JSON")
+
+    if settings or not current_app.config["FAST_SERIALIZATION"]:
+        settings = dict(settings or {})
+        if current_app.debug:
+            settings.setdefault("indent", 4)
+        dumped = json.dumps(data, **settings) + "\n"
+    else:
+        dumped = dumps(data, indent=current_app.debug) + b"\n"
+
+    response = make_response(dumped, code)
+    response.headers.extend(headers or {})
+    return response
+
+
+class CompiledModel:
+    """Serializer of one api.model that is built once instead of per object
+
+    flask-restx marshal walks the field definitions of the model for every
+    object it serializes. This resolves each field to its key, attribute and
+    format function up front and produces the same output for the fields
+    used by the API models. Fields with a custom output, a nested attribute
+    or a mask are serialized by the field itself.
+    """
+
+    def __init__(self, model) -> None:
+        self.model = model
+        self._fields = tuple(
+            self._compile_field(name, field) for name, field in model.items()
+        )
+
+    @staticmethod
+    def _compile_field(name, field):
+        if isinstance(field, type):
+            field = field()
+
+        attribute = name if field.attribute is None else field.attribute
+        plain = (
+            type(field).output is fields.Raw.output
+            and isinstance(attribute, str)
+            and "." not in attribute
+            and not callable(field.default)
+            and field.mask is None
+        )
+
+        if not plain:
+            return name, None, partial(field.output, name), None
+
+        default = field.format(field.default) if field.default else field.default
+        return name, attribute, _PLAIN_FORMATS.get(type(field), field.format), default
+
+    def serialize(self, obj):
+        """Returns the fields of the model for a dict or an object"""
+        if isinstance(obj, dict):
+            get = obj.get
+        else:
+            get = partial(getattr, obj)
+
+        result = {}
+        for name, attribute, format_value, default in self._fields:
+            if attribute is None:
+                result[name] = format_value(obj)
+                continue
+
+            value = get(attribute, None)
+            result[name] = default if value is None else format_value(value)
+
+        return result
+
+    def serialize_list(self, objects):
+        return [self.serialize(obj) for obj in objects]
+
+
+_compiled_models = {}
+
+
+def compile_model(model):
+    """Returns the compiled serializer of an api.model, building it once"""
+    compiled = _compiled_models.get(model.name)
+
+    if compiled is None or compiled.model is not model:
+        compiled = _compiled_models[model.name] = CompiledModel(model)
+
+    return compiled
+
+
+def marshal_with(namespace, model, as_list=False, code=HTTPStatus.OK, description=None):
+    """Drop-in for Namespace.marshal_with that serializes with a compiled model
+
+    The Swagger documentation is registered exactly as Namespace.marshal_with
+    registers it. Requests with an X-Fields mask and apps with
+    FAST_SERIALIZATION disabled are marshalled by flask-restx instead.
+    """
+    compiled = compile_model(model)
+
+    def decorator(func):
+        doc = {
+            "responses": {
+                str(code): (
+                    (description, [model], {}) if as_list else (description, model, {})
+                )
+            },
+            "__mask__": True,
+        }
+        func.__apidoc__ = merge(getattr(func, "__apidoc__", {}), doc)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            data, status, headers = unpack(func(*args, **kwargs))
+            mask = request.headers.get(current_app.config["RESTX_MASK_HEADER"])
+
+            if mask or not current_app.config["FAST_SERIALIZATION"]:
+                data = marshal(data, model, mask=mask, ordered=namespace.ordered)
+            elif isinstance(data, (list, tuple)):
+                data = compiled.serialize_list(data)
+            else:
+                data = compiled.serialize(data)
+
+            return data, status, headers
+
+        return wrapper
+
+    return decorator
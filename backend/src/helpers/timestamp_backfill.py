@@ -0,0 +1,137 @@
+from sqlalchemy import func, inspect, select, text, update
+
+from src.extensions import db
+from src.app.db.model import TransactionsModel, UserModel, UtcNow, WalletModel
+
+# tables whose rows are created one at a time, so equal creation times can
+# only come from the default that was evaluated when the models were imported
+SINGLE_ROW_MODELS = (UserModel, WalletModel)
+
+
+def _existing_tables():
+    return set(inspect(db.engine).get_table_names())
+
+
+def sync_server_defaults():
+    """Sets the database side defaults of timestamp columns on existing tables
+
+    create_all does not alter tables that already exist, so tables created
+    before the defaults were declared lack them. Only PostgreSQL can alter
+    a column default, other databases are left as they are.
+
+    Returns:
+        int: The number of columns whose default was set
+    """
+    if db.engine.dialect.name != "postgresql":
+        return 0
+
+    dialect = db.engine.dialect
+    quote = dialect.identifier_preparer.quote
+    existing_tables = _existing_tables()
+    altered = 0
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        for column in table.columns:
+            default = column.server_default
+            if default is None or not isinstance(default.arg, UtcNow):
+                continue
+
+            db.session.execute(
+                text(
+                    f"ALTER TABLE {quote(table.name)} ALTER COLUMN {quote(column.name)}"
+                    f" SET DEFAULT {default.arg.compile(dialect=dialect)}"
+                )
+            )
+            altered += 1
+
+    db.session.commit()
+    return altered
+
+
+def create_time_indexes():
+    """Creates the time range indexes of the transactions table if missing
+
+    On PostgreSQL the index is built concurrently so that the ledger keeps
+    taking writes while it is built.
+
+    Returns:
+        list: The names of the indexes
+    """
+    names = []
+
+    for index in TransactionsModel.__table__.indexes:
+        if index.name != "ix_transactions_created_at_brin":
+            continue
+
+        if db.engine.dialect.name == "postgresql":
+            with db.engine.connect().execution_options(
+                isolation_level="AUTOCOMMIT"
+            ) as connection:
+                connection.execute(
+                    text(
+                        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index.name}"
+                        " ON transactions USING brin (created_at)"
+                    )
+                )
+        else:
+            index.create(bind=db.engine, checkfirst=True)
+
+        names.append(index.name)
+
+    return names
+
+
+def backfill_wallet_updated_at():
+    """Moves updated_at of wallets up to their latest ledger entry
+
+    Every balance change appends a ledger entry with the time it happened,
+    so a wallet whose updated_at is older than its latest entry gets the
+    time of that entry.
+
+    Returns:
+        int: The number of wallets updated
+    """
+    latest_entry = (
+        select(func.max(TransactionsModel.created_at))
+        .where(TransactionsModel.user_id == WalletModel.user_id)
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        update(WalletModel)
+        .where(latest_entry > WalletModel.updated_at)
+        .values(updated_at=latest_entry)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def count_shared_created_at():
+    """Counts rows that share their creation time with another row
+
+    These rows were created with the import time default. Their real
+    creation time is not recorded anywhere, so they cannot be backfilled,
+    but they keep their order by id.
+
+    Returns:
+        dict: Numbers of rows keyed by table name
+    """
+    counts = {}
+
+    for model in SINGLE_ROW_MODELS:
+        shared = (
+            select(model.created_at)
+            .group_by(model.created_at)
+            .having(func.count() > 1)
+            .subquery()
+        )
+        counts[model.__tablename__] = db.session.execute(
+            select(func.count(model.id)).where(
+                model.created_at.in_(select(shared.c.created_at))
+            )
+        ).scalar()
+
+    return counts
@@ -0,0 +1,79 @@
+import threading
+import time
+from datetime import datetime
+
+from src.app.db.model import RevokedTokenModel
+
+
+class TokenBlocklist:
+    """Per-worker cache of revoked JWT ids
+
+    Instead of querying the revoked_token table for every authenticated
+    request, each worker keeps the unexpired revoked ids in memory. It polls
+    the table at most once per refresh interval for rows above the highest
+    id it has seen. Revocations made by this worker are added straight away,
+    and revocations made by other workers show up within one interval.
+    """
+
+    # ids below the high-water mark that are re-read on every poll, so rows
+    # committed out of id order by concurrent transactions are not missed
+    HIGH_WATER_MARK_OVERLAP = 100
+
+    def __init__(self, refresh_interval=1.0) -> None:
+        self._refresh_interval = refresh_interval
+        self._revoked = {}
+        self._high_water_mark = 0
+        self._last_refresh = None
+        self._lock = threading.Lock()
+
+    def set_refresh_interval(self, refresh_interval):
+        self._refresh_interval = refresh_interval
+
+    def is_revoked(self, jti):
+        """Checks if a token id has been revoked"""
+        self._refresh_if_due()
+        return jti in self._revoked
+
+    def add(self, jti, expires_at=None):
+        """Records a revocation made by this worker"""
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+            self._high_water_mark = 0
+            self._last_refresh = None
+
+    def _refresh_if_due(self):
+        last_refresh = self._last_refresh
+        if (
+            last_refresh is not None
+            and time.monotonic() - last_refresh < self._refresh_interval
+        ):
+            return
+
+        with self._lock:
+            if self._last_refresh is not last_refresh:
+                # another thread refreshed while this one waited for the lock
+                return
+
+            now = datetime.utcnow()
+            rows = RevokedTokenModel.get_revoked_since(
+                self._high_water_mark - self.HIGH_WATER_MARK_OVERLAP, now
+            )
+
+            for row_id, jti, expires_at in rows:
+                self._revoked[jti] = expires_at
+                self._high_water_mark = max(self._high_water_mark, row_id)
+
+            # expired tokens are rejected by signature validation anyway
+            self._revoked = {
+                jti: expires_at
+                for jti, expires_at in self._revoked.items()
+                if expires_at is None or expires_at > now
+            }
+            self._last_refresh = time.monotonic()
+
+
+token_blocklist = TokenBlocklist()
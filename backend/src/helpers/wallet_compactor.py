@@ -0,0 +1,33 @@
+import threading
+
+from src.extensions import db
+from src.utils import logger
+from src.app.db.model import WalletModel
+
+
+class WalletCompactor(threading.Thread):
+    """Background thread that folds pending hot wallet credits into balances
+
+    Every worker runs its own compactor. Compaction locks the wallet row, so
+    compactors in different workers cannot fold the same deltas twice.
+    """
+
+    def __init__(self, app, interval) -> None:
+        super().__init__(name="wallet-compactor", daemon=True)
+        self._app = app
+        self._interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self._interval):
+            with self._app.app_context():
+                try:
+                    WalletModel.compact_hot_wallets()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error("Failure in compacting hot wallets: %s", e)
+                finally:
+                    db.session.remove()
+
+    def stop(self):
+        self._stopped.set()
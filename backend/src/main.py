@@ -1,21 +1,36 @@
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
+import click
 from flask import Flask, Blueprint
 
 # from flask_cors import CORS
 from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 import src.app.db.model as models
 from src.extensions import db, jwt
 from src.app.api import api
 from src.app.api.healthz import ns_healthz
+from src.app.api.metrics import ns_metrics
 from src.app.api.user import ns_user
 from src.app.api.auth import ns_auth
 from src.app.api.role import ns_role
 from src.app.api.transactions import ns_transaction
 from src.config import config, Config
-from src.helpers.currency_converter import CurrencyConverter
+from src.helpers.currency_converter import CurrencyConverter, rate_provider
+from src.helpers.wallet_compactor import WalletCompactor
+from src.helpers.rate_table import RateSnapshotRefresher, rate_table
+from src.helpers.idempotency import response_cache
+from src.helpers.token_blocklist import token_blocklist
+from src.helpers.reference_cache import reference_cache
+from src.helpers import seeder, timestamp_backfill
+from src.helpers.password_hasher import password_hasher
+from src.helpers.rate_limiter import login_rate_limiter
+from src.helpers.db_pool import engine_options
+from src.helpers import metrics, profiler
+from src.helpers.health import LivenessMiddleware, readiness_check
+from src.utils import logger
 
 
 def create_app(config_name="default"):
@@ -24,93 +39,252 @@ def create_app(config_name="default"):
     # load configurations object
     app.config.from_object(config[config_name])
 
+    # take the client IP from the X-Forwarded-For header set by nginx
+    if app.config["TRUSTED_PROXY_COUNT"]:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXY_COUNT"])
+
+    # answer liveness probes without dispatching them through flask
+    app.wsgi_app = LivenessMiddleware(app.wsgi_app)
+
     # database initialization
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config))
     db.init_app(app)
     migrate = Migrate(app, db)
 
     # initialize jwt
     jwt.init_app(app)
 
-    # logging with gunicorn
+    # queue the records of the app, gunicorn and this service for one writer
+    logger.configure(
+        level=app.config["LOG_LEVEL"],
+        json_format=app.config["LOG_FORMAT"] == "json",
+        sample_rate=app.config["LOG_INFO_SAMPLE_RATE"],
+    )
+    logger.attach(app.logger)
     if __name__ != "__main__":
         gunicorn_logger = logging.getLogger("gunicorn.error")
-        app.logger.handlers = gunicorn_logger.handlers
+        logger.attach(gunicorn_logger)
         app.logger.setLevel(gunicorn_logger.level)
 
     # register blueprints
     api_blueprint_v1 = Blueprint("api", __name__, url_prefix="/api/v1")
     api.init_app(api_blueprint_v1)
     api.add_namespace(ns_healthz)
+    api.add_namespace(ns_metrics)
     api.add_namespace(ns_user)
     api.add_namespace(ns_role)
     api.add_namespace(ns_auth)
     api.add_namespace(ns_transaction)
 
     app.register_blueprint(api_blueprint_v1)
+    logger.init_app(app)
+    metrics.init_app(app)
+    profiler.init_app(app)
+
+    response_cache.set_maxsize(app.config["IDEMPOTENCY_CACHE_SIZE"])
+    token_blocklist.set_refresh_interval(app.config["JWT_BLOCKLIST_REFRESH_INTERVAL"])
+    reference_cache.set_check_interval(app.config["REFERENCE_DATA_CHECK_INTERVAL"])
+    rate_provider.configure(
+        url=app.config["FIXER_BASE_URL"],
+        api_key=app.config["FIXER_API_KEY"],
+        ttl=app.config["FX_RATE_TTL"],
+        max_stale=app.config["FX_RATE_MAX_STALE"],
+        timeout=app.config["FIXER_TIMEOUT"],
+    )
+    models.UserModel.set_hash_rounds(app.config["PASSWORD_HASH_ROUNDS"])
+    password_hasher.configure(pool_size=app.config["PASSWORD_HASH_POOL_SIZE"])
+    readiness_check.configure(
+        cache_ttl=app.config["HEALTH_READINESS_CACHE_MS"] / 1000,
+        pool_saturation=app.config["HEALTH_POOL_SATURATION"],
+        fx_max_age=app.config["FX_RATE_MAX_STALE"],
+    )
+    login_rate_limiter.configure(
+        account_limit=app.config["LOGIN_RATE_LIMIT_PER_ACCOUNT"],
+        ip_limit=app.config["LOGIN_RATE_LIMIT_PER_IP"],
+        window=app.config["LOGIN_RATE_LIMIT_WINDOW"],
+        backend=app.config["LOGIN_RATE_LIMIT_BACKEND"],
+    )
+    rate_table.configure(
+        base_currency=app.config["FX_SNAPSHOT_BASE_CURRENCY"],
+        check_interval=app.config["FX_SNAPSHOT_CHECK_INTERVAL"],
+    )
+
+    # warm the roles and currency cache of this worker
+    with app.app_context():
+        try:
+            reference_cache.load()
+        except Exception as e:
+            logger.warning("Reference data cache will be loaded lazily: %s", e)
+        finally:
+            db.session.remove()
+
+    # start the background threads in the serving process only, flask cli
+    # commands create the app too but never handle a request
+    @app.before_first_request
+    def start_background_threads():
+        # fold pending hot wallet credits into wallet balances
+        if app.config["HOT_WALLET_COMPACTION_INTERVAL"]:
+            WalletCompactor(app, app.config["HOT_WALLET_COMPACTION_INTERVAL"]).start()
+
+        # keep the exchange rates used by cross-currency transfers fresh
+        if app.config["FX_SNAPSHOT_REFRESH_INTERVAL"]:
+            RateSnapshotRefresher(
+                app,
+                app.config["FX_SNAPSHOT_REFRESH_INTERVAL"],
+                retention=app.config["FX_SNAPSHOT_RETENTION_DAYS"] * 86400,
+            ).start()
 
     # seed database with roles
     @app.cli.command("db_seed_roles")
     def seed_roles_table():
-        if models.RolesModel.check_for_roles():
-            print("Role table has seeded data. No need to seed!")
-        else:
-            roles = [
-                {"role_name": models.RolesModel(name="Super Admin")},
-                {"role_name": models.RolesModel(name="Admin")},
-                {"role_name": models.RolesModel(name="General")},
-            ]
-            for role in roles:
-                db.session.add(role.get("role_name"))
-            db.session.commit()
-            print("Role table has been seeded")
+        try:
+            added = seeder.seed_roles()
+            print(f"Role table has been seeded with {added} new roles")
+        except Exception as e:
+            print(f"Failure in seeding roles table: {str(e)}")
 
     # seed database with super admin user
     @app.cli.command("db_seed_default_user")
     def seed_with_admin():
         try:
-            super_admin = models.UserModel(
-                name="Super Admin",
-                password=models.UserModel.generate_hash(Config.DEFAULT_USER_PASSWORD),
-                role_id=1,
-                telephone="",
-                is_disabled=False,
-                last_login_date=datetime.utcnow(),
-                profile_photo="",
-                email="superadmin@wallet.co",
-            )
-            db.session.add(super_admin)
-            db.session.commit()
-            print("Users table has been seeded successfully with default user")
+            if seeder.seed_default_user(Config.DEFAULT_USER_PASSWORD):
+                print("Users table has been seeded successfully with default user")
+            else:
+                print("Default user exists. No need to seed!")
         except Exception as e:
             print(f"Failure in seeding users table with default user: {str(e)}")
 
     @app.cli.command("db_seed_currency")
-    def seed_currency_table():
+    @click.option(
+        "--offline",
+        is_flag=True,
+        help="Load currencies from a local snapshot instead of the Fixer API",
+    )
+    @click.option(
+        "--snapshot",
+        default=seeder.CURRENCY_SYMBOLS_SNAPSHOT,
+        type=click.Path(exists=True, dir_okay=False),
+        help="Fixer symbols response file used with --offline",
+    )
+    def seed_currency_table(offline, snapshot):
+        try:
+            if offline:
+                currency_symbols = seeder.load_currency_symbols(snapshot)
+            else:
+                currency_object = CurrencyConverter(
+                    url=Config.FIXER_BASE_URL,
+                    api_key=Config.FIXER_API_KEY,
+                    timeout=Config.FIXER_TIMEOUT,
+                )
+                response = currency_object.fetch_currency_symbols()
+                currency_symbols = response["symbols"]
+
+            count = seeder.seed_currencies(currency_symbols)
+            print(f"Currency table has been seeded with {count} currencies")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failure in seeding currency table: {str(e)}")
+
+    @app.cli.command("db_compact_wallets")
+    def compact_wallets():
+        try:
+            compacted = models.WalletModel.compact_hot_wallets()
+            print(f"{compacted} hot wallets have been compacted")
+        except Exception as e:
+            print(f"Failure in compacting hot wallets: {str(e)}")
+
+    @app.cli.command("wallet_hot_mode")
+    @click.argument("user_id", type=int)
+    @click.option("--disable", is_flag=True, help="Turn hot wallet mode off")
+    def set_hot_wallet_mode(user_id, disable):
         try:
-            currency_object = CurrencyConverter(
-                url=Config.FIXER_BASE_URL, api_key=Config.FIXER_API_KEY
+            models.WalletModel.set_hot(user_id, is_hot=not disable)
+            state = "disabled" if disable else "enabled"
+            print(f"Hot wallet mode has been {state} for user {user_id}")
+        except Exception as e:
+            print(f"Failure in setting hot wallet mode: {str(e)}")
+
+    @app.cli.command("db_purge_idempotency_keys")
+    @click.option("--hours", default=24, help="Age in hours of keys to delete")
+    def purge_idempotency_keys(hours):
+        try:
+            created_before = datetime.utcnow() - timedelta(hours=hours)
+            deleted = models.IdempotencyKeyModel.purge_older_than(created_before)
+            print(f"{deleted} idempotency keys have been deleted")
+        except Exception as e:
+            print(f"Failure in purging idempotency keys: {str(e)}")
+
+    @app.cli.command("db_purge_revoked_tokens")
+    def purge_revoked_tokens():
+        try:
+            deleted = models.RevokedTokenModel.purge_expired()
+            print(f"{deleted} expired revoked tokens have been deleted")
+        except Exception as e:
+            print(f"Failure in purging revoked tokens: {str(e)}")
+
+    @app.cli.command("db_purge_login_attempts")
+    def purge_login_attempts():
+        try:
+            created_before = datetime.utcnow() - timedelta(
+                seconds=app.config["LOGIN_RATE_LIMIT_WINDOW"]
             )
-            response = currency_object.fetch_currency_symbols()
-            # print(response)
-            currency_symbols = response["symbols"]
+            deleted = models.LoginAttemptModel.purge_older_than(created_before)
+            print(f"{deleted} expired login attempts have been deleted")
+        except Exception as e:
+            print(f"Failure in purging login attempts: {str(e)}")
 
-            print(currency_symbols)
+    @app.cli.command("db_backfill_timestamps")
+    def backfill_timestamps():
+        try:
+            altered = timestamp_backfill.sync_server_defaults()
+            print(f"Database defaults have been set on {altered} timestamp columns")
+            indexes = timestamp_backfill.create_time_indexes()
+            print(f"Time range indexes are in place: {', '.join(indexes)}")
+            updated = timestamp_backfill.backfill_wallet_updated_at()
+            print(f"updated_at of {updated} wallets has been backfilled")
+            for table, count in timestamp_backfill.count_shared_created_at().items():
+                print(f"{count} rows of {table} keep an import time created_at")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failure in backfilling timestamps: {str(e)}")
 
-            for key, value in currency_symbols.items():
-                currency_item = models.CurrencyModel(
-                    currency_code=key, currency_name=value
-                )
-                db.session.add(currency_item)
-                db.session.commit()
-                print(f"Currency {key}, {value} has been saved successfully!")
+    @app.cli.command("db_snapshot_exchange_rates")
+    def snapshot_exchange_rates():
+        try:
+            snapshot = rate_table.take_snapshot()
+            print(
+                f"Exchange rate snapshot {snapshot.id} of {len(snapshot.rates)}"
+                f" {snapshot.base_currency} rates has been saved"
+            )
         except Exception as e:
-            print(f"Failure in seeding currency table: {str(e)}")
+            print(f"Failure in taking exchange rate snapshot: {str(e)}")
+
+    @app.cli.command("db_purge_exchange_rate_snapshots")
+    @click.option(
+        "--days",
+        default=Config.FX_SNAPSHOT_RETENTION_DAYS,
+        help="Age in days of snapshots to delete",
+    )
+    def purge_exchange_rate_snapshots(days):
+        try:
+            created_before = datetime.utcnow() - timedelta(days=days)
+            deleted = models.ExchangeRateSnapshotModel.purge_older_than(created_before)
+            print(f"{deleted} exchange rate snapshots have been deleted")
+        except Exception as e:
+            print(f"Failure in purging exchange rate snapshots: {str(e)}")
+
+    @app.cli.command("profile_token")
+    @click.option("--cprofile", is_flag=True, help="Also collect cProfile stats")
+    def print_profile_token(cprofile):
+        token = profiler.create_profile_token(with_cprofile=cprofile)
+        print(f"{profiler.PROFILE_HEADER}: {token}")
 
     # check if token is revoked
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
         jti = jwt_payload["jti"]
-        return models.RevokedTokenModel.is_token_blacklisted(token=jti)
+        with metrics.JWT_BLOCKLIST_LOOKUP.time():
+            return token_blocklist.is_revoked(jti)
 
     # CORS(app, resources={r"/api/*": {"origins": "*"}}, allow_headers="*")
     return app
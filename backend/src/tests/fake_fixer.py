@@ -0,0 +1,69 @@
+"""Local stand-in for the Fixer API used by the currency tests"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeFixerServer:
+    """Serves /latest and /symbols like the Fixer API on a local port
+
+    Use as a context manager. Every request is recorded in requests, and
+    delay makes responses slow enough to exercise concurrent callers.
+    """
+
+    def __init__(self, rates=None, symbols=None, delay=0) -> None:
+        self.rates = rates or {"EUR": {"USD": 1.2, "KES": 130.5, "EUR": 1}}
+        self.symbols = symbols or {"EUR": "Euro", "USD": "United States Dollar"}
+        self.delay = delay
+        self.requests = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                fake.requests.append((url.path, params))
+                time.sleep(fake.delay)
+
+                if url.path == "/latest" and params.get("base") in fake.rates:
+                    body = {
+                        "success": True,
+                        "base": params["base"],
+                        "rates": fake.rates[params["base"]],
+                    }
+                elif url.path == "/symbols":
+                    body = {"success": True, "symbols": fake.symbols}
+                else:
+                    body = {"success": False, "error": {"code": 201}}
+
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
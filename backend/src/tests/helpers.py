@@ -0,0 +1,37 @@
+"""Shared helpers for the test suite"""
+
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from src.main import create_app, db
+
+# the flask-restx Api in src.app.api is a module level object that stays bound
+# to the first application it is registered on, so tests share one instance
+app = create_app(config_name="testing")
+app.testing = True
+
+
+@contextmanager
+def assert_max_queries(test_case, max_queries):
+    """Fails test_case if the block runs more than max_queries SQL statements
+
+    Used to catch N+1 query regressions, the executed statements are listed
+    in the failure message.
+    """
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record_statement)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record_statement)
+
+    test_case.assertLessEqual(
+        len(statements),
+        max_queries,
+        f"{len(statements)} queries executed:\n" + "\n".join(statements),
+    )
@@ -0,0 +1,95 @@
+import threading
+import time
+import unittest
+from decimal import Decimal
+
+from src.helpers.currency_converter import (
+    CurrencyConversionError,
+    CurrencyConverter,
+    RateProvider,
+)
+from src.tests.fake_fixer import FakeFixerServer
+
+
+class RateProviderTest(unittest.TestCase):
+    def test_rates_are_cached_within_ttl(self):
+        with FakeFixerServer() as fixer:
+            provider = RateProvider(url=fixer.url, ttl=60)
+
+            provider.get_rates("EUR")
+            amount = provider.convert(10, "EUR", "USD")
+
+        self.assertEqual(amount, Decimal("12.0"))
+        self.assertEqual(len(fixer.requests), 1)
+
+    def test_concurrent_misses_share_one_call(self):
+        with FakeFixerServer(delay=0.2) as fixer:
+            provider = RateProvider(url=fixer.url, ttl=60)
+            threads = [
+                threading.Thread(target=provider.get_rates, args=("EUR",))
+                for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(fixer.requests), 1)
+
+    def test_stale_rates_are_served_while_refreshing(self):
+        with FakeFixerServer(delay=0.2) as fixer:
+            provider = RateProvider(url=fixer.url, ttl=0, max_stale=60)
+            provider.get_rates("EUR")
+            fixer.rates["EUR"]["USD"] = 1.5
+
+            started = time.monotonic()
+            stale_rates = provider.get_rates("EUR")
+            self.assertLess(time.monotonic() - started, 0.2)
+            self.assertEqual(stale_rates["USD"], 1.2)
+
+            time.sleep(0.5)
+            provider.configure(url=fixer.url, ttl=60, max_stale=60)
+            self.assertEqual(provider.get_rates("EUR")["USD"], 1.5)
+
+    def test_failed_fetch_raises_conversion_error(self):
+        with FakeFixerServer() as fixer:
+            provider = RateProvider(url=fixer.url)
+
+            with self.assertRaises(CurrencyConversionError):
+                provider.get_rates("XYZ")
+
+    def test_concurrent_callers_share_any_fetch_error(self):
+        provider = RateProvider(ttl=60)
+        errors = []
+
+        def fail(base_currency):
+            time.sleep(0.2)
+            raise KeyError("rates")
+
+        def get_rates():
+            try:
+                provider.get_rates("EUR")
+            except Exception as e:
+                errors.append(e)
+
+        provider._fetch = fail
+        threads = [threading.Thread(target=get_rates) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(all(isinstance(error, KeyError) for error in errors))
+
+    def test_converter_fetches_symbols(self):
+        with FakeFixerServer() as fixer:
+            converter = CurrencyConverter(url=fixer.url, api_key="key")
+            symbols = converter.fetch_currency_symbols()["symbols"]
+
+        self.assertIn("USD", symbols)
+        self.assertEqual(fixer.requests[0][1]["access_key"], "key")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool
+
+from src.tests.helpers import app
+from src.helpers.db_pool import (
+    InstrumentedQueuePool,
+    check_pool_capacity,
+    engine_options,
+    pool_stats,
+)
+
+
+class DatabasePoolTest(unittest.TestCase):
+    def setUp(self):
+        pool_stats.clear()
+        self.settings = {
+            "SQLALCHEMY_DATABASE_URI": "postgresql://wallet@localhost/wallet_db",
+            "DB_POOL_SIZE": 5,
+            "DB_MAX_OVERFLOW": 5,
+            "DB_POOL_TIMEOUT": 30,
+            "DB_POOL_RECYCLE": 1800,
+            "DB_POOL_PRE_PING": True,
+            "DB_MAX_CONNECTIONS": 100,
+            "DB_PGBOUNCER": False,
+        }
+
+    def test_checkout_waits_and_usage_are_recorded(self):
+        engine = create_engine(
+            "sqlite://",
+            poolclass=InstrumentedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.05,
+        )
+        connection = engine.connect()
+
+        with self.assertRaises(PoolTimeoutError):
+            engine.connect()
+
+        stats = pool_stats.snapshot(engine.pool)
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["checked_out"], 1)
+        self.assertGreaterEqual(stats["max_wait_ms"], 50)
+        connection.close()
+
+    def test_capacity_check_counts_every_worker(self):
+        check_pool_capacity(10, self.settings)
+
+        with self.assertRaises(RuntimeError):
+            check_pool_capacity(11, self.settings)
+
+        self.settings["DB_PGBOUNCER"] = True
+        check_pool_capacity(11, self.settings)
+        self.assertEqual(engine_options(self.settings), {"poolclass": NullPool})
+
+    def test_healthz_reports_pool(self):
+        response = app.test_client().get("api/v1/healthz/db-pool")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("checkouts", response.get_json())
+
+
+if __name__ == "__main__":
+    unittest.main()
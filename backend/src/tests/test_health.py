@@ -0,0 +1,56 @@
+import unittest
+
+from src.main import db
+from src.tests.helpers import app, assert_max_queries
+from src.helpers.health import ReadinessCheck, readiness_check
+
+
+class HealthTest(unittest.TestCase):
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.create_all()
+
+    def test_liveness_runs_no_queries(self):
+        with assert_max_queries(self, 0):
+            response = self.app.get("api/v1/healthz/live")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {"status": "ok"})
+
+    def test_readiness_result_is_cached(self):
+        readiness_check.configure(cache_ttl=60)
+        self.addCleanup(readiness_check.configure, cache_ttl=0.25)
+
+        response = self.app.get("api/v1/healthz/ready")
+        with assert_max_queries(self, 0):
+            cached_response = self.app.get("api/v1/healthz/ready")
+
+        body = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body["checks"]["database"]["ok"])
+        # no exchange rate snapshot was taken, which does not fail readiness
+        self.assertFalse(body["checks"]["fx_rates"]["ok"])
+        self.assertEqual(cached_response.get_json(), body)
+
+    def test_saturated_pool_skips_every_query(self):
+        check = ReadinessCheck()
+        check._check_pool = lambda pool_capacity: {"ok": False, "checked_out": 1}
+
+        with assert_max_queries(self, 0):
+            ready, checks = check.check(pool_capacity=1)
+
+        self.assertFalse(ready)
+        self.assertFalse(checks["database"]["ok"])
+        self.assertEqual(checks["fx_rates"], {"ok": False, "age_seconds": None})
+
+    def tearDown(self):
+        readiness_check.clear()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import json
+import logging
+
+from src.tests.helpers import app
+from src.utils import logger
+
+
+class LoggerTest(unittest.TestCase):
+    def record(self, level=logging.INFO):
+        return logging.LogRecord(
+            "test", level, __file__, 1, "credited %s", ("5.00",), None
+        )
+
+    def test_json_line_has_fields_and_request_id(self):
+        with app.test_request_context(headers={logger.REQUEST_ID_HEADER: "abc"}):
+            app.preprocess_request()
+            with self.assertLogs(logger.logger, "INFO") as logs:
+                logger.info("credited %s", "5.00", user_id=7)
+
+            record = logs.records[0]
+            logger.ContextFilter().filter(record)
+
+        line = json.loads(logger.JsonFormatter().format(record))
+
+        self.assertEqual(line["message"], "credited 5.00")
+        self.assertEqual(line["user_id"], 7)
+        self.assertEqual(line["request_id"], "abc")
+
+    def test_info_records_are_sampled(self):
+        context_filter = logger.ContextFilter(sample_rate=0.0)
+
+        self.assertFalse(context_filter.filter(self.record()))
+        self.assertTrue(context_filter.filter(self.record(level=logging.WARNING)))
+
+    def test_response_carries_request_id(self):
+        response = app.test_client().get("api/v1/healthz/status")
+
+        self.assertTrue(response.headers[logger.REQUEST_ID_HEADER])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import json
+
+from flask_jwt_extended import create_access_token
+
+from src.main import db
+from src.tests.helpers import app
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.create_all()
+
+        token = create_access_token(identity="fake@example.com")
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+
+    def test_metrics_include_requests_and_wallet_outcomes(self):
+        self.app.delete(
+            "api/v1/transaction/wallet?user_id=999",
+            data=json.dumps({"amount": 5}),
+            headers=self.headers,
+        )
+
+        response = self.app.get("api/v1/metrics")
+        body = response.get_data(as_text=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'wallet_operations_total{operation="debit",outcome="wallet_not_found"}',
+            body,
+        )
+        self.assertIn(
+            'wallet_http_request_duration_seconds_count{endpoint="api.transaction_wallet"'
+            ',method="DELETE",status="404"}',
+            body,
+        )
+        self.assertIn("wallet_db_queries_per_request_count", body)
+        self.assertIn("wallet_jwt_blocklist_lookup_seconds_count", body)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+
+if __name__ == "__main__":
+    unittest.main()
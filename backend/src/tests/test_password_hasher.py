@@ -0,0 +1,57 @@
+import unittest
+import json
+
+from passlib.hash import pbkdf2_sha256
+
+from src.main import db
+from src.tests.helpers import app
+from src.helpers.password_hasher import password_hasher
+from src.app.db.model import RolesModel, UserModel
+
+
+class PasswordHasherTest(unittest.TestCase):
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.create_all()
+
+        db.session.add(RolesModel(name="General"))
+        db.session.commit()
+
+    def test_hash_is_verified_on_the_pool(self):
+        password_hash = password_hasher.hash("secret")
+
+        self.assertTrue(password_hasher.verify("secret", password_hash))
+        self.assertFalse(password_hasher.verify("wrong", password_hash))
+        self.assertFalse(UserModel.needs_rehash(password_hash))
+
+    def test_login_upgrades_hash_made_with_other_rounds(self):
+        old_hash = pbkdf2_sha256.using(rounds=2000).hash("secret")
+        UserModel(
+            name="test user",
+            email="fake@example.com",
+            password=old_hash,
+            role_id=1,
+        ).save_to_db()
+
+        response = self.app.post(
+            "api/v1/auth/login",
+            data=json.dumps({"email": "fake@example.com", "password": "secret"}),
+            headers={"Content-Type": "application/json"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        user = UserModel.find_by_username("fake@example.com")
+        self.assertNotEqual(user.password, old_hash)
+        self.assertFalse(UserModel.needs_rehash(user.password))
+        self.assertTrue(UserModel.verify_hash("secret", user.password))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+from flask import g
+from flask_jwt_extended import create_access_token
+
+from src.main import db
+from src.tests.helpers import app
+from src.helpers.profiler import PROFILE_HEADER, RequestProfile, create_profile_token
+from src.utils.logger import logger
+from src.app.db.model import RolesModel
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.create_all()
+
+        token = create_access_token(identity="fake@example.com")
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def profile_records(self, logs):
+        return [record.fields for record in logs.records]
+
+    def test_profile_token_logs_request_with_cprofile_stats(self):
+        headers = dict(self.headers)
+        headers[PROFILE_HEADER] = create_profile_token(with_cprofile=True)
+
+        with self.assertLogs(logger, "WARNING") as logs:
+            self.app.get("api/v1/role/all", headers=headers)
+
+        record = self.profile_records(logs)[0]
+        self.assertEqual(record["endpoint"], "api.role_users")
+        self.assertGreater(record["query_count"], 0)
+        self.assertIn("cumulative", record["profile"])
+
+    def test_n_plus_one_statement_is_flagged(self):
+        for index in range(4):
+            db.session.add(RolesModel(name=f"role {index}"))
+        db.session.commit()
+
+        with app.test_request_context("/api/v1/role/all"):
+            g.request_profile = RequestProfile(forced=False, with_cprofile=False)
+            # one lazy load of the users of each role
+            for role in RolesModel.query.all():
+                role.users
+            record = g.request_profile.finish(app.response_class())
+
+        self.assertEqual(len(record["repeated_queries"]), 1)
+        repeated = record["repeated_queries"][0]
+        self.assertEqual(repeated["count"], 4)
+        self.assertIn("FROM users", repeated["statement"])
+        self.assertNotIn("profile", record)
+
+    def test_one_request_at_a_time_collects_cprofile_stats(self):
+        with app.test_request_context("/api/v1/role/all"):
+            first = RequestProfile(forced=True, with_cprofile=True)
+            second = RequestProfile(forced=True, with_cprofile=True)
+            first_record = first.finish(app.response_class())
+            second_record = second.finish(app.response_class())
+            third = RequestProfile(forced=True, with_cprofile=True)
+            third.stop_cprofile()
+
+        self.assertIn("profile", first_record)
+        self.assertTrue(second_record["cprofile_skipped"])
+        self.assertNotIn("profile", second_record)
+        self.assertIsNotNone(third.cprofile)
+
+    def test_request_with_forged_token_is_not_profiled(self):
+        headers = dict(self.headers)
+        headers[PROFILE_HEADER] = "forged"
+
+        with self.assertRaises(AssertionError):
+            with self.assertLogs(logger, "WARNING"):
+                self.app.get("api/v1/role/all", headers=headers)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+
+if __name__ == "__main__":
+    unittest.main()
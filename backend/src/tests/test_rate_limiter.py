@@ -0,0 +1,99 @@
+import unittest
+import json
+import time
+
+from src.main import db
+from src.tests.helpers import app, assert_max_queries
+from src.helpers.rate_limiter import (
+    LoginRateLimiter,
+    MemoryWindowStore,
+    login_rate_limiter,
+)
+from src.app.db.model import RolesModel, UserModel
+
+
+class LoginRateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.create_all()
+
+        db.session.add(RolesModel(name="General"))
+        db.session.commit()
+        UserModel(
+            name="test user",
+            email="fake@example.com",
+            password=UserModel.generate_hash("secret"),
+            role_id=1,
+        ).save_to_db()
+
+    def login(self, password):
+        return self.app.post(
+            "api/v1/auth/login",
+            data=json.dumps({"email": "fake@example.com", "password": password}),
+            headers={"Content-Type": "application/json"},
+        )
+
+    def test_account_is_limited_before_hashing(self):
+        for _ in range(app.config["LOGIN_RATE_LIMIT_PER_ACCOUNT"]):
+            self.assertEqual(self.login("wrong").status_code, 401)
+
+        # only the token blocklist poll runs, the user is not looked up
+        with assert_max_queries(self, 1):
+            response = self.login("secret")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response.headers["Retry-After"]), 0)
+
+    def test_successful_login_clears_account_failures(self):
+        for _ in range(app.config["LOGIN_RATE_LIMIT_PER_ACCOUNT"] - 1):
+            self.login("wrong")
+
+        self.assertEqual(self.login("secret").status_code, 200)
+        self.assertEqual(self.login("wrong").status_code, 401)
+
+    def test_database_backend_is_shared(self):
+        limiter = LoginRateLimiter(account_limit=2, backend="database")
+        other_worker = LoginRateLimiter(account_limit=2, backend="database")
+
+        limiter.record_failure("fake@example.com", "10.0.0.1")
+        limiter.record_failure("fake@example.com", "10.0.0.1")
+
+        self.assertGreater(other_worker.retry_after("fake@example.com", "10.0.0.1"), 0)
+        other_worker.record_success("fake@example.com", "10.0.0.1")
+        self.assertEqual(limiter.retry_after("fake@example.com", "10.0.0.1"), 0)
+
+    def test_failures_from_another_ip_do_not_lock_the_account(self):
+        limiter = LoginRateLimiter(account_limit=2, ip_limit=0)
+
+        limiter.record_failure("fake@example.com", "10.0.0.1")
+        limiter.record_failure("fake@example.com", "10.0.0.1")
+
+        self.assertGreater(limiter.retry_after("fake@example.com", "10.0.0.1"), 0)
+        self.assertEqual(limiter.retry_after("fake@example.com", "10.0.0.2"), 0)
+
+    def test_memory_store_drops_expired_keys_and_caps_keys(self):
+        store = MemoryWindowStore()
+        store.MAX_KEYS = 3
+
+        store.add("expired", window=0.01)
+        time.sleep(0.02)
+        store.add("a", window=0.01)
+        self.assertNotIn("expired", store._attempts)
+
+        for key in ("b", "c", "d"):
+            store.add(key, window=60)
+
+        self.assertEqual(list(store._attempts), ["b", "c", "d"])
+        self.assertEqual(store.get_window("a", 60), (0, 0))
+
+    def tearDown(self):
+        login_rate_limiter.clear()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+
+if __name__ == "__main__":
+    unittest.main()
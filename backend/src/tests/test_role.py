@@ -0,0 +1,61 @@
+import unittest
+import json
+
+from flask_jwt_extended import create_access_token
+
+from src.main import db
+from src.tests.helpers import app, assert_max_queries
+from src.app.db.model import RolesModel
+from src.helpers.reference_cache import reference_cache
+
+
+class RoleTest(unittest.TestCase):
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.create_all()
+
+        db.session.add(RolesModel(name="Admin"))
+        db.session.commit()
+        reference_cache.load()
+
+        token = create_access_token(identity="fake@example.com")
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+
+    def test_get_role_is_served_from_cache(self):
+        hits = reference_cache.hits
+
+        # blocklist poll and reference data version check
+        with assert_max_queries(self, 2):
+            response = self.app.get("api/v1/role?role_id=1", headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["role_name"], "Admin")
+        self.assertEqual(reference_cache.hits, hits + 1)
+
+    def test_role_update_invalidates_cache(self):
+        self.app.put(
+            "api/v1/role?role_id=1",
+            data=json.dumps({"role_name": "Super Admin"}),
+            headers=self.headers,
+        )
+
+        self.assertEqual(reference_cache.role(1).name, "Super Admin")
+        self.assertIsNone(reference_cache.role_by_name("Admin"))
+
+    def test_role_created_elsewhere_is_found(self):
+        RolesModel(name="General").save_to_db()
+        self.assertEqual(reference_cache.role_by_name("General").id, 2)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from src.main import db
+from src.tests.helpers import app, assert_max_queries
+from src.helpers import seeder
+from src.app.db.model import CurrencyModel, RolesModel, UserModel
+
+
+class SeederTest(unittest.TestCase):
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def test_currency_seeding_is_one_statement_and_rerunnable(self):
+        currency_symbols = seeder.load_currency_symbols()
+
+        # upsert, commit and the reference data version bump
+        with assert_max_queries(self, 5):
+            seeder.seed_currencies(currency_symbols)
+
+        seeder.seed_currencies({"USD": "US Dollar"})
+
+        self.assertEqual(CurrencyModel.query.count(), len(currency_symbols))
+        dollar = CurrencyModel.query.filter_by(currency_code="USD").first()
+        self.assertEqual(dollar.currency_name, "US Dollar")
+
+    def test_roles_and_default_user_seeding_is_rerunnable(self):
+        seeder.seed_roles()
+        self.assertTrue(seeder.seed_default_user("secret"))
+
+        self.assertEqual(seeder.seed_roles(), 0)
+        self.assertFalse(seeder.seed_default_user("changed"))
+
+        self.assertEqual(RolesModel.query.count(), len(seeder.DEFAULT_ROLES))
+        user = UserModel.find_by_username(seeder.DEFAULT_USER_EMAIL)
+        self.assertTrue(UserModel.verify_hash("secret", user.password))
+
+    def test_merge_rows_upserts_without_on_conflict(self):
+        seeder.seed_currencies({"USD": "Dollar"})
+
+        count = CurrencyModel._merge_rows(
+            [
+                {"currency_code": "USD", "currency_name": "US Dollar"},
+                {"currency_code": "EUR", "currency_name": "Euro"},
+            ],
+            ["currency_code"],
+            ["currency_name"],
+        )
+        db.session.commit()
+
+        self.assertEqual(count, 2)
+        self.assertEqual(
+            sorted(
+                (currency.currency_code, currency.currency_name)
+                for currency in CurrencyModel.query.all()
+            ),
+            [("EUR", "Euro"), ("USD", "US Dollar")],
+        )
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from flask_restx import marshal
+
+from src.main import db
+from src.tests.helpers import app
+from src.helpers import serialization
+from src.app.schema.serializer import user, wallet, transaction
+
+
+class SerializationTest(unittest.TestCase):
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_compiled_models_match_marshal(self):
+        cases = [
+            (
+                user,
+                {
+                    "user_id": "7",
+                    "name": "test user",
+                    "email": "fake@example.com",
+                    "role": "General",
+                    "telephone": None,
+                    "last_login_date": datetime(2021, 5, 1, 12, 30),
+                    "is_disabled": False,
+                },
+            ),
+            (wallet, {"amount": Decimal("12.345"), "currency": "USD"}),
+            (
+                transaction,
+                {
+                    "transaction_id": 1,
+                    "reference": "ref",
+                    "amount": Decimal("10"),
+                    "balance_after": Decimal("90.5"),
+                    "exchange_rate": Decimal("1.18500000"),
+                    "created_at": datetime(2021, 5, 1, 12, 30),
+                },
+            ),
+        ]
+
+        for model, data in cases:
+            compiled = serialization.compile_model(model)
+            self.assertEqual(compiled.serialize(data), marshal(data, model))
+            self.assertEqual(
+                compiled.serialize_list([data, data]), marshal([data, data], model)
+            )
+
+    def test_dumps_encodes_decimal_and_datetime(self):
+        dumped = serialization.dumps(
+            {"amount": Decimal("0.10"), "at": datetime(2021, 5, 1, 12, 30)}
+        )
+        self.assertEqual(
+            json.loads(dumped), {"amount": "0.10", "at": "2021-05-01T12:30:00"}
+        )
+
+    def test_swagger_document_renders(self):
+        response = self.app.get("api/v1/swagger.json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("UserSchema", response.get_json()["definitions"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from src.main import db
+from src.tests.helpers import app
+from src.helpers import timestamp_backfill
+from src.app.db.model import (
+    CurrencyModel,
+    RolesModel,
+    UserModel,
+    WalletModel,
+    TransactionsModel,
+)
+
+
+class TimestampBackfillTest(unittest.TestCase):
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        db.session.add(CurrencyModel(currency_code="USD", currency_name="Dollar"))
+        db.session.add(RolesModel(name="General"))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_user(self, index, created_at=None):
+        user = UserModel(
+            name=f"user {index}",
+            email=f"user{index}@example.com",
+            password="not-a-hash",
+            role_id=1,
+            created_at=created_at,
+        )
+        user.save_to_db()
+        return user
+
+    def test_rows_get_their_own_creation_time(self):
+        first = self.add_user(1)
+        second = self.add_user(2)
+        self.assertLess(first.created_at, second.created_at)
+
+        # rows inserted outside of the ORM get the database default
+        db.session.execute(text("INSERT INTO roles (name) VALUES ('Admin')"))
+        role = RolesModel.query.filter_by(name="Admin").first()
+        self.assertIsNotNone(role.created_at)
+        self.assertIsNotNone(role.updated_at)
+
+    def test_backfill_wallet_updated_at_from_ledger(self):
+        import_time = datetime.utcnow() - timedelta(days=30)
+        user = self.add_user(1, created_at=import_time)
+        self.add_user(2, created_at=import_time)
+        wallet = WalletModel(
+            amount=Decimal("0.00"),
+            currency_id=1,
+            user_id=user.id,
+            created_at=import_time,
+            updated_at=import_time,
+        )
+        wallet.save_to_db()
+
+        entry_time = datetime.utcnow() - timedelta(days=1)
+        entry = TransactionsModel.append_entry(
+            transaction_type=TransactionsModel.CREDIT,
+            entry_type=TransactionsModel.CREDIT,
+            amount=Decimal("5.00"),
+            wallet=wallet,
+        )
+        entry.created_at = entry_time
+        db.session.commit()
+
+        self.assertEqual(timestamp_backfill.backfill_wallet_updated_at(), 1)
+        db.session.refresh(wallet)
+        self.assertEqual(wallet.updated_at, entry_time)
+        self.assertEqual(
+            timestamp_backfill.count_shared_created_at(), {"users": 2, "wallet": 0}
+        )
+
+    def test_time_indexes_are_created_once(self):
+        self.assertEqual(
+            timestamp_backfill.create_time_indexes(),
+            ["ix_transactions_created_at_brin"],
+        )
+        self.assertEqual(
+            timestamp_backfill.create_time_indexes(),
+            ["ix_transactions_created_at_brin"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from src.main import db
+from src.tests.helpers import app
+from src.app.db.model import RevokedTokenModel
+from src.helpers.token_blocklist import token_blocklist
+
+
+class TokenBlocklistTest(unittest.TestCase):
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.create_all()
+        token_blocklist.clear()
+
+    def test_logout_revokes_access_token(self):
+        token = create_access_token(identity="fake@example.com")
+        headers = {"Authorization": f"Bearer {token}"}
+
+        logout_response = self.app.delete("api/v1/auth/logout", headers=headers)
+        self.assertEqual(logout_response.status_code, 200)
+
+        second_logout_response = self.app.delete("api/v1/auth/logout", headers=headers)
+        self.assertEqual(second_logout_response.status_code, 401)
+
+    def test_revocations_by_other_workers_are_polled(self):
+        RevokedTokenModel.revoke("other-worker-jti")
+        self.assertTrue(token_blocklist.is_revoked("other-worker-jti"))
+        self.assertFalse(token_blocklist.is_revoked("unknown-jti"))
+
+    def test_expired_revocations_are_evicted_and_purged(self):
+        RevokedTokenModel.revoke(
+            "expired-jti", expires_at=datetime.utcnow() - timedelta(minutes=1)
+        )
+        self.assertFalse(token_blocklist.is_revoked("expired-jti"))
+        self.assertEqual(RevokedTokenModel.purge_expired(), 1)
+
+    def test_revoking_twice_is_not_an_error(self):
+        RevokedTokenModel.revoke("twice-jti")
+        RevokedTokenModel.revoke("twice-jti")
+        self.assertEqual(RevokedTokenModel.query.count(), 1)
+
+    def tearDown(self):
+        token_blocklist.clear()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+
+if __name__ == "__main__":
+    unittest.main()
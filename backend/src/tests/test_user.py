@@ -0,0 +1,174 @@
+import csv
+import io
+import json
+import unittest
+
+from flask_jwt_extended import create_access_token
+
+from src.main import db
+from src.tests.helpers import app, assert_max_queries
+from src.app.db.model import RolesModel, UserModel
+
+
+class UserTest(unittest.TestCase):
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.create_all()
+
+        db.session.add(RolesModel(name="Admin"))
+        db.session.add(RolesModel(name="General"))
+        db.session.commit()
+
+        for index in range(5):
+            db.session.add(
+                UserModel(
+                    name=f"user {index}",
+                    email=f"user{index}@example.com",
+                    password="not-a-hash",
+                    role_id=index % 2 + 1,
+                )
+            )
+        db.session.commit()
+
+        token = create_access_token(identity="user0@example.com")
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def test_user_listing_loads_roles_without_extra_queries(self):
+        # blocklist poll, page count and the page of users joined with roles
+        with assert_max_queries(self, 3):
+            response = self.app.get("api/v1/users/all?limit=5", headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        roles = sorted(item["role"] for item in response.get_json())
+        self.assertEqual(roles, ["Admin", "Admin", "Admin", "General", "General"])
+
+    def test_user_details_load_role_in_one_query(self):
+        # blocklist poll and the user joined with its role
+        with assert_max_queries(self, 2):
+            response = self.app.get("api/v1/users?user_id=2", headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["role"], "General")
+
+    def test_user_details_answer_unchanged_poll_with_304(self):
+        response = self.app.get("api/v1/users?user_id=2", headers=self.headers)
+        etag = response.headers["ETag"]
+
+        # blocklist poll and the version query
+        with assert_max_queries(self, 2):
+            response = self.app.get(
+                "api/v1/users?user_id=2",
+                headers={**self.headers, "If-None-Match": etag},
+            )
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+
+        role = RolesModel.query.filter_by(name="General").first()
+        role.name = "Member"
+        role.save_to_db()
+
+        response = self.app.get(
+            "api/v1/users?user_id=2",
+            headers={**self.headers, "If-None-Match": etag},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.get_json()["role"], "Member")
+
+    def test_user_update_bumps_row_version_and_updated_at(self):
+        user = UserModel.find_by_user_id(2)
+        updated_at = user.updated_at
+        self.assertEqual(user.row_version, 1)
+
+        user.telephone = "0700000000"
+        user.save_to_db()
+
+        self.assertEqual(user.row_version, 2)
+        self.assertGreater(user.updated_at, updated_at)
+
+    def test_user_export_streams_csv_and_ndjson(self):
+        response = self.app.get("api/v1/users/export?format=csv", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, "text/csv")
+
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(
+            [row["email"] for row in rows],
+            [f"user{index}@example.com" for index in range(5)],
+        )
+        self.assertNotIn("password", rows[0])
+
+        response = self.app.get("api/v1/users/export?user_id=2", headers=self.headers)
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["role"], "General")
+
+    def test_user_export_escapes_csv_formulas(self):
+        user = UserModel.find_by_user_id(1)
+        user.name = '=HYPERLINK("http://example.com")'
+        user.profile_photo = "@SUM(A1)"
+        user.telephone = "\t=1+1"
+        user.email = "\r=1+1@example.com"
+        db.session.commit()
+
+        response = self.app.get("api/v1/users/export?format=csv", headers=self.headers)
+        row = next(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(row["name"], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(row["profile_photo"], "'@SUM(A1)")
+        self.assertEqual(row["telephone"], "'\t=1+1")
+        self.assertEqual(row["email"], "'\r=1+1@example.com")
+
+        response = self.app.get("api/v1/users/export?user_id=1", headers=self.headers)
+        self.assertEqual(json.loads(response.get_data())["name"], user.name)
+
+    def test_user_export_rejects_unknown_format(self):
+        response = self.app.get("api/v1/users/export?format=xml", headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_user_listing_walks_pages_with_cursor(self):
+        response = self.app.get(
+            "api/v1/users/all?limit=3&include_total=true", headers=self.headers
+        )
+        self.assertEqual(response.headers["X-Total-Count"], "5")
+        cursor = response.headers["X-Next-Cursor"]
+        first_ids = [item["user_id"] for item in response.get_json()]
+
+        response = self.app.get(
+            f"api/v1/users/all?limit=3&cursor={cursor}", headers=self.headers
+        )
+        second_ids = [item["user_id"] for item in response.get_json()]
+
+        self.assertEqual(first_ids + second_ids, [5, 4, 3, 2, 1])
+        self.assertNotIn("X-Next-Cursor", response.headers)
+        self.assertNotIn("X-Total-Count", response.headers)
+
+    def test_user_listing_rejects_tampered_cursor(self):
+        response = self.app.get("api/v1/users/all?limit=3", headers=self.headers)
+        cursor = response.headers["X-Next-Cursor"]
+
+        response = self.app.get(
+            f"api/v1/users/all?cursor={cursor[:-2]}xx", headers=self.headers
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_user_listing_rejects_non_positive_limit_and_page(self):
+        for query in ("limit=-1", "limit=-2", "limit=0", "page=-1"):
+            response = self.app.get(f"api/v1/users/all?{query}", headers=self.headers)
+            self.assertEqual(response.status_code, 400, query)
+
+        rows, has_more = UserModel.keyset_page(UserModel.query, limit=-1)
+        self.assertEqual(len(rows), 1)
+        self.assertTrue(has_more)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+
+if __name__ == "__main__":
+    unittest.main()
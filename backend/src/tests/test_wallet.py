@@ -0,0 +1,505 @@
+import unittest
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask_jwt_extended import create_access_token
+
+from src.main import db
+from src.tests.helpers import app, assert_max_queries
+from src.helpers.idempotency import response_cache
+from src.helpers.rate_table import rate_table
+from src.helpers.reference_cache import reference_cache
+from src.app.db.model import (
+    CurrencyModel,
+    RolesModel,
+    UserModel,
+    WalletModel,
+    TransactionsModel,
+    WalletDeltaModel,
+    ExchangeRateSnapshotModel,
+    WalletNotFoundError,
+    InsufficientFundsError,
+    ExchangeRateError,
+)
+
+
+class WalletTest(unittest.TestCase):
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.create_all()
+
+        db.session.add(CurrencyModel(currency_code="USD", currency_name="Dollar"))
+        db.session.add(RolesModel(name="General"))
+        db.session.commit()
+
+        self.user = UserModel(
+            name="test user",
+            email="fake@example.com",
+            password="not-a-hash",
+            role_id=1,
+        )
+        self.user.save_to_db()
+        WalletModel(
+            amount=Decimal("100.00"), currency_id=1, user_id=self.user.id
+        ).save_to_db()
+
+        self.other_user = UserModel(
+            name="other user",
+            email="other@example.com",
+            password="not-a-hash",
+            role_id=1,
+        )
+        self.other_user.save_to_db()
+        WalletModel(
+            amount=Decimal("0.00"), currency_id=1, user_id=self.other_user.id
+        ).save_to_db()
+
+        token = create_access_token(identity=self.user.email)
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+
+    def test_credit_returns_new_balance(self):
+        balance = WalletModel.credit(user_id=self.user.id, amount="25.50")
+        self.assertEqual(balance, Decimal("125.50"))
+
+    def test_debit_returns_new_balance(self):
+        balance = WalletModel.debit(user_id=self.user.id, amount=40)
+        self.assertEqual(balance, Decimal("60.00"))
+
+    def test_debit_with_insufficient_funds(self):
+        with self.assertRaises(InsufficientFundsError):
+            WalletModel.debit(user_id=self.user.id, amount="100.01")
+
+        wallet, _ = WalletModel.find_by_user_id(user_id=self.user.id)
+        self.assertEqual(wallet.amount, Decimal("100.00"))
+
+    def test_credit_missing_wallet(self):
+        with self.assertRaises(WalletNotFoundError):
+            WalletModel.credit(user_id=999, amount=1)
+
+    def test_transfer_moves_funds(self):
+        source, target = WalletModel.transfer(
+            source_user_id=self.user.id,
+            target_user_id=self.other_user.id,
+            amount="30.25",
+        )
+        self.assertEqual(source.amount, Decimal("69.75"))
+        self.assertEqual(target.amount, Decimal("30.25"))
+
+    def test_transfer_with_insufficient_funds(self):
+        with self.assertRaises(InsufficientFundsError):
+            WalletModel.transfer(
+                source_user_id=self.other_user.id,
+                target_user_id=self.user.id,
+                amount=1,
+            )
+
+        wallet, _ = WalletModel.find_by_user_id(user_id=self.user.id)
+        self.assertEqual(wallet.amount, Decimal("100.00"))
+
+    def test_non_positive_amounts_are_rejected(self):
+        for amount in (0, "-5"):
+            with self.assertRaises(ValueError):
+                WalletModel.debit(user_id=self.user.id, amount=amount)
+            with self.assertRaises(ValueError):
+                WalletModel.credit(user_id=self.user.id, amount=amount)
+            with self.assertRaises(ValueError):
+                WalletModel.transfer(
+                    source_user_id=self.other_user.id,
+                    target_user_id=self.user.id,
+                    amount=amount,
+                )
+
+        response = self.app.delete(
+            f"api/v1/transaction/wallet?user_id={self.user.id}",
+            data=json.dumps({"amount": -5}),
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 400)
+
+        wallet, _ = WalletModel.find_by_user_id(user_id=self.user.id)
+        self.assertEqual(wallet.amount, Decimal("100.00"))
+
+    def test_credit_endpoint_loads_amount_as_decimal(self):
+        for _ in range(3):
+            response = self.app.put(
+                f"api/v1/transaction/wallet?user_id={self.user.id}",
+                data=json.dumps({"amount": 0.1}),
+                headers=self.headers,
+            )
+            self.assertEqual(response.status_code, 200)
+
+        wallet, _ = WalletModel.find_by_user_id(user_id=self.user.id)
+        self.assertEqual(wallet.available_balance(), Decimal("100.30"))
+
+    def test_credit_endpoint_rejects_invalid_arguments(self):
+        response = self.app.put(
+            "api/v1/transaction/wallet?user_id=abc",
+            data=json.dumps({"amount": 5}),
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("user_id", response.get_json()["message"])
+
+        response = self.app.put(
+            f"api/v1/transaction/wallet?user_id={self.user.id}",
+            data=json.dumps({"amount": "NaN"}),
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_wallet_etag_changes_with_balance(self):
+        url = f"api/v1/transaction/wallet?user_id={self.user.id}"
+        etag = self.app.get(url, headers=self.headers).headers["ETag"]
+        conditional_headers = {**self.headers, "If-None-Match": etag}
+
+        response = self.app.get(url, headers=conditional_headers)
+        self.assertEqual(response.status_code, 304)
+
+        WalletModel.credit(user_id=self.user.id, amount=5)
+        response = self.app.get(url, headers=conditional_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["amount"], "105.00")
+
+        WalletModel.set_hot(self.user.id)
+        etag = self.app.get(url, headers=self.headers).headers["ETag"]
+        WalletModel.credit(user_id=self.user.id, amount=5)
+        response = self.app.get(url, headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["amount"], "110.00")
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+        etag = response.headers["ETag"]
+        response = self.app.get(url, headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        wallet, _ = WalletModel.find_by_user_id(user_id=self.user.id)
+        with assert_max_queries(self, 1):
+            balance, version = wallet.balance_and_version()
+        self.assertEqual(balance, Decimal("110.00"))
+        self.assertEqual(version, WalletModel.get_version(self.user.id))
+
+    def test_transaction_export_filters_by_user_and_date(self):
+        WalletModel.credit(user_id=self.user.id, amount=5)
+        WalletModel.transfer(
+            source_user_id=self.user.id, target_user_id=self.other_user.id, amount=10
+        )
+
+        response = self.app.get(
+            f"api/v1/transaction/export?user_id={self.user.id}", headers=self.headers
+        )
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        rows = [json.loads(line) for line in response.get_data().splitlines()]
+        self.assertEqual(
+            [Decimal(row["amount"]) for row in rows], [Decimal(5), Decimal(10)]
+        )
+        self.assertEqual([row["entry_type"] for row in rows], ["credit", "debit"])
+
+        response = self.app.get(
+            "api/v1/transaction/export?format=csv&created_from=2999-01-01T00:00:00",
+            headers=self.headers,
+        )
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith("transaction_id,reference,user_id"))
+
+    def test_transfer_endpoint_missing_target_wallet(self):
+        response = self.app.put(
+            f"api/v1/transaction/transfer?current_user_id={self.user.id}"
+            "&target_user_id=999",
+            data=json.dumps({"amount": 5}),
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_transfer_appends_ledger_entries(self):
+        WalletModel.transfer(
+            source_user_id=self.user.id,
+            target_user_id=self.other_user.id,
+            amount=10,
+        )
+
+        debit_entry = TransactionsModel.get_user_transactions(self.user.id)[0][0]
+        credit_entry = TransactionsModel.get_user_transactions(self.other_user.id)[0][0]
+        self.assertEqual(debit_entry.reference, credit_entry.reference)
+        self.assertEqual(debit_entry.entry_type, TransactionsModel.DEBIT)
+        self.assertEqual(debit_entry.balance_after, Decimal("90.00"))
+        self.assertEqual(credit_entry.entry_type, TransactionsModel.CREDIT)
+        self.assertEqual(credit_entry.balance_after, Decimal("10.00"))
+
+    def test_failed_debit_does_not_append_ledger_entry(self):
+        with self.assertRaises(InsufficientFundsError):
+            WalletModel.debit(user_id=self.user.id, amount=1000)
+
+        self.assertEqual(TransactionsModel.count_user_transactions(self.user.id), 0)
+
+    def test_transactions_endpoint_pages_with_cursor(self):
+        for amount in (1, 2, 3):
+            WalletModel.credit(user_id=self.user.id, amount=amount)
+
+        first_page = self.app.get(
+            f"api/v1/transaction/record?user_id={self.user.id}&limit=2",
+            headers=self.headers,
+        )
+        cursor = first_page.headers["X-Next-Cursor"]
+        second_page = self.app.get(
+            f"api/v1/transaction/record?user_id={self.user.id}&limit=2&cursor={cursor}",
+            headers=self.headers,
+        )
+
+        first_amounts = [item["amount"] for item in first_page.get_json()]
+        second_amounts = [item["amount"] for item in second_page.get_json()]
+        self.assertEqual(first_amounts, ["3.00", "2.00"])
+        self.assertEqual(second_amounts, ["1.00"])
+        self.assertNotIn("X-Next-Cursor", second_page.headers)
+
+    def test_hot_wallet_credit_is_appended_as_delta(self):
+        WalletModel.set_hot(self.user.id)
+        WalletModel.credit(user_id=self.user.id, amount=5)
+
+        wallet, _ = WalletModel.find_by_user_id(user_id=self.user.id)
+        self.assertEqual(wallet.amount, Decimal("100.00"))
+        self.assertEqual(wallet.available_balance(), Decimal("105.00"))
+        self.assertEqual(WalletDeltaModel.query.count(), 1)
+
+    def test_hot_wallet_compaction(self):
+        WalletModel.set_hot(self.user.id)
+        WalletModel.credit(user_id=self.user.id, amount=5)
+        WalletModel.credit(user_id=self.user.id, amount=7)
+
+        self.assertEqual(WalletModel.compact_hot_wallets(), 1)
+
+        wallet, _ = WalletModel.find_by_user_id(user_id=self.user.id)
+        self.assertEqual(wallet.amount, Decimal("112.00"))
+        self.assertEqual(WalletDeltaModel.query.count(), 0)
+
+        entries = TransactionsModel.query.order_by(TransactionsModel.id).all()
+        self.assertEqual(
+            [entry.balance_after for entry in entries],
+            [Decimal("105.00"), Decimal("112.00")],
+        )
+
+    def test_hot_wallet_debit_counts_pending_credits(self):
+        WalletModel.set_hot(self.user.id)
+        WalletModel.credit(user_id=self.user.id, amount=50)
+
+        balance = WalletModel.debit(user_id=self.user.id, amount=120)
+        self.assertEqual(balance, Decimal("30.00"))
+
+        with self.assertRaises(InsufficientFundsError):
+            WalletModel.debit(user_id=self.user.id, amount=31)
+
+    def test_debit_endpoint_insufficient_funds(self):
+        response = self.app.delete(
+            f"api/v1/transaction/wallet?user_id={self.user.id}",
+            data=json.dumps({"amount": 500}),
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 406)
+
+    def test_credit_endpoint_missing_wallet(self):
+        response = self.app.put(
+            "api/v1/transaction/wallet?user_id=999",
+            data=json.dumps({"amount": 5}),
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_idempotent_credit_is_applied_once(self):
+        headers = dict(self.headers, **{"Idempotency-Key": "credit-1"})
+        url = f"api/v1/transaction/wallet?user_id={self.user.id}"
+
+        for _ in range(2):
+            response = self.app.put(
+                url, data=json.dumps({"amount": 5}), headers=headers
+            )
+            self.assertEqual(response.status_code, 200)
+
+        response_cache.clear()
+        response = self.app.put(url, data=json.dumps({"amount": 5}), headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+        wallet, _ = WalletModel.find_by_user_id(user_id=self.user.id)
+        self.assertEqual(wallet.amount, Decimal("105.00"))
+
+    def test_idempotency_key_reused_with_different_request(self):
+        headers = dict(self.headers, **{"Idempotency-Key": "credit-2"})
+        url = f"api/v1/transaction/wallet?user_id={self.user.id}"
+
+        self.app.put(url, data=json.dumps({"amount": 5}), headers=headers)
+        response = self.app.put(url, data=json.dumps({"amount": 6}), headers=headers)
+        self.assertEqual(response.status_code, 422)
+
+    def test_batch_transfer_reports_each_item(self):
+        transfers = [
+            {
+                "source_user_id": self.user.id,
+                "target_user_id": self.other_user.id,
+                "amount": 60,
+            },
+            {
+                "source_user_id": self.user.id,
+                "target_user_id": self.other_user.id,
+                "amount": 60,
+            },
+            {"source_user_id": self.user.id, "target_user_id": 999, "amount": 1},
+        ]
+        response = self.app.post(
+            "api/v1/transaction/transfers:batch",
+            data=json.dumps({"transfers": transfers}),
+            headers=self.headers,
+        )
+
+        statuses = [item["status"] for item in response.get_json()["results"]]
+        self.assertEqual(
+            statuses, ["transferred", "insufficient_funds", "wallet_not_found"]
+        )
+        wallet, _ = WalletModel.find_by_user_id(user_id=self.other_user.id)
+        self.assertEqual(wallet.amount, Decimal("60.00"))
+
+    def test_batch_transfer_streams_large_batches(self):
+        app.config["TRANSFER_BATCH_CHUNK_SIZE"] = 2
+        self.addCleanup(app.config.__setitem__, "TRANSFER_BATCH_CHUNK_SIZE", 500)
+        transfers = [
+            {
+                "source_user_id": self.user.id,
+                "target_user_id": self.other_user.id,
+                "amount": 1,
+            }
+        ] * 5
+        response = self.app.post(
+            "api/v1/transaction/transfers:batch",
+            data=json.dumps({"transfers": transfers}),
+            headers=self.headers,
+        )
+
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in response.get_data().splitlines()]
+        self.assertEqual([line["index"] for line in lines], [0, 1, 2, 3, 4])
+        wallet, _ = WalletModel.find_by_user_id(user_id=self.other_user.id)
+        self.assertEqual(wallet.amount, Decimal("5.00"))
+
+    def _add_shilling_wallet(self):
+        db.session.add(CurrencyModel(currency_code="KES", currency_name="Shilling"))
+        db.session.commit()
+        reference_cache.load()
+
+        user = UserModel(
+            name="shilling user",
+            email="shilling@example.com",
+            password="not-a-hash",
+            role_id=1,
+        )
+        user.save_to_db()
+        WalletModel(amount=Decimal("0.00"), currency_id=2, user_id=user.id).save_to_db()
+        return user
+
+    def test_transfer_between_currencies_converts_at_snapshot_rate(self):
+        shilling_user = self._add_shilling_wallet()
+        snapshot = ExchangeRateSnapshotModel.create("EUR", {"USD": 1.2, "KES": 130.5})
+
+        WalletModel.transfer(
+            source_user_id=self.user.id,
+            target_user_id=shilling_user.id,
+            amount=12,
+            rate_lookup=rate_table.rate,
+        )
+
+        wallet, _ = WalletModel.find_by_user_id(user_id=shilling_user.id)
+        self.assertEqual(wallet.amount, Decimal("1305.00"))
+        credit_entry = TransactionsModel.get_user_transactions(shilling_user.id)[0][0]
+        self.assertEqual(credit_entry.amount, Decimal("1305.00"))
+        self.assertEqual(credit_entry.rate_snapshot_id, snapshot.id)
+        self.assertEqual(credit_entry.exchange_rate, Decimal("108.75"))
+
+    def test_transfer_rejects_amount_in_another_currency(self):
+        shilling_user = self._add_shilling_wallet()
+        url = (
+            f"api/v1/transaction/transfer?current_user_id={self.user.id}"
+            f"&target_user_id={self.other_user.id}"
+        )
+
+        response = self.app.put(
+            url, data=json.dumps({"amount": 5, "currency_id": 2}), headers=self.headers
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.app.put(
+            url, data=json.dumps({"amount": 5, "currency_id": 1}), headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertRaises(ValueError):
+            WalletModel.transfer(
+                source_user_id=shilling_user.id,
+                target_user_id=self.user.id,
+                amount=1,
+                currency_id=1,
+            )
+
+        wallet, _ = WalletModel.find_by_user_id(user_id=self.user.id)
+        self.assertEqual(wallet.amount, Decimal("95.00"))
+
+    def test_transfer_between_currencies_without_snapshot(self):
+        shilling_user = self._add_shilling_wallet()
+
+        response = self.app.put(
+            f"api/v1/transaction/transfer?current_user_id={self.user.id}"
+            f"&target_user_id={shilling_user.id}",
+            data=json.dumps({"amount": 5}),
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 503)
+
+        with self.assertRaises(ExchangeRateError):
+            WalletModel.transfer(
+                source_user_id=self.user.id, target_user_id=shilling_user.id, amount=5
+            )
+
+        wallet, _ = WalletModel.find_by_user_id(user_id=self.user.id)
+        self.assertEqual(wallet.amount, Decimal("100.00"))
+
+    def test_snapshot_refresh_and_purge_keep_used_snapshots(self):
+        shilling_user = self._add_shilling_wallet()
+        old = datetime.utcnow() - timedelta(days=40)
+        used = ExchangeRateSnapshotModel.create("EUR", {"USD": 1.2, "KES": 130.5})
+        ExchangeRateSnapshotModel.create("EUR", {"USD": 1.2, "KES": 131})
+        latest = ExchangeRateSnapshotModel.create("EUR", {"USD": 1.2, "KES": 132})
+
+        rate_table.clear()
+        self.assertIsNone(rate_table.refresh_snapshot(max_age=900))
+        self.assertEqual(ExchangeRateSnapshotModel.query.count(), 3)
+
+        WalletModel.transfer(
+            source_user_id=self.user.id,
+            target_user_id=shilling_user.id,
+            amount=1,
+            rate_lookup=lambda source, target: (Decimal("108.75"), used.id),
+        )
+        ExchangeRateSnapshotModel.query.update({"created_at": old})
+        db.session.commit()
+
+        deleted = ExchangeRateSnapshotModel.purge_older_than(
+            datetime.utcnow() - timedelta(days=30)
+        )
+        self.assertEqual(deleted, 1)
+        self.assertEqual(
+            [snapshot.id for snapshot in ExchangeRateSnapshotModel.query.all()],
+            [used.id, latest.id],
+        )
+
+    def tearDown(self):
+        rate_table.clear()
+        response_cache.clear()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,24 +1,200 @@
-"""This helper module logs messages of different severity levels"""
+"""This helper module logs messages of different severity levels
+
+Records are filtered, tagged with the request id and have their message
+merged in the calling thread, then handed to a queue. A listener on a
+native thread formats them and writes them to stdout, so requests never
+wait on log I/O, not even under gevent. Messages take %-style arguments,
+which are only merged for records that pass the level and sampling
+checks, and keyword arguments become fields of the JSON log line.
+"""
+import atexit
+import json
 import logging
+import random
 import sys
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from uuid import uuid4
+
+from flask import g, has_request_context, request
+
+try:
+    from gevent import monkey
+
+    # the listener must not be a greenlet, or writing would block the hub
+    _NativeThread = monkey.get_original("threading", "Thread")
+    _NativeQueue = monkey.get_original("queue", "SimpleQueue")
+except ImportError:  # pragma: no cover - gevent is only installed for gunicorn
+    _NativeThread = threading.Thread
+    _NativeQueue = SimpleQueue
+
+REQUEST_ID_HEADER = "X-Request-ID"
 
 logger = logging.getLogger("kachezwe_web_api_service")
-app_log_handler = logging.StreamHandler(sys.stdout)
-app_log_formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
-app_log_handler.setFormatter(app_log_formatter)
-logger.addHandler(app_log_handler)
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one line of JSON with its fields and request id"""
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.utcfromtimestamp(record.created).isoformat() + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+
+        entry.update(getattr(record, "fields", {}))
+
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formats a record as the plain text line used before JSON logging"""
+
+    def __init__(self) -> None:
+        super().__init__("%(asctime)s %(levelname)s %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        return f"{line} {json.dumps(fields, default=str)}" if fields else line
+
+
+class ContextFilter(logging.Filter):
+    """Adds the request id and drops a share of info records
+
+    Attached to the queue handler, so it runs in the calling thread where
+    the request context is available. Records logged with sampled=False
+    are always kept.
+    """
+
+    def __init__(self, sample_rate=1.0) -> None:
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        if (
+            record.levelno <= logging.INFO
+            and self.sample_rate < 1.0
+            and getattr(record, "sampled", True)
+            and random.random() >= self.sample_rate
+        ):
+            return False
+
+        if has_request_context() and not hasattr(record, "request_id"):
+            record.request_id = g.get("request_id")
+
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Merges the message in the calling thread and leaves formatting to the listener"""
+
+    def prepare(self, record):
+        # merge the arguments now, they may change after the call returns
+        record.msg = record.getMessage()
+        record.args = None
+
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+
+class NativeQueueListener(QueueListener):
+    """QueueListener that writes from a native thread even under gevent"""
+
+    def start(self):
+        self._thread = _NativeThread(target=self._monitor, daemon=True)
+        self._thread.start()
+
+
+_queue = _NativeQueue()
+_context_filter = ContextFilter()
+_queue_handler = NonBlockingQueueHandler(_queue)
+_queue_handler.addFilter(_context_filter)
+_stream_handler = logging.StreamHandler(sys.stdout)
+_stream_handler.setFormatter(JsonFormatter())
+_listener = None
+_listener_lock = threading.Lock()
+
+logger.addHandler(_queue_handler)
+
+
+def configure(level="INFO", json_format=True, sample_rate=1.0):
+    """Sets the level, line format and info sample rate and starts writing
+
+    Args:
+        sample_rate (float): Share of info and debug records that are kept
+    """
+    global _listener
+
+    logger.setLevel(level)
+    _stream_handler.setFormatter(JsonFormatter() if json_format else TextFormatter())
+    _context_filter.sample_rate = sample_rate
+
+    with _listener_lock:
+        if _listener is None:
+            _listener = NativeQueueListener(_queue, _stream_handler)
+            _listener.start()
+            atexit.register(_listener.stop)
+
+
+def attach(other_logger):
+    """Sends the records of another logger through the queue of this module"""
+    other_logger.handlers = [_queue_handler]
+    other_logger.propagate = False
+
+
+def init_app(app):
+    """Gives every request of app an id that is logged with its records
+
+    The id is taken from the X-Request-ID header set by nginx when present
+    and returned in the same response header.
+    """
+
+    @app.before_request
+    def set_request_id():
+        g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid4().hex
+
+    @app.after_request
+    def add_request_id_header(response):
+        if "request_id" in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
+
+
+def _log(level, message, args, fields):
+    if logger.isEnabledFor(level):
+        sampled = fields.pop("sampled", True)
+        logger.log(level, message, *args, extra={"fields": fields, "sampled": sampled})
+
+
+def debug(message, *args, **fields):
+    _log(logging.DEBUG, message, args, fields)
 
 
-def info(message):
-    logger.setLevel(logging.INFO)
-    logger.info(message)
+def info(message, *args, **fields):
+    _log(logging.INFO, message, args, fields)
 
 
-def error(message):
-    logger.setLevel(logging.ERROR)
-    logger.error(message)
+def warning(message, *args, **fields):
+    _log(logging.WARNING, message, args, fields)
 
 
-def warning(message):
-    logger.setLevel(logging.WARNING)
-    logger.warning(message)
+def error(message, *args, exc_info=False, **fields):
+    if logger.isEnabledFor(logging.ERROR):
+        logger.error(message, *args, exc_info=exc_info, extra={"fields": fields})
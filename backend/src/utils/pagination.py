@@ -1,4 +1,13 @@
 """ Utility funcions for API pagination query parameters"""
+from datetime import datetime
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+
+MAX_LIMIT_VALUE = 100
+CURSOR_SALT = "pagination-cursor"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
 
 
 def default_limit_value(limit_value):
@@ -13,3 +22,55 @@ def default_page_value(page_value):
         return 1
     else:
         return page_value
+
+
+def bounded_limit_value(limit_value):
+    """Returns the limit as an integer between 1 and MAX_LIMIT_VALUE"""
+    return max(1, min(int(default_limit_value(limit_value)), MAX_LIMIT_VALUE))
+
+
+def _cursor_serializer():
+    return URLSafeSerializer(current_app.config["SECRET_KEY"], salt=CURSOR_SALT)
+
+
+def encode_cursor(created_at, row_id):
+    """Encodes the keyset of the last row of a page into an opaque signed cursor"""
+    return _cursor_serializer().dumps([created_at.isoformat(), row_id])
+
+
+def decode_cursor(cursor):
+    """Decodes a cursor created by encode_cursor
+
+    Returns:
+        tuple: created_at and id of the last row of the previous page, or None
+
+    Raises:
+        ValueError: If the cursor is malformed or its signature does not match
+    """
+    if cursor is None or cursor == "":
+        return None
+
+    try:
+        created_at, row_id = _cursor_serializer().loads(cursor)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (BadSignature, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def page_headers(rows, has_more, total=None):
+    """Builds the response headers of a keyset page
+
+    Returns:
+        dict: The cursor of the next page if there is one and the total count
+        if it was requested
+    """
+    headers = {}
+
+    if has_more and rows:
+        last_row = rows[-1]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(last_row.created_at, last_row.id)
+
+    if total is not None:
+        headers[TOTAL_COUNT_HEADER] = str(total)
+
+    return headers